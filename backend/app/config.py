@@ -1,6 +1,6 @@
 # app/config.py
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "LegalDoc SaaS"
@@ -22,6 +22,97 @@ class Settings(BaseSettings):
     # OpenAI API Key
     OPENAI_API_KEY: str
 
+    # --- OpenAI HTTP connection pool ---
+    OPENAI_MAX_CONNECTIONS: int = 100
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_TIMEOUT_SECONDS: float = 120.0
+    OPENAI_BASE_URL: Optional[str] = None  # Point at an OpenAI-compatible server, e.g. scripts/fake_openai_server.py for load tests
+
+    # --- LLM gateway (see app/services/llm_gateway.py) ---
+    LLM_MODEL_ROUTES: Dict[str, str] = {}  # Task -> model overrides, e.g. {"evaluate": "gpt-4.1-mini"}
+    LLM_MODEL_CONCURRENCY: Dict[str, int] = {}  # Model -> max in-flight calls per worker
+    LLM_DEFAULT_CONCURRENCY: int = 8
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_DELAY: float = 1.0
+    LLM_RETRY_MAX_DELAY: float = 20.0
+    LLM_REQUEST_TIMEOUT: float = 120.0
+    LLM_CONTEXT_SAFETY_MARGIN: int = 256  # Tokens left unused in every context window
+    LLM_MIN_COMPLETION_TOKENS: int = 1024  # Prompts are truncated rather than leave less than this for the answer
+    CHAT_CONTEXT_DOCUMENT_MAX_TOKENS: int = 16000  # Cap on a document pasted into the chat agent
+
+    # --- AI result cache (evaluation / compliance) ---
+    AI_RESULT_CACHE_ENABLED: bool = True
+    AI_RESULT_CACHE_PATH: str = "cache/ai_results.sqlite3"
+    AI_RESULT_CACHE_MAX_ENTRIES: int = 10000
+    AI_RESULT_CACHE_MEMORY_ENTRIES: int = 512
+
+    # --- Chunked evaluation of long documents ---
+    EVALUATION_CHUNKING_THRESHOLD_TOKENS: int = 12000  # Documents above this are evaluated section by section
+    EVALUATION_CHUNK_TOKENS: int = 6000
+    EVALUATION_CHUNK_CONCURRENCY: int = 4
+
+    # --- Batch evaluation ---
+    BATCH_EVALUATION_MAX_DOCUMENTS: int = 500
+    BATCH_EVALUATION_CONCURRENCY: int = 4  # Documents evaluated at once per batch job; model limits still apply
+    BATCH_EVALUATION_WRITE_SIZE: int = 25  # Evaluations written back per bulk update
+
+    # --- Embeddings and template retrieval (see app/services/template_index.py) ---
+    EMBEDDING_BATCH_SIZE: int = 256  # Texts per embeddings request
+    EMBEDDING_MAX_INPUT_TOKENS: int = 8000
+    EMBEDDING_MAX_BATCH_TOKENS: int = 250000  # Tokens per embeddings request; OpenAI rejects requests above 300k
+    TEMPLATE_INDEX_PATH: str = "cache/template_index.npz"
+    TEMPLATE_INDEX_CHUNK_TOKENS: int = 400  # Templates are embedded in clause-sized chunks of at most this size
+    TEMPLATE_RETRIEVAL_ENABLED: bool = True
+    TEMPLATE_RETRIEVAL_TOP_K: int = 6
+    TEMPLATE_RETRIEVAL_MIN_SCORE: float = 0.25  # Cosine similarity below which a chunk is not used
+    TEMPLATE_RETRIEVAL_MAX_TOKENS: int = 2000  # Cap on template text added to a generation prompt
+
+    # --- Similar documents (see app/services/document_embeddings.py) ---
+    DOCUMENT_EMBEDDINGS_DIR: str = "cache/document_embeddings"  # One float16 memmap store per user
+    SIMILAR_DOCUMENTS_MAX_RESULTS: int = 20
+
+    # --- Document export rendering (see app/services/render_pool.py) ---
+    RENDER_POOL_WORKERS: int = 2  # Render processes per API worker; 0 renders in a thread instead
+    RENDER_POOL_MAX_PENDING: int = 8  # Renders submitted at once per API worker before requests queue
+    RENDER_POOL_QUEUE_TIMEOUT_SECONDS: float = 15.0  # Wait for a slot before answering 503
+    EXPORT_SPOOL_THRESHOLD_BYTES: int = 8 * 1024 * 1024  # Uncached exports above this are streamed from a spooled file instead of memory
+
+    # --- Rendered export cache (see app/services/artifact_cache.py) ---
+    ARTIFACT_CACHE_ENABLED: bool = True
+    ARTIFACT_CACHE_DIR: str = "cache/artifacts"
+    ARTIFACT_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024  # Least recently downloaded artifacts are evicted above this
+    ARTIFACT_CACHE_STORAGE_BUCKET: Optional[str] = None  # Supabase storage bucket shared across hosts; unset keeps the cache local
+
+    # --- Bulk ZIP export (see app/services/bulk_export.py) ---
+    BULK_EXPORT_MAX_DOCUMENTS: int = 200
+    BULK_EXPORT_CONCURRENCY: int = 4  # Documents rendered or read ahead of the one being written to the archive
+
+    # --- Upload ingestion (see app/utils/ingestion.py) ---
+    UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024  # Larger uploads are rejected with 413
+    UPLOAD_SPOOL_MAX_MEMORY_BYTES: int = 1024 * 1024  # Uploads are kept in memory up to this size, then spooled to disk
+    EXTRACTION_POOL_WORKERS: int = 2  # Text extraction processes per API worker; 0 extracts in a thread (no page timeout)
+    EXTRACTION_PAGE_TIMEOUT_SECONDS: float = 10.0  # Per PDF page, and for opening a file
+    EXTRACTION_PDF_MIN_PAGES_PER_TASK: int = 16  # Smallest page range handed to one extraction process
+    EXTRACTION_MAX_PDF_PAGES: int = 1000  # Longer PDFs are rejected with 413, except where a token budget allows partial text (chat context)
+
+    # --- Upload de-duplication (see app/services/upload_dedup.py) ---
+    UPLOAD_DEDUP_SCOPE: str = "user"  # "user", "team" (also reuse uploads by teammates) or "off"
+
+    # --- LLM usage metrics (see app/services/llm_metrics.py) ---
+    LLM_USAGE_FLUSH_INTERVAL_SECONDS: float = 60.0  # How often the per-user daily rollup is written to llm_usage_daily
+
+    # --- Background jobs ---
+    BACKGROUND_JOB_CONCURRENCY: int = 4  # Max background jobs running at once per worker
+
+    # --- Durable AI jobs (see app/services/ai_jobs.py and app/worker.py) ---
+    JOBS_RUN_INLINE: bool = True  # Run submitted jobs in the API process; set False when `python -m app.worker` is deployed
+    JOBS_WORKER_CONCURRENCY: int = 4
+    JOBS_POLL_INTERVAL_SECONDS: float = 1.0
+    JOBS_STALE_AFTER_SECONDS: int = 900  # Running jobs without a heartbeat for this long are assumed lost and requeued
+    JOBS_HEARTBEAT_INTERVAL_SECONDS: float = 60.0  # How often a running job refreshes heartbeat_at
+    JOBS_REQUEUE_INTERVAL_SECONDS: float = 60.0  # How often stale jobs are looked for
+    JOBS_MAX_ATTEMPTS: int = 3
+
     # --- Email Configuration ---
     SMTP_SERVER: str = "smtp.gmail.com"
     SMTP_PORT: int = 587
@@ -1,8 +1,18 @@
 # app/main.py
-from fastapi import FastAPI, Depends
+import asyncio
+import os
+from fastapi import FastAPI, Depends, Response
 from dotenv import load_dotenv
-from app.routes import auth, document, templates, ai_agents, billing, clients, agents, admin, contact, support, research, teams, teams_documents
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+from app.routes import auth, document, templates, ai_agents, billing, clients, agents, admin, contact, support, research, teams, teams_documents, jobs
 from app.config import settings
+from app.services import llm_gateway
+from app.services.job_queue import job_queue
+from app.services.ai_jobs import run_stale_job_recovery
+from app.services.usage_rollup import flush_usage_rollup, run_usage_flusher
+from app.services.template_index import template_index
+from app.services.render_pool import render_pool
+from app.utils.ingestion import extraction_pool
 from fastapi.openapi.utils import get_openapi
 from fastapi.middleware.cors import CORSMiddleware
 from app.utils.auth_utils import get_current_user, security
@@ -142,6 +152,61 @@ app.include_router(
     dependencies=[Depends(get_current_user)]
 )
 
+# AI Job Routes
+app.include_router(
+    jobs.router,
+    prefix="/api/v1/jobs",
+    tags=["Jobs"],
+    dependencies=[Depends(get_current_user)]
+)
+
+_usage_flusher = None
+_stale_job_recovery = None
+
+@app.on_event("startup")
+async def start_usage_flusher():
+    global _usage_flusher
+    _usage_flusher = asyncio.create_task(run_usage_flusher())
+
+@app.on_event("startup")
+async def start_stale_job_recovery():
+    # Without a worker, jobs lost with a dead API process are only recovered here
+    global _stale_job_recovery
+    if settings.JOBS_RUN_INLINE:
+        _stale_job_recovery = asyncio.create_task(run_stale_job_recovery())
+
+@app.on_event("startup")
+async def sync_template_index():
+    # Embeds only templates added or changed since the index file was written
+    job_queue.submit("template_index:sync", template_index.sync)
+
+@app.on_event("startup")
+async def warm_up_render_pool():
+    job_queue.submit("render_pool:warm_up", render_pool.warm_up)
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    if _stale_job_recovery:
+        _stale_job_recovery.cancel()
+    # Let queued background jobs (e.g. compliance checks) finish before the clients close
+    await job_queue.drain()
+    await llm_gateway.close_clients()
+    render_pool.shutdown()
+    extraction_pool.shutdown()
+    if _usage_flusher:
+        _usage_flusher.cancel()
+    await asyncio.to_thread(flush_usage_rollup)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # With several uvicorn/gunicorn workers, set PROMETHEUS_MULTIPROC_DIR so all of them are aggregated
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/", include_in_schema=False)
 def health_check():
     return {"status": "OK", "version": settings.PROJECT_VERSION}
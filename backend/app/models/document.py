@@ -23,3 +23,4 @@ class DocumentResponse(BaseModel):
     evaluation_response: Optional[DocumentEvaluationResponse] = None
     client_profile_id: Optional[UUID] = None
     compliance_check_results: Optional[ComplianceCheckResult] = None
+    prompt_version: Optional[str] = None
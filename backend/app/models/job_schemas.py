@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any
+from datetime import datetime
+from enum import Enum
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class JobSubmitRequest(BaseModel):
+    job_type: str = Field(..., description="Registered job type, e.g. 'generate_document'")
+    payload: Dict[str, Any] = Field(default_factory=dict, description="Arguments for the job handler")
+
+class JobResponse(BaseModel):
+    id: str
+    user_id: str
+    job_type: str
+    status: JobStatus
+    progress: int = 0
+    progress_message: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
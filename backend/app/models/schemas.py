@@ -1,7 +1,7 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from datetime import date, datetime
 from uuid import UUID, uuid4
-from typing import Optional, List, Dict
+from typing import Any, Optional, List, Dict
 import enum
 
 class RegisterRequest(BaseModel):
@@ -85,6 +85,10 @@ class AreaOfLaw(str, enum.Enum):
     WILLS_AND_TRUSTS = "Wills and Trusts"
     REAL_ESTATE = "Real Estate"
 
+class EnhancementMode(str, enum.Enum):
+    PATCH = "patch"      # The model returns section patches that are applied server-side
+    REWRITE = "rewrite"  # The model returns the whole enhanced document
+
 class DocumentTemplate(BaseModel):
     id: UUID = Field(default_factory=uuid4, example=UUID('a1b2c3d4-e5f6-7890-1234-567890abcdef'))
     title: str = Field(..., example="Standard Employment Contract")
@@ -115,10 +119,37 @@ class DocumentEvaluationResponse(BaseModel):
     recommendations_for_update: List[str]
     strategies_for_update: List[str]
 
+class BatchEvaluationRequest(BaseModel):
+    document_ids: List[UUID] = Field(..., min_length=1, example=[UUID('12345678-1234-5678-1234-567812345678')])
+    evaluation_criteria: str = Field("General legal review", example="General legal review")
+    refresh: bool = Field(False, description="Re-evaluate documents that already have an evaluation, bypassing the result cache")
+
+class ExportFormat(str, enum.Enum):
+    PDF = "pdf"
+    DOCX = "docx"
+
+class BulkExportRequest(BaseModel):
+    # Exactly one of document_ids or client_profile_id selects the documents
+    document_ids: Optional[List[UUID]] = Field(None, min_length=1, example=[UUID('12345678-1234-5678-1234-567812345678')])
+    client_profile_id: Optional[UUID] = Field(None, description="Export every accessible document of this client", example=UUID('b2c3d4e5-f6a7-8901-2345-67890abcdef0'))
+    format: ExportFormat = Field(ExportFormat.PDF, example="pdf")
+
+    @model_validator(mode="after")
+    def check_selection(self):
+        if (self.document_ids is None) == (self.client_profile_id is None):
+            raise ValueError("Provide either document_ids or client_profile_id")
+        return self
+
 class ComplianceCheckResult(BaseModel):
-    formatting: str = Field(..., example="Pass")
-    required_clauses: List[str] = Field(..., example=["Missing notarization section"])
-    jurisdiction_fit: str = Field(..., example="Good")
+    # Compliance runs as a background job: "pending" until it finishes, then "completed" or "failed".
+    # Results stored before the status field existed have no status and are complete.
+    status: Optional[str] = Field(None, example="completed")
+    formatting: Optional[str] = Field(None, example="Pass")
+    required_clauses: Optional[List[str]] = Field(None, example=["Missing notarization section"])
+    jurisdiction_fit: Optional[str] = Field(None, example="Good")
+    # Per-section findings, in document order, for documents with more than one section
+    section_findings: Optional[List[Dict[str, Any]]] = Field(None, example=[{"section_id": "s2", "heading": "Indemnification", "formatting": "Pass", "jurisdiction_fit": "Good", "issues": []}])
+    error: Optional[str] = Field(None, example=None)
 
 class Document(BaseModel):
     id: UUID = Field(default_factory=uuid4, example=UUID('a1b2c3d4-e5f6-7890-1234-567890abcdef'))
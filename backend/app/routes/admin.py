@@ -335,6 +335,49 @@ async def get_daily_activity(
         logger.error(f"Error fetching daily activity: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch daily activity")
 
+@router.get("/analytics/llm-usage")
+async def get_llm_usage(
+    days: int = Query(30, description="Number of days to look back"),
+    user_id: Optional[str] = Query(None, description="Only include this user's usage"),
+    admin: dict = Depends(require_admin)
+):
+    """Get LLM calls, tokens and estimated cost per user per day (flushed every LLM_USAGE_FLUSH_INTERVAL_SECONDS)"""
+    try:
+        start_date = (datetime.now(timezone.utc) - timedelta(days=days)).date()
+        query = supabase.from_("llm_usage_daily").select("*").gte("usage_date", start_date.isoformat())
+        if user_id:
+            query = query.eq("user_id", user_id)
+        rows = query.order("usage_date").execute().data or []
+
+        # Roll task/model rows up to one row per user per day
+        daily_usage: Dict[tuple, Dict[str, Any]] = {}
+        for row in rows:
+            key = (row['usage_date'], row.get('user_id'))
+            entry = daily_usage.setdefault(key, {
+                'date': row['usage_date'],
+                'user_id': row.get('user_id'),
+                'calls': 0,
+                'errors': 0,
+                'prompt_tokens': 0,
+                'completion_tokens': 0,
+                'cost_usd': 0.0,
+                'by_task': {}
+            })
+            entry['calls'] += row['calls']
+            entry['errors'] += row['errors']
+            entry['prompt_tokens'] += row['prompt_tokens']
+            entry['completion_tokens'] += row['completion_tokens']
+            entry['cost_usd'] += float(row['cost_usd'])
+            task = entry['by_task'].setdefault(row['task'], {'calls': 0, 'cost_usd': 0.0, 'average_latency_ms': 0})
+            task['average_latency_ms'] = (task['average_latency_ms'] * task['calls'] + row['total_latency_ms']) / (task['calls'] + row['calls'])
+            task['calls'] += row['calls']
+            task['cost_usd'] += float(row['cost_usd'])
+
+        return list(daily_usage.values())
+    except Exception as e:
+        logger.error(f"Error fetching LLM usage: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to fetch LLM usage")
+
 @router.get("/analytics/documents")
 async def get_document_analytics(admin: dict = Depends(require_admin)):
     """Get detailed document analytics"""
@@ -396,7 +439,10 @@ async def get_document_analytics(admin: dict = Depends(require_admin)):
             # Compliance analysis
             compliance = doc.get('compliance_check_results')
             if compliance:
-                if isinstance(compliance, dict):
+                if isinstance(compliance, dict) and compliance.get('status') in ('pending', 'failed'):
+                    # Background check has not produced a result yet
+                    compliance_results['not_checked'] += 1
+                elif isinstance(compliance, dict):
                     score = compliance.get('compliance_score', 0)
                     if score >= 0.8:
                         compliance_results['passed'] += 1
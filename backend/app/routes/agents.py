@@ -3,9 +3,10 @@ from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, P
 from fastapi.responses import FileResponse
 from typing import List, Dict, Any
 
+from app.config import settings
 from app.models.database import supabase
 from app.utils.auth_utils import get_current_user
-from app.utils.file_utils import save_and_parse_file
+from app.utils.ingestion import ingest_upload_text
 from app.services.langchain_agent import ChatLawyerAgent
 
 router = APIRouter()
@@ -86,8 +87,11 @@ async def upload_document_for_chat_context(file: UploadFile = File(...)):
     to the chat endpoint. This does not save the document to the database.
     """
     try:
-        text = await save_and_parse_file(file)
+        # The chat only uses the start of long documents; stop reading PDF pages once that much text is extracted
+        text = await ingest_upload_text(file, max_tokens=settings.CHAT_CONTEXT_DOCUMENT_MAX_TOKENS)
         return {"contract_text": text, "message": "File parsed successfully. You can now include this text in your chat request."}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to process file: {str(e)}")
 
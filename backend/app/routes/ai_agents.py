@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, Form, Body
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, Form, Body, Query
 from fastapi.security import HTTPAuthorizationCredentials
 from app.services.ai_agent_generate import generate_legal_document
 from app.services.ai_agent_evaluate import evaluate_legal_document
@@ -6,6 +6,9 @@ from app.services.ai_agent_template import edit_template_with_ai, fetch_template
 from app.utils.auth_utils import get_current_user, security
 from app.routes.document import save_document_to_supabase
 from app.models.database import supabase
+from app.services.ai_jobs import register_job_handler, submit_job, accepted_job_response
+from app.models.schemas import DocumentType, AreaOfLaw
+from app.utils.db_utils import get_profile
 import logging
 from typing import Dict, Any
 import traceback
@@ -21,12 +24,15 @@ async def generate_document(
     title: str = Body(..., embed=True),
     state_id: str = Body(None, embed=True),
     document_type_id: str = Body(None, embed=True),
+    document_type: DocumentType = Body(DocumentType.LETTER, embed=True),
+    area_of_law: AreaOfLaw = Body(AreaOfLaw.CONTRACTS, embed=True),
     user: dict = Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> Dict[str, Any]:
     """
     Generate a legal document using AI and save it to Supabase.
-    Uses a template as context if available.
+    Uses the template for the state and document type as context if both are given;
+    otherwise the most relevant template excerpts are retrieved from the template index.
     
     Example form data:
     ```
@@ -34,6 +40,8 @@ async def generate_document(
     title: "Software NDA"
     state_id: "CA" (optional)
     document_type_id: "NDA" (optional)
+    document_type: "Letter" (optional)
+    area_of_law: "Contracts" (optional)
     ```
     """
     try:
@@ -66,13 +74,15 @@ async def generate_document(
         
         # Generate document content using AI with optional template context
         try:
-            content = generate_legal_document(
-                prompt=prompt,
+            content = await generate_legal_document(
+                notes=prompt,
                 user_id=user_id,
                 title=title,
-                template_content=template_content,
-                state_name=state_name,
-                document_type=doc_type_name
+                document_type=document_type,
+                area_of_law=area_of_law,
+                user_profile_data=await get_profile(user_id) or {},
+                jurisdiction=state_name,
+                template_content=template_content
             )
             logger.info(f"Successfully generated document content for {title}")
         except Exception as ai_error:
@@ -116,49 +126,67 @@ async def generate_document(
             detail=f"Internal server error: {str(e)}"
         )
 
+async def _edit_template(user_id: str, template_path: str, user_command: str, title: str) -> Dict[str, Any]:
+    """Fetch a template, edit it with AI and save the result. Shared by the route and the edit job."""
+    try:
+        local_template_path = fetch_template_from_supabase(template_path)
+        logger.info(f"Template fetched successfully: {local_template_path}")
+    except Exception as fetch_error:
+        logger.error(f"Template fetch failed: {str(fetch_error)}")
+        raise HTTPException(
+            status_code=404,
+            detail=f"Template not found: {str(fetch_error)}"
+        )
+
+    try:
+        updated_path = await edit_template_with_ai(
+            template_path=local_template_path,
+            user_command=user_command,
+            user_id=user_id,
+            title=title
+        )
+        logger.info(f"Template edited successfully: {updated_path}")
+    except Exception as edit_error:
+        logger.error(f"Template edit failed: {str(edit_error)}\n{traceback.format_exc()}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to edit template: {str(edit_error)}"
+        )
+
+    return {
+        "message": "Template edited successfully",
+        "updated_path": updated_path
+    }
+
+@register_job_handler("edit_template")
+async def _edit_template_job(user_id: str, payload: Dict[str, Any], report_progress) -> Dict[str, Any]:
+    await report_progress(10, "Editing template")
+    return await _edit_template(user_id, payload["template_path"], payload["user_command"], payload["title"])
+
 @router.post("/edit-template", tags=["AI Agents"])
 async def edit_template(
     template_path: str = Form(...),
     user_command: str = Form(...),
     title: str = Form(...),
+    async_mode: bool = Query(False, description="Queue the edit as a job and return 202 with its id"),
     user: dict = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
     Edit a template using AI and save the updated document to Supabase.
+    With `async_mode=true` the edit runs as a job.
     """
     try:
         logger.info(f"Editing template for user {user['id']}: {template_path}")
-        user_id = user["id"]
 
-        try:
-            local_template_path = fetch_template_from_supabase(template_path)
-            logger.info(f"Template fetched successfully: {local_template_path}")
-        except Exception as fetch_error:
-            logger.error(f"Template fetch failed: {str(fetch_error)}")
-            raise HTTPException(
-                status_code=404,
-                detail=f"Template not found: {str(fetch_error)}"
-            )
-
-        try:
-            updated_path = edit_template_with_ai(
-                template_path=local_template_path,
-                user_command=user_command,
-                user_id=user_id,
-                title=title
-            )
-            logger.info(f"Template edited successfully: {updated_path}")
-        except Exception as edit_error:
-            logger.error(f"Template edit failed: {str(edit_error)}\n{traceback.format_exc()}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to edit template: {str(edit_error)}"
-            )
+        if async_mode:
+            job = await submit_job(user["id"], "edit_template", {
+                "template_path": template_path,
+                "user_command": user_command,
+                "title": title
+            })
+            return accepted_job_response(job)
 
-        return {
-            "message": "Template edited successfully",
-            "updated_path": updated_path
-        }
+        return await _edit_template(user["id"], template_path, user_command, title)
     except HTTPException:
         raise
     except Exception as e:
@@ -1,30 +1,36 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, File, UploadFile, Body, Form
+from fastapi import APIRouter, HTTPException, Depends, Query, File, UploadFile, Body, Form, BackgroundTasks
 from fastapi.security import HTTPAuthorizationCredentials
 from app.models.document import DocumentCreate, DocumentUpdate, DocumentResponse
-from app.models.schemas import DocumentGenerateRequest, ProfileInfo, ClientProfileResponse, ClientFolder, DocumentType, AreaOfLaw
+from app.models.schemas import DocumentGenerateRequest, ProfileInfo, ClientProfileResponse, ClientFolder, DocumentType, AreaOfLaw, BatchEvaluationRequest, EnhancementMode, BulkExportRequest
+from app.config import settings
 from app.models.database import supabase
 from app.utils.auth_utils import get_current_user, security
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
-import traceback
-from fastapi.responses import FileResponse
+from typing import BinaryIO, Dict, Any, List, Optional, Tuple
 import os
+import traceback
+from urllib.parse import quote
+from fastapi.responses import Response, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 import tempfile
-import markdown
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, ListFlowable, Image, PageBreak, Frame, flowables, HRFlowable, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle, ListStyle
-from reportlab.lib.enums import TA_CENTER
-from reportlab.lib import colors
 from starlette.background import BackgroundTask
-from app.services.ai_agent_evaluate import evaluate_legal_document
-from app.services.ai_agent_generate import generate_legal_document
-from app.services.ai_agent_compliance import check_document_compliance
-from app.services.ai_agent_enhance import enhance_document_with_ai
+from app.services.ai_agent_evaluate import evaluate_legal_document, evaluation_cache_key
+from app.services.ai_agent_generate import generate_legal_document, stream_legal_document
+from app.services.ai_agent_compliance import check_document_compliance_incremental, schedule_compliance_check, PENDING_COMPLIANCE_RESULTS
+from app.services.ai_agent_enhance import enhance_document_with_ai, enhance_document_sections
+from app.services.ai_jobs import register_job_handler, submit_job, accepted_job_response
+from app.services.prompt_registry import get_generation_prompt
+from app.services.document_renderer import PDF_MEDIA_TYPE, DOCX_MEDIA_TYPE
+from app.services.render_pool import render_pool, RenderPoolBusy
+from app.services.artifact_cache import artifact_cache
+from app.services.bulk_export import resolve_export_documents, stream_export_zip
+from app.utils.document_sections import split_sections
+from app.services.upload_dedup import UploadDedup, get_upload_dedup, extract_upload_content, reusable_results, record_results, mark_reused, check_and_record_compliance
+from app.utils.ingestion import receive_upload
+from app.services.job_queue import job_queue
+from app.services.document_embeddings import schedule_document_embedding, index_documents, remove_document, sync_user_documents, find_similar_documents
 from app.utils.db_utils import get_profile, get_client_profile
-from bs4 import BeautifulSoup
-from docx import Document as DocxDocument
-from PyPDF2 import PdfReader
 from datetime import datetime
 import json
 from starlette.status import HTTP_201_CREATED
@@ -32,10 +38,6 @@ from starlette.status import HTTP_201_CREATED
 logger = logging.getLogger(__name__)
 router = APIRouter()
 from app.utils.db_utils import get_profile, get_client_profile # Import the utility functions to get profile data
-from reportlab.lib import colors
-from bs4 import BeautifulSoup
-from docx import Document as DocxDocument # Import python-docx
-from PyPDF2 import PdfReader # Import PyPDF2
 from datetime import datetime
 import json
 
@@ -44,6 +46,8 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+EXPORT_STREAM_CHUNK_BYTES = 64 * 1024
+
 # Utility function to save or update a document in Supabase
 def save_document_to_supabase(user_id: str, title: str, content: str, status: str = "active", token: str = None) -> dict:
     """
@@ -76,90 +80,134 @@ def save_document_to_supabase(user_id: str, title: str, content: str, status: st
         if not response.data:
             raise ValueError("No data returned from Supabase")
 
+        schedule_document_embedding(response.data[0])
         return response.data[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving document: {str(e)}")
 
+# Utility function to fetch the profiles used to populate a generated document
+async def _load_generation_profiles(document_request: DocumentGenerateRequest, user: dict) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    Fetch the requesting user's profile and, for attorneys, the selected client profile.
+    Raises HTTPException when a profile is missing or not accessible.
+    """
+    user_profile_data = await get_profile(user["id"])
+    if not user_profile_data:
+        raise HTTPException(status_code=404, detail="User profile not found.")
+
+    client_profile_data = None
+    if document_request.client_profile_id:
+        # Ensure the requesting user is an attorney to fetch client profiles
+        if user_profile_data.get("role") != "attorney":
+            raise HTTPException(status_code=403, detail="Only attorneys can generate documents for clients.")
+
+        client_profile_data = await get_client_profile(
+            attorney_id=user["id"],
+            client_profile_id=str(document_request.client_profile_id)
+        )
+        if not client_profile_data:
+            raise HTTPException(status_code=404, detail="Client profile not found or not accessible by this attorney.")
+
+    return user_profile_data, client_profile_data
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a single server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _generate_and_save_document(document_request: DocumentGenerateRequest, user_id: str) -> Dict[str, Any]:
+    """
+    Generate a document from structured inputs and save it as a draft whose
+    compliance check is pending. Shared by the create route and the generate job.
+    """
+    user_profile_data, client_profile_data = await _load_generation_profiles(document_request, {"id": user_id})
+
+    # Generate document content using the AI agent
+    generated_content = await generate_legal_document(
+        notes=document_request.notes,
+        user_id=user_id,
+        title=document_request.title,
+        document_type=document_request.document_type,
+        area_of_law=document_request.area_of_law,
+        user_profile_data=user_profile_data, # Pass user profile data
+        client_profile_id=document_request.client_profile_id,
+        client_profile_data=client_profile_data, # Pass client profile data
+        jurisdiction=document_request.jurisdiction,
+        county=document_request.county,
+        date_of_application=document_request.date_of_application,
+        case_number=document_request.case_number,
+    )
+    logger.info(f"AI document generation complete for title: {document_request.title}")
+
+    try:
+        document_data = {
+            "user_id": user_id,
+            "title": document_request.title,
+            "content": generated_content,
+            "status": "draft",
+            "client_profile_id": str(document_request.client_profile_id) if document_request.client_profile_id else None,
+            "compliance_check_results": PENDING_COMPLIANCE_RESULTS,
+            "prompt_version": get_generation_prompt(document_request.document_type).id
+        }
+        response = supabase.from_("documents").insert(document_data).execute()
+        created_document = response.data[0]
+        logger.info(f"Document created: {created_document['id']}")
+        schedule_document_embedding(created_document)
+        return created_document
+    except Exception as db_error:
+        logger.error(f"Database insert/update failed: {str(db_error)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error creating/evaluating document: {str(db_error)}"
+        )
+
+@register_job_handler("generate_document")
+async def _generate_document_job(user_id: str, payload: Dict[str, Any], report_progress) -> Dict[str, Any]:
+    document_request = DocumentGenerateRequest(**payload)
+    await report_progress(10, "Generating document")
+    created_document = await _generate_and_save_document(document_request, user_id)
+    await schedule_compliance_check(
+        created_document["id"],
+        created_document["content"],
+        document_request.jurisdiction,
+        document_request.document_type.value
+    )
+    return created_document
+
 # Create Document
 @router.post("/create", tags=["Documents"], response_model=DocumentResponse)
 async def create_document(
+    background_tasks: BackgroundTasks,
     document_request: DocumentGenerateRequest = Body(...),
+    async_mode: bool = Query(False, description="Queue generation as a job and return 202 with its id"),
     user: dict = Depends(get_current_user),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> Dict[str, Any]:
     """
     Create a new document using structured inputs and AI generation.
+    The compliance check is queued after the response is sent; until it finishes
+    `compliance_check_results.status` is "pending".
+    With `async_mode=true` the generation runs as a job (see /jobs) instead.
     """
     try:
         logger.info(f"Initiating document generation for user {user['id']} with title: {document_request.title}")
-        
-        user_profile_data = await get_profile(user["id"])
-        if not user_profile_data:
-            raise HTTPException(status_code=404, detail="User profile not found.")
-
-        client_profile_data = None
-        if document_request.client_profile_id:
-            # Ensure the requesting user is an attorney to fetch client profiles
-            if user_profile_data.get("role") != "attorney":
-                raise HTTPException(status_code=403, detail="Only attorneys can generate documents for clients.")
-
-            client_profile_data = await get_client_profile(
-                attorney_id=user["id"],
-                client_profile_id=str(document_request.client_profile_id)
-            )
-            if not client_profile_data:
-                raise HTTPException(status_code=404, detail="Client profile not found or not accessible by this attorney.")
-
-        # Generate document content using the AI agent
-        generated_content = await generate_legal_document(
-            notes=document_request.notes,
-            user_id=user['id'],
-            title=document_request.title,
-            document_type=document_request.document_type,
-            area_of_law=document_request.area_of_law,
-            user_profile_data=user_profile_data, # Pass user profile data
-            client_profile_id=document_request.client_profile_id,
-            client_profile_data=client_profile_data, # Pass client profile data
-            jurisdiction=document_request.jurisdiction,
-            county=document_request.county,
-            date_of_application=document_request.date_of_application,
-            case_number=document_request.case_number,
-        )
-        logger.info(f"AI document generation complete for title: {document_request.title}")
 
-        try:
-            document_data = {
-                "user_id": user["id"],
-                "title": document_request.title,
-                "content": generated_content,
-                "status": "draft",
-                "client_profile_id": str(document_request.client_profile_id) if document_request.client_profile_id else None
-            }
-            response = supabase.from_("documents").insert(document_data).execute()
-            created_document = response.data[0]
-            logger.info(f"Document created: {created_document['id']}")
-
-            # Run compliance check after document creation
-            compliance_result = await check_document_compliance(
-                document_content=generated_content,
-                jurisdiction=document_request.jurisdiction,
-                document_type=document_request.document_type.value # Pass the enum value as string
-            )
-            
-            # Update the document with compliance check results
-            supabase.from_("documents").update({"compliance_check_results": compliance_result.dict()}).eq("id", created_document["id"]).execute()
-            created_document["compliance_check_results"] = compliance_result.dict()
-            logger.info(f"Compliance check completed and saved for document: {created_document['id']}")
+        if async_mode:
+            job = await submit_job(user["id"], "generate_document", jsonable_encoder(document_request))
+            return accepted_job_response(job)
 
-            # Return the created document data
-            return created_document
+        created_document = await _generate_and_save_document(document_request, user["id"])
 
-        except Exception as db_error:
-            logger.error(f"Database insert/update failed: {str(db_error)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error creating/evaluating document: {str(db_error)}"
-            )
+        # Check compliance in the background once the response has been sent
+        background_tasks.add_task(
+            schedule_compliance_check,
+            created_document["id"],
+            created_document["content"],
+            document_request.jurisdiction,
+            document_request.document_type.value # Pass the enum value as string
+        )
+
+        # Return the created document data
+        return created_document
     except HTTPException:
         raise
     except Exception as e:
@@ -169,6 +217,113 @@ async def create_document(
             detail=f"Internal server error: {str(e)}"
         )
 
+# Create Document (streamed)
+@router.post("/create/stream", tags=["Documents"])
+async def create_document_stream(
+    document_request: DocumentGenerateRequest = Body(...),
+    user: dict = Depends(get_current_user)
+) -> StreamingResponse:
+    """
+    Create a new document and stream the generated markdown to the client as server-sent events.
+
+    The document row is created up front with status "generating" and finalized once the
+    model finishes. The compliance check is queued after the stream has closed.
+
+    Events:
+    - `document`: the newly created document row (sent first)
+    - `chunk`: `{"content": "<markdown delta>"}`
+    - `done`: the finalized document row
+    - `error`: `{"detail": "<message>"}`
+    """
+    logger.info(f"Initiating streamed document generation for user {user['id']} with title: {document_request.title}")
+
+    user_profile_data, client_profile_data = await _load_generation_profiles(document_request, user)
+
+    try:
+        response = supabase.from_("documents").insert({
+            "user_id": user["id"],
+            "title": document_request.title,
+            "content": "",
+            "status": "generating",
+            "client_profile_id": str(document_request.client_profile_id) if document_request.client_profile_id else None,
+            "prompt_version": get_generation_prompt(document_request.document_type).id
+        }).execute()
+        created_document = response.data[0]
+        logger.info(f"Document created for streaming: {created_document['id']}")
+    except Exception as db_error:
+        logger.error(f"Database insert failed: {str(db_error)}")
+        raise HTTPException(status_code=500, detail=f"Error creating document: {str(db_error)}")
+
+    document_id = created_document["id"]
+    # Shared with the post-stream compliance task; only set once generation completes
+    generation_state: Dict[str, Any] = {"content": None}
+
+    async def event_stream():
+        chunks: List[str] = []
+        finished = False
+        yield _sse_event("document", created_document)
+        try:
+            async for chunk in stream_legal_document(
+                notes=document_request.notes,
+                user_id=user["id"],
+                title=document_request.title,
+                document_type=document_request.document_type,
+                area_of_law=document_request.area_of_law,
+                user_profile_data=user_profile_data,
+                client_profile_id=document_request.client_profile_id,
+                client_profile_data=client_profile_data,
+                jurisdiction=document_request.jurisdiction,
+                county=document_request.county,
+                date_of_application=document_request.date_of_application,
+                case_number=document_request.case_number,
+            ):
+                chunks.append(chunk)
+                yield _sse_event("chunk", {"content": chunk})
+
+            generated_content = "".join(chunks)
+            update_response = supabase.from_("documents").update({
+                "content": generated_content,
+                "status": "draft",
+                "compliance_check_results": PENDING_COMPLIANCE_RESULTS,
+                "updated_at": datetime.utcnow().isoformat()
+            }).eq("id", document_id).execute()
+            finished = True
+            generation_state["content"] = generated_content
+            schedule_document_embedding({**created_document, "content": generated_content})
+            logger.info(f"Streamed document generation complete: {document_id}")
+            yield _sse_event("done", update_response.data[0] if update_response.data else {**created_document, "content": generated_content, "status": "draft"})
+        except Exception as e:
+            logger.error(f"Streamed generation failed for document {document_id}: {str(e)}\n{traceback.format_exc()}")
+            yield _sse_event("error", {"detail": f"Failed to generate document: {str(e)}"})
+        finally:
+            if not finished:
+                # Keep whatever was produced so the user does not lose a partially generated draft
+                try:
+                    supabase.from_("documents").update({
+                        "content": "".join(chunks),
+                        "status": "failed",
+                        "updated_at": datetime.utcnow().isoformat()
+                    }).eq("id", document_id).execute()
+                except Exception as db_error:
+                    logger.error(f"Failed to mark document {document_id} as failed: {str(db_error)}")
+
+    async def queue_compliance_after_stream():
+        if generation_state["content"] is None:
+            return
+        await schedule_compliance_check(
+            document_id,
+            generation_state["content"],
+            document_request.jurisdiction,
+            document_request.document_type.value
+        )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(queue_compliance_after_stream)
+    )
+
 # Get All Documents
 @router.get("/list", tags=["Documents"], response_model=list[DocumentResponse])
 async def list_documents(
@@ -292,16 +447,127 @@ async def get_document(
             detail=f"Internal server error: {str(e)}"
         )
 
+# Similar Documents
+@router.get("/{document_id}/similar", tags=["Documents"])
+async def get_similar_documents(
+    document_id: str,
+    limit: int = Query(5, ge=1, le=settings.SIMILAR_DOCUMENTS_MAX_RESULTS),
+    user: dict = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    Find the user's documents most similar to this one, by cosine similarity of
+    their stored embeddings. No LLM call is made. If the document has not been
+    embedded yet, an empty list is returned with `indexed: false` and the user's
+    documents are embedded in the background.
+    """
+    try:
+        doc_response = supabase.from_("documents").select("id").eq("id", document_id).eq("user_id", user["id"]).execute()
+        if not doc_response.data:
+            raise HTTPException(status_code=404, detail=f"Document not found: {document_id}")
+
+        neighbours = await find_similar_documents(user["id"], document_id, limit)
+        if neighbours is None:
+            job_queue.submit(f"document_embeddings:sync:{user['id']}", sync_user_documents, user["id"])
+            return {"document_id": document_id, "indexed": False, "similar": []}
+
+        scores = dict(neighbours)
+        similar = []
+        if scores:
+            # Neighbours deleted since they were embedded drop out here
+            rows = supabase.from_("documents").select("id, title, status, created_at, updated_at").eq("user_id", user["id"]).in_("id", list(scores)).execute()
+            similar = sorted(
+                ({**row, "score": round(scores[str(row["id"])], 4)} for row in rows.data or []),
+                key=lambda row: row["score"],
+                reverse=True
+            )
+        return {"document_id": document_id, "indexed": True, "similar": similar}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in get_similar_documents: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+
 # Download Document
+def _attachment_headers(file_name: str) -> Dict[str, str]:
+    """Content-Disposition for a download, RFC 5987-encoded when the name is not plain ASCII (as FileResponse does)."""
+    quoted = quote(file_name)
+    if quoted != file_name:
+        return {"Content-Disposition": f"attachment; filename*=utf-8''{quoted}"}
+    return {"Content-Disposition": f'attachment; filename="{file_name}"'}
+
+def _bytes_download_response(data: bytes, file_name: str, media_type: str) -> Response:
+    """
+    Return rendered bytes as a download with a Content-Length.
+
+    Typical exports are sent straight from memory. Exports larger than
+    EXPORT_SPOOL_THRESHOLD_BYTES are moved into a spooled temporary file
+    (which rolls over to disk) and streamed from it, so a slow client does not
+    keep a large buffer alive in the worker.
+    """
+    headers = _attachment_headers(file_name)
+    if len(data) <= settings.EXPORT_SPOOL_THRESHOLD_BYTES:
+        return Response(content=data, media_type=media_type, headers=headers)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_THRESHOLD_BYTES)
+    spool.write(data)
+    spool.seek(0)
+    # Closing the spool removes its file
+    return _file_download_response(spool, len(data), file_name, media_type)
+
+def _file_download_response(file: BinaryIO, size: int, file_name: str, media_type: str) -> StreamingResponse:
+    """Stream an open file as a download and close it after the body is sent (or the client went away)."""
+    headers = _attachment_headers(file_name)
+    headers["Content-Length"] = str(size)
+
+    def chunks():
+        while chunk := file.read(EXPORT_STREAM_CHUNK_BYTES):
+            yield chunk
+
+    return StreamingResponse(chunks(), media_type=media_type, headers=headers, background=BackgroundTask(file.close))
+
+async def _export_response(title: str, content: str, fmt: str) -> Response:
+    """
+    Render a document for download and return it as a response.
+
+    With ARTIFACT_CACHE_ENABLED the file is served from the rendered artifact
+    cache, so unchanged documents are not rendered again. Otherwise it is
+    rendered in the render pool and sent from memory. A saturated render pool
+    answers 503.
+    """
+    file_name = f"{title.replace(' ', '_')}.{fmt}"
+    media_type = PDF_MEDIA_TYPE if fmt == "pdf" else DOCX_MEDIA_TYPE
+    try:
+        if settings.ARTIFACT_CACHE_ENABLED:
+            path = await artifact_cache.get_or_render(content, fmt)
+            try:
+                # Opened before returning: a later eviction only unlinks the name, the open file stays readable
+                cached = open(path, "rb")
+            except FileNotFoundError:
+                # Evicted between the lookup and the open
+                pass
+            else:
+                return _file_download_response(cached, os.fstat(cached.fileno()).st_size, file_name, media_type)
+        rendered = await render_pool.render(content, fmt)
+    except RenderPoolBusy as e:
+        logger.warning(f"Rejected {fmt} export: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="The export service is busy. Please try again shortly.",
+            headers={"Retry-After": str(int(settings.RENDER_POOL_QUEUE_TIMEOUT_SECONDS))}
+        )
+    return _bytes_download_response(rendered, file_name, media_type)
+
 @router.get("/{document_id}/download", tags=["Documents"])
 async def download_document(
     document_id: str,
     user: dict = Depends(get_current_user)
-) -> FileResponse:
+) -> Response:
     """
     Download a specific document by ID as a PDF file.
     """
-    temp_file_pdf_path = ""
     try:
         logger.info(f"Downloading document {document_id} for user {user['id']}")
         
@@ -355,143 +621,14 @@ async def download_document(
         document_content = document_data["content"]
         logger.info(f"Document {document_id} fetched successfully. Title: {document_title}")
         
-        # Convert Markdown to HTML
-        html_content = markdown.markdown(document_content)
-        
-        # Create a temporary PDF file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file_pdf:
-            temp_file_pdf_path = temp_file_pdf.name
-            doc = SimpleDocTemplate(
-                temp_file_pdf_path,
-                pagesize=letter,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=72
-            )
-
-            # Create and modify styles
-            styles = getSampleStyleSheet()
-            
-            # Create new ParagraphStyle instances inheriting from default styles
-            normal_style = ParagraphStyle(name='Normal', parent=styles['Normal'], fontName='Helvetica', fontSize=10, leading=12)
-            h1_style = ParagraphStyle(name='h1', parent=styles['h1'], fontName='Helvetica-Bold', fontSize=20, leading=24, spaceAfter=12)
-            h2_style = ParagraphStyle(name='h2', parent=styles['h2'], fontName='Helvetica-Bold', fontSize=16, leading=18, spaceAfter=9)
-            h3_style = ParagraphStyle(name='h3', parent=styles['h3'], fontName='Helvetica-Bold', fontSize=14, leading=16, spaceAfter=7)
-
-            # Add custom list item text style
-            styles.add(ParagraphStyle(name='ListItemText', parent=normal_style, leftIndent=36, bulletIndent=12))
-
-            # Define and add custom ListStyles
-            styles.add(ListStyle(name='BulletList',
-                                  parent=None,
-                                  bulletFontName='Helvetica',
-                                  bulletFontSize=10,
-                                  bulletIndent=12,
-                                  leftIndent=36,
-                                  rightIndent=0,
-                                  spaceBefore=6,
-                                  spaceAfter=6,
-                                  textColor=colors.black,
-                                  bulletType='bullet'))
-
-            styles.add(ListStyle(name='NumberList',
-                                  parent=None,
-                                  bulletFontName='Helvetica',
-                                  bulletFontSize=10,
-                                  bulletIndent=12,
-                                  leftIndent=36,
-                                  rightIndent=0,
-                                  spaceBefore=6,
-                                  spaceAfter=6,
-                                  textColor=colors.black,
-                                  bulletType='1'))
-
-            # Parse the HTML content with BeautifulSoup to identify elements
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            story = []
-
-            # Find all relevant elements (headings, paragraphs, lists, horizontal rules)
-            # This approach avoids relying directly on soup.body.children which can be None
-            content_elements = soup.find_all(['h1', 'h2', 'h3', 'p', 'ul', 'ol', 'hr'])
-
-            if not content_elements and html_content.strip():
-                # If no structured HTML elements are found, render the entire HTML content as a single paragraph
-                story.append(Paragraph(html_content.strip(), normal_style))
-            else:
-                for element in content_elements:
-                    # Handle headings
-                    if element.name == 'h1':
-                        story.append(Paragraph(element.get_text(), h1_style))
-                    elif element.name == 'h2':
-                        story.append(Paragraph(element.get_text(), h2_style))
-                    elif element.name == 'h3':
-                        story.append(Paragraph(element.get_text(), h3_style))
-                    # Handle paragraphs
-                    elif element.name == 'p':
-                        story.append(Paragraph(element.get_text(), normal_style))
-                    # Handle unordered and ordered lists
-                    elif element.name in ['ul', 'ol']:
-                        list_items = []
-                        for li in element.find_all('li', recursive=False):
-                            # Use styles['ListItemText'] as it's added via styles.add()
-                            list_items.append(Paragraph(li.get_text(), styles['ListItemText']))
-
-                        if element.name == 'ul':
-                            story.append(ListFlowable(list_items,
-                                                      bulletType='bullet',
-                                                      start=None,
-                                                      bulletDinkus='• ',
-                                                      leftIndent=36,
-                                                      bulletIndent=12,
-                                                      spaceBefore=6,
-                                                      spaceAfter=6,
-                                                      style=styles['BulletList']))
-                        else: # ol
-                            story.append(ListFlowable(list_items,
-                                                      bulletType='1',
-                                                      start=None,
-                                                      leftIndent=36,
-                                                      bulletIndent=12,
-                                                      spaceBefore=6,
-                                                      spaceAfter=6,
-                                                      style=styles['NumberList']))
-                    # Handle horizontal rules
-                    elif element.name == 'hr':
-                        story.append(HRFlowable(width='100%', thickness=1, color=colors.black, spaceBefore=6, spaceAfter=6))
-                    # No need for isinstance(element, str) here as find_all returns only Tag objects
-
-            if not story and html_content.strip(): # Final fallback for plain content not caught above
-                story.append(Paragraph(html_content.strip(), normal_style))
-
-            # Build the PDF
-            doc.build(story)
-            logger.info(f"PDF generated successfully for document {document_id}")
-
-        # Define a cleanup function to delete the temporary file after the response is sent
-        def cleanup():
-            os.remove(temp_file_pdf_path)
-            logger.info(f"Temporary file {temp_file_pdf_path} cleaned up.")
-
-        # Return the file as a response with background task for cleanup
-        file_name = f"{document_title.replace(' ', '_')}.pdf"
-        logger.info(f"Returning PDF file: {file_name}")
-        return FileResponse(
-            path=temp_file_pdf_path,
-            filename=file_name,
-            media_type="application/pdf",
-            background=BackgroundTask(cleanup)
-        )
+        file_response = await _export_response(document_title, document_content, "pdf")
+        logger.info(f"Returning PDF file for document {document_id}")
+        return file_response
 
     except HTTPException:
-        if os.path.exists(temp_file_pdf_path):
-            os.remove(temp_file_pdf_path)
         raise
     except Exception as e:
         logger.critical(f"Critical error in download_document: {str(e)}\n{traceback.format_exc()}")
-        if os.path.exists(temp_file_pdf_path):
-            os.remove(temp_file_pdf_path)
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
@@ -501,11 +638,10 @@ async def download_document(
 async def download_document_docx(
     document_id: str,
     user: dict = Depends(get_current_user)
-) -> FileResponse:
+) -> Response:
     """
     Download a specific document by ID as a DOCX file.
     """
-    temp_file_docx_path = ""
     try:
         logger.info(f"Downloading DOCX document {document_id} for user {user['id']}")
         
@@ -558,166 +694,175 @@ async def download_document_docx(
         document_title = document_data["title"]
         document_content = document_data["content"]
         
-        # Create a new DOCX document
-        doc = DocxDocument()
-        
-        # Convert Markdown to HTML
-        html_content = markdown.markdown(document_content)
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Find all relevant elements (headings, paragraphs, lists, horizontal rules)
-        content_elements = soup.find_all(['h1', 'h2', 'h3', 'p', 'ul', 'ol', 'hr'])
-
-        if not content_elements and html_content.strip():
-            # If no structured HTML elements are found, treat the entire content as a single paragraph
-            doc.add_paragraph(html_content.strip())
-        else:
-            for element in content_elements:
-                if element.name and element.name.startswith('h') and element.name[1:].isdigit():
-                    level = int(element.name[1])
-                    doc.add_heading(element.get_text(), level=min(level, 9)) # Max heading level in docx is 9
-                elif element.name == 'p':
-                    doc.add_paragraph(element.get_text())
-                elif element.name == 'hr':
-                    doc.add_paragraph('----------------------------------------------------------------------------------------------------------------')
-                elif element.name in ['ul', 'ol']:
-                    for li in element.find_all('li', recursive=False):
-                        if element.name == 'ul':
-                            doc.add_paragraph('• ' + li.get_text(), style='List Bullet')
-                        else:
-                            # For ordered lists, python-docx handles numbering with 'List Number' style
-                            doc.add_paragraph(li.get_text(), style='List Number')
-                # No need for isinstance(element, str) here as find_all returns only Tag objects
-        
-        # Create a temporary DOCX file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as temp_file_docx:
-            temp_file_docx_path = temp_file_docx.name
-            doc.save(temp_file_docx_path)
-
-        # Define a cleanup function to delete the temporary file after the response is sent
-        def cleanup():
-            os.remove(temp_file_docx_path)
-            logger.info(f"Temporary DOCX file {temp_file_docx_path} cleaned up.")
-
-        file_name = f"{document_title.replace(' ', '_')}.docx"
-        return FileResponse(
-            path=temp_file_docx_path,
-            filename=file_name,
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            background=BackgroundTask(cleanup)
-        )
+        return await _export_response(document_title, document_content, "docx")
 
     except HTTPException:
-        if os.path.exists(temp_file_docx_path):
-            os.remove(temp_file_docx_path)
         raise
     except Exception as e:
         logger.critical(f"Critical error in download_document_docx: {str(e)}\n{traceback.format_exc()}")
-        if os.path.exists(temp_file_docx_path):
-            os.remove(temp_file_docx_path)
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
         )
 
+@router.post("/export", tags=["Documents"])
+async def export_documents(
+    export_request: BulkExportRequest,
+    user: dict = Depends(get_current_user)
+) -> StreamingResponse:
+    """
+    Download many documents, or all of a client's documents, as one ZIP archive.
+    The archive is streamed as documents finish rendering.
+    """
+    try:
+        max_documents = settings.BULK_EXPORT_MAX_DOCUMENTS
+        document_ids = None
+        if export_request.document_ids:
+            document_ids = list(dict.fromkeys(str(document_id) for document_id in export_request.document_ids))
+            if len(document_ids) > max_documents:
+                raise HTTPException(status_code=400, detail=f"An export can contain at most {max_documents} documents.")
+        client_profile_id = str(export_request.client_profile_id) if export_request.client_profile_id else None
+
+        # One query resolves ownership, team sharing and collaboration for every document
+        documents = resolve_export_documents(user["id"], document_ids, client_profile_id, max_documents + 1)
+        if len(documents) > max_documents:
+            raise HTTPException(status_code=400, detail=f"An export can contain at most {max_documents} documents.")
+        if document_ids:
+            found = {str(document["id"]) for document in documents}
+            missing = [document_id for document_id in document_ids if document_id not in found]
+            if missing:
+                raise HTTPException(status_code=404, detail=f"Documents not found or not accessible: {', '.join(missing)}")
+        if not documents:
+            raise HTTPException(status_code=404, detail="No documents to export.")
+
+        fmt = export_request.format.value
+        archive_name = f"client_{client_profile_id[:8]}_documents.zip" if client_profile_id else "documents.zip"
+        logger.info(f"Exporting {len(documents)} documents as {fmt} for user {user['id']}")
+        return StreamingResponse(
+            stream_export_zip(documents, fmt),
+            media_type="application/zip",
+            headers=_attachment_headers(archive_name)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in export_documents: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 # Upload Evaluation
+async def _evaluate_and_save_upload(
+    user_id: str,
+    filename: str,
+    extracted_content: str,
+    use_cache: bool = True,
+    dedup: Optional[UploadDedup] = None
+) -> Dict[str, Any]:
+    """
+    Evaluate extracted upload content and save it as an evaluated document whose
+    compliance check is pending. Shared by the upload route and the evaluate job.
+    Results stored for an earlier upload of the same file are reused, and new
+    ones are stored for the next (see app/services/upload_dedup.py).
+    """
+    reused = reusable_results(dedup, extracted_content) if use_cache else {}
+    if "evaluation_response" in reused:
+        logger.info(f"Reusing evaluation of an earlier upload for: {filename}")
+        evaluation = reused["evaluation_response"]
+    else:
+        # Perform AI evaluation
+        logger.info(f"Performing AI evaluation for uploaded document: {filename}")
+        evaluation = (await evaluate_legal_document(document_content=extracted_content, use_cache=use_cache)).dict()
+        logger.info(f"AI evaluation complete for uploaded document: {filename}")
+        record_results(dedup, evaluation_key=evaluation_cache_key(extracted_content), evaluation_response=evaluation)
+    if dedup and dedup.record:
+        mark_reused(dedup, list(reused))
+
+    # Prepare document data for Supabase insertion
+    document_data = {
+        "user_id": user_id,
+        "title": filename,
+        "content": extracted_content,
+        "status": "evaluated",
+        "evaluation_response": evaluation, # Store the evaluation response as JSON
+        "compliance_check_results": reused.get("compliance_check_results", PENDING_COMPLIANCE_RESULTS)
+    }
+    if "compliance_sections" in reused:
+        document_data["compliance_sections"] = reused["compliance_sections"]
+
+    try:
+        response = supabase.from_("documents").insert(document_data).execute()
+        created_document = response.data[0]
+        logger.info(f"Uploaded document saved to database: {created_document['id']}")
+        schedule_document_embedding(created_document)
+        return created_document
+    except Exception as db_error:
+        logger.error(f"Database insert/update failed for uploaded document: {str(db_error)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error saving/evaluating uploaded document: {str(db_error)}"
+        )
+
+async def _schedule_upload_compliance(created_document: Dict[str, Any], extracted_content: str, use_cache: bool, dedup: Optional[UploadDedup]) -> None:
+    """
+    Queue the compliance check of an uploaded document, unless results of an earlier upload were reused.
+    Async so that, as a background task, it runs on the event loop where the job queue creates its tasks.
+    """
+    if created_document.get("compliance_check_results") != PENDING_COMPLIANCE_RESULTS:
+        return
+    # For uploaded documents, jurisdiction and type might need to be inferred or provided separately
+    # For now, we'll leave them as None or add logic to extract them if possible.
+    if dedup:
+        job_queue.submit(f"compliance:{created_document['id']}", check_and_record_compliance, dedup, created_document["id"], extracted_content, use_cache)
+    else:
+        await schedule_compliance_check(created_document["id"], extracted_content, None, None, use_cache)
+
+@register_job_handler("evaluate_upload")
+async def _evaluate_upload_job(user_id: str, payload: Dict[str, Any], report_progress) -> Dict[str, Any]:
+    use_cache = not payload.get("refresh", False)
+    await report_progress(10, "Evaluating document")
+    dedup = get_upload_dedup(user_id, payload.get("file_sha256"), lookup=use_cache)
+    created_document = await _evaluate_and_save_upload(user_id, payload["filename"], payload["content"], use_cache=use_cache, dedup=dedup)
+    await _schedule_upload_compliance(created_document, payload["content"], use_cache, dedup)
+    return created_document
+
 @router.post("/upload", tags=["Documents"], response_model=DocumentResponse)
 async def upload_document_for_evaluation(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    refresh: bool = Query(False, description="Bypass cached evaluation and compliance results"),
+    async_mode: bool = Query(False, description="Queue evaluation as a job and return 202 with its id"),
     user: dict = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
     Upload a document (PDF or DOCX) for content extraction and evaluation.
+    Identical content is served from the AI result cache unless `refresh` is set,
+    and a file uploaded before (within UPLOAD_DEDUP_SCOPE) reuses its extracted
+    text, evaluation and compliance results.
+    The compliance check is queued after the response is sent.
+    With `async_mode=true` the text is extracted here and the evaluation runs as a job.
     """
-    temp_file_path = ""
     try:
         logger.info(f"Received upload request for file: {file.filename}")
-        
-        # Save the uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file.filename.split(".")[-1]) as temp_file:
-            temp_file.write(await file.read())
-            temp_file_path = temp_file.name
-        logger.info(f"File saved temporarily to: {temp_file_path}")
-
-        extracted_content = ""
-        file_extension = file.filename.split(".")[-1].lower()
+        with await receive_upload(file, ("pdf", "docx")) as upload:
+            extracted_content, dedup = await extract_upload_content(upload, user["id"], use_cache=not refresh)
 
-        if file_extension == "pdf":
-            logger.info(f"Processing PDF file: {file.filename}")
-            try:
-                reader = PdfReader(temp_file_path)
-                for page in reader.pages:
-                    extracted_content += page.extract_text() or ""
-                logger.info("PDF content extracted successfully.")
-            except Exception as e:
-                logger.error(f"Error extracting text from PDF: {str(e)}")
-                raise HTTPException(status_code=500, detail=f"Error processing PDF file: {str(e)}")
-        elif file_extension == "docx":
-            logger.info(f"Processing DOCX file: {file.filename}")
-            try:
-                doc = DocxDocument(temp_file_path)
-                for paragraph in doc.paragraphs:
-                    extracted_content += paragraph.text + "\n"
-                logger.info("DOCX content extracted successfully.")
-            except Exception as e:
-                logger.error(f"Error extracting text from DOCX: {str(e)}")
-                raise HTTPException(status_code=500, detail=f"Error processing DOCX file: {str(e)}")
-        else:
-            logger.warning(f"Unsupported file type uploaded: {file.filename}")
-            raise HTTPException(
-                status_code=400,
-                detail="Unsupported file type. Please upload a PDF or DOCX file."
-            )
-        
         if not extracted_content.strip():
             raise HTTPException(status_code=400, detail="No content extracted from the document.")
 
-        # Perform AI evaluation
-        logger.info(f"Performing AI evaluation for uploaded document: {file.filename}")
-        evaluation_response = await evaluate_legal_document(document_content=extracted_content)
-        logger.info(f"AI evaluation complete for uploaded document: {file.filename}")
-
-        # Prepare document data for Supabase insertion
-        document_data = {
-            "user_id": user["id"],
-            "title": file.filename,
-            "content": extracted_content,
-            "status": "evaluated",
-            "evaluation_response": evaluation_response.dict() # Store the evaluation response as JSON
-        }
+        if async_mode:
+            job = await submit_job(user["id"], "evaluate_upload", {
+                "filename": file.filename,
+                "content": extracted_content,
+                "file_sha256": upload.sha256,
+                "refresh": refresh
+            })
+            return accepted_job_response(job)
 
-        try:
-            response = supabase.from_("documents").insert(document_data).execute()
-            created_document = response.data[0]
-            logger.info(f"Uploaded document saved to database: {created_document['id']}")
-
-            # Run compliance check after evaluation
-            compliance_result = await check_document_compliance(
-                document_content=extracted_content,
-                # For uploaded documents, jurisdiction and type might need to be inferred or provided separately
-                # For now, we'll leave them as None or add logic to extract them if possible.
-                jurisdiction=None,
-                document_type=None
-            )
+        created_document = await _evaluate_and_save_upload(user["id"], file.filename, extracted_content, use_cache=not refresh, dedup=dedup)
 
-            # Update the document with compliance check results
-            supabase.from_("documents").update({"compliance_check_results": compliance_result.dict()}).eq("id", created_document["id"]).execute()
-            created_document["compliance_check_results"] = compliance_result.dict()
-            logger.info(f"Compliance check completed and saved for uploaded document: {created_document['id']}")
-            
-            # Re-fetch the document to ensure all latest fields, including evaluation_response and compliance_check_results, are present
-            updated_document_response = supabase.from_("documents").select("*").eq("id", created_document["id"]).single().execute()
-            if not updated_document_response.data:
-                raise HTTPException(status_code=500, detail="Failed to retrieve updated document after compliance check.")
+        # Check compliance in the background once the response has been sent.
+        background_tasks.add_task(_schedule_upload_compliance, created_document, extracted_content, not refresh, dedup)
 
-            # Removed debug logging
-            return updated_document_response.data
-        except Exception as db_error:
-            logger.error(f"Database insert/update failed for uploaded document: {str(db_error)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error saving/evaluating uploaded document: {str(db_error)}"
-            )
+        return created_document
     except HTTPException:
         raise
     except Exception as e:
@@ -726,10 +871,169 @@ async def upload_document_for_evaluation(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
         )
-    finally:
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-            logger.info(f"Cleaned up temporary file: {temp_file_path}")
+
+# Batch Evaluation
+def _write_batch_evaluations(user_id: str, updates: List[Dict[str, Any]]) -> None:
+    """Write a group of evaluations back in one statement (migration 022)."""
+    if updates:
+        supabase.rpc("bulk_update_document_evaluations", {"p_user_id": user_id, "updates": updates}).execute()
+
+async def _evaluate_documents_batch(
+    user_id: str,
+    document_ids: List[str],
+    evaluation_criteria: str,
+    refresh: bool,
+    report_progress,
+    status: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Evaluate many of the user's documents with bounded concurrency and write the
+    results back in bulk. Documents that already have an evaluation are skipped
+    unless `refresh` is set, and the result cache is used for the rest, so a
+    retried job does not spend tokens on work it already did.
+    """
+    documents = []
+    for start in range(0, len(document_ids), 100):
+        response = supabase.from_("documents").select("id, content, evaluation_response").eq("user_id", user_id).in_("id", document_ids[start:start + 100]).execute()
+        documents.extend(response.data or [])
+    found_ids = {document["id"] for document in documents}
+    not_found = [document_id for document_id in document_ids if document_id not in found_ids]
+
+    skipped = [document["id"] for document in documents if document.get("evaluation_response") and not refresh]
+    to_evaluate = [document for document in documents if document["id"] not in skipped]
+    total = len(to_evaluate)
+    failed: List[Dict[str, str]] = []
+    pending_writes: List[Dict[str, Any]] = []
+    evaluated = 0
+    semaphore = asyncio.Semaphore(settings.BATCH_EVALUATION_CONCURRENCY)
+    await report_progress(5, f"Evaluating {total} documents")
+
+    def flush(batch: List[Dict[str, Any]]) -> None:
+        # A failed write marks its documents as failed instead of failing the whole job
+        nonlocal evaluated
+        try:
+            _write_batch_evaluations(user_id, batch)
+        except Exception as e:
+            logger.error(f"Batch evaluation write failed for {len(batch)} documents: {str(e)}")
+            evaluated -= len(batch)
+            failed.extend({"document_id": write["id"], "error": f"Could not save evaluation: {str(e)}"} for write in batch)
+
+    async def evaluate_one(document: Dict[str, Any]) -> None:
+        nonlocal evaluated
+        async with semaphore:
+            try:
+                if not (document.get("content") or "").strip():
+                    raise ValueError("Document has no content")
+                evaluation = await evaluate_legal_document(document["content"], evaluation_criteria, use_cache=not refresh)
+                pending_writes.append({"id": document["id"], "evaluation_response": evaluation.dict(), "status": status})
+                evaluated += 1
+            except Exception as e:
+                logger.error(f"Batch evaluation failed for document {document['id']}: {str(e)}")
+                failed.append({"document_id": document["id"], "error": str(e)})
+        if len(pending_writes) >= settings.BATCH_EVALUATION_WRITE_SIZE:
+            batch = pending_writes[:]
+            pending_writes.clear()
+            flush(batch)
+        await report_progress(5 + int(90 * (evaluated + len(failed)) / total), f"Evaluated {evaluated + len(failed)} of {total} documents")
+
+    await asyncio.gather(*[evaluate_one(document) for document in to_evaluate])
+    flush(pending_writes)
+    logger.info(f"Batch evaluation for user {user_id}: {evaluated} evaluated, {len(skipped)} skipped, {len(failed)} failed, {len(not_found)} not found")
+
+    return {
+        "requested": len(document_ids),
+        "evaluated": evaluated,
+        "skipped": skipped,
+        "failed": failed,
+        "not_found": not_found
+    }
+
+@register_job_handler("evaluate_batch")
+async def _evaluate_batch_job(user_id: str, payload: Dict[str, Any], report_progress) -> Dict[str, Any]:
+    return await _evaluate_documents_batch(
+        user_id,
+        payload["document_ids"],
+        payload.get("evaluation_criteria") or "General legal review",
+        payload.get("refresh", False),
+        report_progress,
+        status=payload.get("status")
+    )
+
+@router.post("/evaluate/batch", tags=["Documents"], status_code=202)
+async def evaluate_documents_batch(
+    batch_request: BatchEvaluationRequest,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Evaluate many existing documents in one background job.
+    Returns 202 with a job id; follow progress at /jobs/{job_id} or its events stream.
+    """
+    try:
+        document_ids = list(dict.fromkeys(str(document_id) for document_id in batch_request.document_ids))
+        if len(document_ids) > settings.BATCH_EVALUATION_MAX_DOCUMENTS:
+            raise HTTPException(status_code=400, detail=f"A batch can contain at most {settings.BATCH_EVALUATION_MAX_DOCUMENTS} documents.")
+
+        job = await submit_job(user["id"], "evaluate_batch", {
+            "document_ids": document_ids,
+            "evaluation_criteria": batch_request.evaluation_criteria,
+            "refresh": batch_request.refresh
+        })
+        return accepted_job_response(job)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in evaluate_documents_batch: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.post("/evaluate/batch/upload", tags=["Documents"], status_code=202)
+async def evaluate_uploaded_documents_batch(
+    files: List[UploadFile] = File(...),
+    evaluation_criteria: str = Form("General legal review"),
+    refresh: bool = Query(False, description="Bypass cached evaluation results"),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Upload many documents (PDF, DOCX, TXT), save them and evaluate them in one background job.
+    Returns 202 with a job id and the ids of the saved documents.
+    """
+    try:
+        if len(files) > settings.BATCH_EVALUATION_MAX_DOCUMENTS:
+            raise HTTPException(status_code=400, detail=f"A batch can contain at most {settings.BATCH_EVALUATION_MAX_DOCUMENTS} documents.")
+
+        # Files are received one after another; their text is extracted in parallel in the extraction pool
+        uploads = []
+        try:
+            for file in files:
+                uploads.append(await receive_upload(file))
+            extracted = await asyncio.gather(*(extract_upload_content(upload, user["id"], use_cache=not refresh) for upload in uploads))
+            extracted_contents = [content for content, _ in extracted]
+        finally:
+            for upload in uploads:
+                upload.close()
+
+        rows = []
+        for file, extracted_content in zip(files, extracted_contents):
+            if not extracted_content.strip():
+                raise HTTPException(status_code=400, detail=f"No content extracted from {file.filename}.")
+            rows.append({"user_id": user["id"], "title": file.filename, "content": extracted_content, "status": "uploaded"})
+
+        # One insert for the whole batch
+        response = supabase.from_("documents").insert(rows).execute()
+        document_ids = [document["id"] for document in response.data]
+        job_queue.submit("document_embeddings:batch_upload", index_documents, user["id"], response.data)
+
+        job = await submit_job(user["id"], "evaluate_batch", {
+            "document_ids": document_ids,
+            "evaluation_criteria": evaluation_criteria,
+            "refresh": refresh,
+            "status": "evaluated"
+        })
+        return accepted_job_response(job, document_ids=document_ids)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in evaluate_uploaded_documents_batch: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 # Update Document
 @router.put("/{document_id}", tags=["Documents"], response_model=DocumentResponse)
@@ -810,6 +1114,7 @@ async def update_document(
                 )
 
             logger.info(f"Document {document_id} updated successfully.")
+            schedule_document_embedding(response.data[0])
             return response.data[0]
         except Exception as db_error:
             logger.error(f"Database update failed: {str(db_error)}")
@@ -847,6 +1152,7 @@ async def delete_document(
                     detail=f"Document not found: {document_id}"
                 )
             logger.info(f"Document deleted: {document_id}")
+            job_queue.submit(f"document_embeddings:remove:{document_id}", remove_document, user["id"], document_id)
             return {"message": "Document deleted successfully"}
         except Exception as delete_error:
             logger.error(f"Delete failed: {str(delete_error)}")
@@ -904,36 +1210,41 @@ async def archive_document(
 @router.post("/{document_id}/run-compliance", tags=["Documents"], response_model=DocumentResponse)
 async def run_compliance_check_on_document(
     document_id: str,
+    refresh: bool = Query(False, description="Bypass the cached compliance result"),
     user: dict = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
     Manually runs the compliance check on an existing document.
+    Only sections edited since the last check are re-checked; findings for the rest are reused.
+    Pass `refresh=true` to force a fresh check of every section.
     """
     try:
         logger.info(f"Running compliance check on document {document_id} for user {user['id']}")
 
         # Fetch the document content
-        response = supabase.from_("documents").select("content", "title", "created_at", "client_profile_id").eq("id", document_id).eq("user_id", user["id"]).single().execute()
+        response = supabase.from_("documents").select("content", "title", "created_at", "client_profile_id", "compliance_sections").eq("id", document_id).eq("user_id", user["id"]).single().execute()
         if not response.data:
             raise HTTPException(status_code=404, detail=f"Document not found or not accessible: {document_id}")
 
         document_content = response.data["content"]
-        # For re-running, we might not have document_type or jurisdiction readily available
-        # You may want to store these with the document initially, or infer them here if possible.
-        # For now, we'll pass None for simplicity if not available from document metadata.
         document_title = response.data["title"]
         created_at = response.data["created_at"]
         client_profile_id = response.data["client_profile_id"]
 
-        # Run compliance check
-        compliance_result = await check_document_compliance(
+        # Run compliance check; only sections changed since the last check are sent
+        compliance_result, compliance_sections = await check_document_compliance_incremental(
             document_content=document_content,
-            jurisdiction=None, # To be improved if jurisdiction is stored with the document
-            document_type=None # To be improved if document_type is stored with the document
+            previous_state=response.data.get("compliance_sections"),
+            jurisdiction=None, # Taken from the stored findings (set by the check after generation)
+            document_type=None,
+            use_cache=not refresh
         )
 
         # Update the document with new compliance results
-        update_response = supabase.from_("documents").update({"compliance_check_results": compliance_result.dict()}).eq("id", document_id).execute()
+        update_response = supabase.from_("documents").update({
+            "compliance_check_results": {**compliance_result.dict(), "status": "completed"},
+            "compliance_sections": compliance_sections
+        }).eq("id", document_id).execute()
         if not update_response.data:
             raise HTTPException(status_code=500, detail="Failed to update document with compliance results.")
 
@@ -952,94 +1263,138 @@ async def run_compliance_check_on_document(
     finally:
         pass
 # Enhance with AI: Upload and Enhance a New Document
+async def _enhance_and_save_upload(user_id: str, filename: str, extracted_content: str, instructions: Optional[str] = None) -> Dict[str, Any]:
+    """Enhance extracted upload content and save it as a new document."""
+    enhanced_content = await enhance_document_with_ai(extracted_content, instructions)
+
+    # Save to database
+    document_data = {
+        "user_id": user_id,
+        "title": filename,
+        "content": enhanced_content,
+        "status": "enhanced"
+    }
+    response = supabase.from_("documents").insert(document_data).execute()
+    created_document = response.data[0]
+    logger.info(f"Enhanced document saved to database: {created_document['id']}")
+    schedule_document_embedding(created_document)
+    return created_document
+
+@register_job_handler("enhance_upload")
+async def _enhance_upload_job(user_id: str, payload: Dict[str, Any], report_progress) -> Dict[str, Any]:
+    await report_progress(10, "Enhancing document")
+    return await _enhance_and_save_upload(user_id, payload["filename"], payload["content"], payload.get("instructions"))
+
 @router.post("/enhance/upload", tags=["Documents"], response_model=DocumentResponse, status_code=HTTP_201_CREATED)
 async def enhance_upload_document(
     file: UploadFile = File(...),
     instructions: Optional[str] = Form(None),
+    async_mode: bool = Query(False, description="Queue enhancement as a job and return 202 with its id"),
     user: dict = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
     Upload a document (PDF, DOCX, TXT), enhance it with AI, and save as a new document.
+    With `async_mode=true` the text is extracted here and the enhancement runs as a job.
     """
-    temp_file_path = ""
     try:
         logger.info(f"Received enhance-upload request for file: {file.filename}")
-        # Save the uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file.filename.split(".")[-1]) as temp_file:
-            temp_file.write(await file.read())
-            temp_file_path = temp_file.name
-        logger.info(f"File saved temporarily to: {temp_file_path}")
-
-        extracted_content = ""
-        file_extension = file.filename.split(".")[-1].lower()
-        if file_extension == "pdf":
-            reader = PdfReader(temp_file_path)
-            for page in reader.pages:
-                extracted_content += page.extract_text() or ""
-        elif file_extension == "docx":
-            doc = DocxDocument(temp_file_path)
-            for paragraph in doc.paragraphs:
-                extracted_content += paragraph.text + "\n"
-        elif file_extension == "txt":
-            with open(temp_file_path, "r", encoding="utf-8") as f:
-                extracted_content = f.read()
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file type. Please upload a PDF, DOCX, or TXT file.")
+        with await receive_upload(file) as upload:
+            extracted_content, _ = await extract_upload_content(upload, user["id"])
 
         if not extracted_content.strip():
             raise HTTPException(status_code=400, detail="No content extracted from the document.")
 
-        # Enhance with AI
-        enhanced_content = enhance_document_with_ai(extracted_content, instructions)
+        if async_mode:
+            job = await submit_job(user["id"], "enhance_upload", {
+                "filename": file.filename,
+                "content": extracted_content,
+                "instructions": instructions
+            })
+            return accepted_job_response(job)
 
-        # Save to database
-        document_data = {
-            "user_id": user["id"],
-            "title": file.filename,
-            "content": enhanced_content,
-            "status": "enhanced"
-        }
-        response = supabase.from_("documents").insert(document_data).execute()
-        created_document = response.data[0]
-        logger.info(f"Enhanced document saved to database: {created_document['id']}")
-        return created_document
+        return await _enhance_and_save_upload(user["id"], file.filename, extracted_content, instructions)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Unexpected error in enhance_upload_document: {str(e)}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
-    finally:
-        if temp_file_path and os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
 
 # Enhance with AI: Enhance an Existing Document
+async def _enhance_existing(
+    user_id: str,
+    document_id: str,
+    instructions: str,
+    mode: EnhancementMode = EnhancementMode.PATCH,
+    sections: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Enhance a document the user owns and update it in place. In patch mode only
+    the changed sections come back from the model; documents with a single
+    section are always rewritten whole.
+    """
+    # Fetch the document
+    doc_response = supabase.from_("documents").select("*").eq("id", document_id).single().execute()
+    if not doc_response.data:
+        raise HTTPException(status_code=404, detail="Document not found.")
+    document = doc_response.data
+    if document["user_id"] != user_id:
+        raise HTTPException(status_code=403, detail="You do not have permission to enhance this document.")
+
+    # Enhance with AI
+    if mode == EnhancementMode.PATCH and (sections or len(split_sections(document["content"] or "")) > 1):
+        try:
+            result = await enhance_document_sections(document["content"], instructions, sections)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        enhanced_content = result.content
+        logger.info(f"Applied {len(result.patches)} section patches to document {document_id}")
+    else:
+        enhanced_content = await enhance_document_with_ai(document["content"], instructions)
+
+    # Update the document
+    update_data = {"content": enhanced_content, "status": "enhanced"}
+    supabase.from_("documents").update(update_data).eq("id", document_id).execute()
+    document.update(update_data)
+    logger.info(f"Document {document_id} enhanced and updated.")
+    schedule_document_embedding(document)
+    return document
+
+@register_job_handler("enhance_document")
+async def _enhance_document_job(user_id: str, payload: Dict[str, Any], report_progress) -> Dict[str, Any]:
+    await report_progress(10, "Enhancing document")
+    return await _enhance_existing(
+        user_id,
+        payload["document_id"],
+        payload["instructions"],
+        EnhancementMode(payload.get("mode", EnhancementMode.PATCH)),
+        payload.get("sections")
+    )
+
 @router.post("/enhance/{document_id}", tags=["Documents"], response_model=DocumentResponse)
 async def enhance_existing_document(
     document_id: str,
     instructions: str = Body(..., embed=True),
+    sections: Optional[List[str]] = Body(None, embed=True, description="Section ids (e.g. \"s3\") or heading text to limit the enhancement to"),
+    mode: EnhancementMode = Query(EnhancementMode.PATCH, description="patch: only changed sections are returned and applied; rewrite: the whole document is regenerated"),
+    async_mode: bool = Query(False, description="Queue enhancement as a job and return 202 with its id"),
     user: dict = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
     Enhance an existing document by providing instructions. Updates the document in place.
+    By default the model returns patches for the sections it changes, which are applied here.
+    With `async_mode=true` the enhancement runs as a job.
     """
     try:
-        # Fetch the document
-        doc_response = supabase.from_("documents").select("*").eq("id", document_id).single().execute()
-        if not doc_response.data:
-            raise HTTPException(status_code=404, detail="Document not found.")
-        document = doc_response.data
-        if document["user_id"] != user["id"]:
-            raise HTTPException(status_code=403, detail="You do not have permission to enhance this document.")
-
-        # Enhance with AI
-        enhanced_content = enhance_document_with_ai(document["content"], instructions)
-
-        # Update the document
-        update_data = {"content": enhanced_content, "status": "enhanced"}
-        supabase.from_("documents").update(update_data).eq("id", document_id).execute()
-        document.update(update_data)
-        logger.info(f"Document {document_id} enhanced and updated.")
-        return document
+        if async_mode:
+            job = await submit_job(user["id"], "enhance_document", {
+                "document_id": document_id,
+                "instructions": instructions,
+                "mode": mode.value,
+                "sections": sections
+            })
+            return accepted_job_response(job)
+
+        return await _enhance_existing(user["id"], document_id, instructions, mode, sections)
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,100 @@
+from fastapi import APIRouter, HTTPException, Depends, Body
+from fastapi.responses import StreamingResponse
+from app.models.job_schemas import JobSubmitRequest, JobResponse, JobStatus
+from app.services.ai_jobs import submit_job, get_job, accepted_job_response, registered_job_types
+from app.utils.auth_utils import get_current_user
+import asyncio
+import json
+import logging
+import traceback
+from typing import Dict, Any
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# How often the events stream re-reads the job row
+EVENTS_POLL_INTERVAL_SECONDS = 1.0
+
+@router.post("", tags=["Jobs"], status_code=202)
+async def submit_ai_job(
+    job_request: JobSubmitRequest = Body(...),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Queue a long-running AI operation and return its job id.
+
+    The AI routes accept `async_mode=true`, which submits the matching job type
+    for you; this endpoint is the generic form.
+    """
+    try:
+        job = await submit_job(user["id"], job_request.job_type, job_request.payload)
+        return accepted_job_response(job)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in submit_ai_job: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/types", tags=["Jobs"])
+async def list_job_types() -> Dict[str, Any]:
+    """List the job types that can be submitted."""
+    return {"job_types": registered_job_types()}
+
+@router.get("/{job_id}", tags=["Jobs"], response_model=JobResponse)
+async def get_job_status(
+    job_id: str,
+    user: dict = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    Poll a job's status, progress and, once finished, its result or error.
+    """
+    try:
+        job = get_job(job_id, user["id"])
+        if not job:
+            raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in get_job_status: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.get("/{job_id}/events", tags=["Jobs"])
+async def stream_job_events(
+    job_id: str,
+    user: dict = Depends(get_current_user)
+) -> StreamingResponse:
+    """
+    Stream a job's progress as server-sent events until it finishes.
+
+    Events:
+    - `progress`: `{"status": ..., "progress": ..., "progress_message": ...}` whenever it changes
+    - `completed`: the finished job, including `result`
+    - `failed`: the finished job, including `error`
+    """
+    if not get_job(job_id, user["id"]):
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+
+    async def event_stream():
+        last_state = None
+        while True:
+            job = get_job(job_id, user["id"])
+            if not job:
+                yield f"event: failed\ndata: {json.dumps({'error': 'Job no longer exists.'})}\n\n"
+                return
+            state = (job["status"], job.get("progress"), job.get("progress_message"))
+            if state != last_state:
+                last_state = state
+                yield f"event: progress\ndata: {json.dumps({'status': job['status'], 'progress': job.get('progress'), 'progress_message': job.get('progress_message')})}\n\n"
+            if job["status"] in (JobStatus.COMPLETED.value, JobStatus.FAILED.value):
+                yield f"event: {job['status']}\ndata: {json.dumps(job, default=str)}\n\n"
+                return
+            await asyncio.sleep(EVENTS_POLL_INTERVAL_SECONDS)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
-from typing import Optional, Dict
+from fastapi.encoders import jsonable_encoder
+from typing import Optional, Dict, Any
 import logging
 
 from app.utils.auth_utils import get_current_user
 from app.services.ai_agent_research import conduct_deep_research
 from app.utils.db_utils import get_profile
+from app.services.ai_jobs import register_job_handler, submit_job, accepted_job_response
 from app.utils.research_utils import (
     create_research_history, 
     update_research_history,
@@ -36,112 +38,128 @@ class ResearchResponse(BaseModel):
     message: Optional[str] = None
     research_id: Optional[str] = None  # ID of saved research
 
+async def _run_research(user_id: str, request: ResearchRequest) -> ResearchResponse:
+    """Run a research request and optionally save it to the user's history. Shared by the route and the research job."""
+    # Verify user profile exists
+    user_profile = await get_profile(user_id)
+    if not user_profile:
+        raise HTTPException(status_code=404, detail="User profile not found")
+
+    # Conduct the research
+    research_result = await conduct_deep_research(
+        query=request.query,
+        clarifying_answers=request.clarifying_answers
+    )
+
+    research_id = None
+
+    # Save to history if requested
+    if request.save_to_history:
+        try:
+            if request.research_id:
+                # Update existing research
+                if request.clarifying_answers:
+                    # This is the final result
+                    update_data = ResearchHistoryUpdate(
+                        clarifying_answers=request.clarifying_answers,
+                        final_result=research_result,
+                        status=ResearchStatus.COMPLETED
+                    )
+                else:
+                    # This is updating preliminary result
+                    update_data = ResearchHistoryUpdate(
+                        final_result=research_result
+                    )
+
+                updated_research = await update_research_history(
+                    user_id=user_id,
+                    research_id=request.research_id,
+                    data=update_data
+                )
+                if updated_research:
+                    research_id = updated_research.id
+            else:
+                # Create new research entry
+                title = generate_research_title(request.query)
+
+                # Determine status and extract clarifying questions
+                clarifying_questions = None
+                status = ResearchStatus.PRELIMINARY
+
+                if research_result and "### Clarifying Questions:" in research_result:
+                    # Extract questions from result
+                    lines = research_result.split('\n')
+                    questions = []
+                    in_questions_section = False
+
+                    for line in lines:
+                        if "### Clarifying Questions:" in line:
+                            in_questions_section = True
+                            continue
+                        elif line.startswith("### ") and in_questions_section:
+                            break
+                        elif in_questions_section and line.strip() and line.strip()[0].isdigit() and '.' in line:
+                            questions.append(line.strip().split('.', 1)[1].strip())
+
+                    if questions:
+                        clarifying_questions = questions
+                        status = ResearchStatus.QUESTIONS_PENDING
+                elif request.clarifying_answers:
+                    status = ResearchStatus.COMPLETED
+
+                create_data = ResearchHistoryCreate(
+                    title=title,
+                    query=request.query,
+                    preliminary_result=research_result,
+                    clarifying_questions=clarifying_questions,
+                    status=status
+                )
+
+                created_research = await create_research_history(
+                    user_id=user_id,
+                    data=create_data
+                )
+                if created_research:
+                    research_id = created_research.id
+                    logging.info(f"Successfully created research history with ID: {research_id}")
+                else:
+                    logging.error("Failed to create research history - no data returned")
+        except Exception as e:
+            logging.error(f"Failed to save research to history: {str(e)}", exc_info=True)
+
+    return ResearchResponse(
+        result=research_result,
+        success=True,
+        message="Research completed successfully",
+        research_id=research_id
+    )
+
+@register_job_handler("research")
+async def _research_job(user_id: str, payload: Dict[str, Any], report_progress) -> Dict[str, Any]:
+    await report_progress(10, "Researching")
+    research_response = await _run_research(user_id, ResearchRequest(**payload))
+    return research_response.dict()
+
 @router.post("/conduct", response_model=ResearchResponse)
 async def conduct_research(
     request: ResearchRequest,
+    async_mode: bool = Query(False, description="Queue the research as a job and return 202 with its id"),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Conduct legal research on a given query.
     If clarifying_answers are not provided, the system will generate clarifying questions.
     If clarifying_answers are provided, it will conduct focused research.
+    With `async_mode=true` the research runs as a job (see /jobs).
     """
     try:
         user_id = current_user.get("id")
-        
-        # Verify user profile exists
-        user_profile = await get_profile(user_id)
-        if not user_profile:
-            raise HTTPException(status_code=404, detail="User profile not found")
-        
-        # Conduct the research
-        research_result = await conduct_deep_research(
-            query=request.query,
-            clarifying_answers=request.clarifying_answers
-        )
-        
-        research_id = None
-        
-        # Save to history if requested
-        if request.save_to_history:
-            try:
-                if request.research_id:
-                    # Update existing research
-                    if request.clarifying_answers:
-                        # This is the final result
-                        update_data = ResearchHistoryUpdate(
-                            clarifying_answers=request.clarifying_answers,
-                            final_result=research_result,
-                            status=ResearchStatus.COMPLETED
-                        )
-                    else:
-                        # This is updating preliminary result
-                        update_data = ResearchHistoryUpdate(
-                            final_result=research_result
-                        )
-                    
-                    updated_research = await update_research_history(
-                        user_id=user_id,
-                        research_id=request.research_id,
-                        data=update_data
-                    )
-                    if updated_research:
-                        research_id = updated_research.id
-                else:
-                    # Create new research entry
-                    title = generate_research_title(request.query)
-                    
-                    # Determine status and extract clarifying questions
-                    clarifying_questions = None
-                    status = ResearchStatus.PRELIMINARY
-                    
-                    if research_result and "### Clarifying Questions:" in research_result:
-                        # Extract questions from result
-                        lines = research_result.split('\n')
-                        questions = []
-                        in_questions_section = False
-                        
-                        for line in lines:
-                            if "### Clarifying Questions:" in line:
-                                in_questions_section = True
-                                continue
-                            elif line.startswith("### ") and in_questions_section:
-                                break
-                            elif in_questions_section and line.strip() and line.strip()[0].isdigit() and '.' in line:
-                                questions.append(line.strip().split('.', 1)[1].strip())
-                        
-                        if questions:
-                            clarifying_questions = questions
-                            status = ResearchStatus.QUESTIONS_PENDING
-                    elif request.clarifying_answers:
-                        status = ResearchStatus.COMPLETED
-                    
-                    create_data = ResearchHistoryCreate(
-                        title=title,
-                        query=request.query,
-                        preliminary_result=research_result,
-                        clarifying_questions=clarifying_questions,
-                        status=status
-                    )
-                    
-                    created_research = await create_research_history(
-                        user_id=user_id,
-                        data=create_data
-                    )
-                    if created_research:
-                        research_id = created_research.id
-                        logging.info(f"Successfully created research history with ID: {research_id}")
-                    else:
-                        logging.error("Failed to create research history - no data returned")
-            except Exception as e:
-                logging.error(f"Failed to save research to history: {str(e)}", exc_info=True)
-        
-        return ResearchResponse(
-            result=research_result,
-            success=True,
-            message="Research completed successfully",
-            research_id=research_id
-        )
+
+        if async_mode:
+            job = await submit_job(user_id, "research", jsonable_encoder(request))
+            return accepted_job_response(job)
+
+        return await _run_research(user_id, request)
     
     except Exception as e:
         logging.error(f"Error conducting research: {str(e)}")
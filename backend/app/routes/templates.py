@@ -3,8 +3,9 @@ from fastapi.security import HTTPAuthorizationCredentials
 from typing import List, Optional, Dict, Any
 from app.models.database import supabase
 from app.utils.auth_utils import get_current_user, security
-from docx import Document
-import io
+from app.services.job_queue import job_queue
+from app.services.template_index import template_index
+from app.utils.ingestion import receive_upload, extract_upload_text, upload_extension
 import logging
 import traceback
 import os
@@ -100,29 +101,19 @@ async def create_template(
         # Create storage path
         storage_path = f"legal-templates/{state}/{document_type}/{file.filename}"
         
-        # Extract content from DOCX
-        try:
-            content = ""
-            with open(f"/tmp/{file.filename}", "wb") as f:
-                f.write(await file.read())
-            doc = Document(f"/tmp/{file.filename}")
-            content = "\n".join([para.text for para in doc.paragraphs])
-            logger.info(f"Extracted content from {file.filename}")
-        except Exception as content_error:
-            logger.error(f"Content extraction failed: {str(content_error)}")
-            raise HTTPException(
-                status_code=400,
-                detail=f"Error extracting content from file: {str(content_error)}"
-            )
+        # Extract content from DOCX (size limits and extraction errors are raised as HTTP errors)
+        with await receive_upload(file, ("docx",)) as upload:
+            file_content = upload.read_bytes()
+            content = (await extract_upload_text(upload)).rstrip("\n")
+        logger.info(f"Extracted content from {file.filename}")
 
         # Upload to Supabase storage
         try:
-            with open(f"/tmp/{file.filename}", "rb") as f:
-                supabase.storage.from_("legal-templates").upload(
-                    storage_path,
-                    f.read(),
-                    {"content-type": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"}
-                )
+            supabase.storage.from_("legal-templates").upload(
+                storage_path,
+                file_content,
+                {"content-type": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"}
+            )
             logger.info(f"File uploaded to storage: {storage_path}")
         except Exception as upload_error:
             logger.error(f"File upload failed: {str(upload_error)}")
@@ -142,6 +133,7 @@ async def create_template(
             }
             response = supabase.from_("templates").insert(template_data).execute()
             logger.info(f"Template registered in database: {response.data[0]['id']}")
+            job_queue.submit("template_index:upsert", template_index.upsert_template, response.data[0]['id'])
         except Exception as db_error:
             logger.error(f"Database insert failed: {str(db_error)}")
             # Try to clean up uploaded file
@@ -406,6 +398,7 @@ async def delete_template(
         try:
             supabase.from_("templates").delete().eq("id", template_id).execute()
             logger.info(f"Deleted template from database: {template_id}")
+            job_queue.submit("template_index:remove", template_index.remove_template, template_id)
         except Exception as db_error:
             logger.error(f"Database deletion failed: {str(db_error)}")
             raise HTTPException(
@@ -508,17 +501,16 @@ async def upload_multiple_templates(
 
     if files:
         for file in files:
-            if not file.filename.endswith('.docx'):
+            if upload_extension(file.filename) != "docx":
                 logger.warning(f"Skipping {file.filename}: Only .docx files are supported for upload.")
                 uploaded_templates_info.append({"filename": file.filename, "status": "skipped", "reason": "Only .docx files are supported"})
                 continue
 
             try:
                 # Extract content from DOCX
-                content = ""
-                file_content = await file.read()
-                doc = Document(io.BytesIO(file_content))
-                content = "\n".join([para.text for para in doc.paragraphs])
+                with await receive_upload(file, ("docx",)) as upload:
+                    file_content = upload.read_bytes()
+                    content = (await extract_upload_text(upload)).rstrip("\n")
                 logger.info(f"Extracted content from {file.filename}")
 
                 # Determine state and document type from filename or metadata if available
@@ -563,6 +555,7 @@ async def upload_multiple_templates(
                     "content": content
                 }
                 response = supabase.from_("templates").insert(template_data).execute()
+                job_queue.submit("template_index:upsert", template_index.upsert_template, response.data[0]['id'])
                 uploaded_templates_info.append({"filename": file.filename, "status": "success", "template_id": response.data[0]['id'], "file_path": storage_path})
                 logger.info(f"Template registered in database: {response.data[0]['id']}")
 
@@ -608,6 +601,7 @@ async def upload_multiple_templates(
                         "content": content
                     }
                     response = supabase.from_("templates").insert(template_db_data).execute()
+                    job_queue.submit("template_index:upsert", template_index.upsert_template, response.data[0]['id'])
                     uploaded_templates_info.append({"template_name": template_name, "status": "success", "template_id": response.data[0]['id']})
                     logger.info(f"Template (content-based) registered in database: {response.data[0]['id']}")
 
@@ -1,44 +1,68 @@
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Tuple
 from pydantic import BaseModel
-from ..config import settings
-import os
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from dotenv import load_dotenv
 import logging
-from openai import OpenAI
+from app.services import llm_gateway
+from app.utils.document_sections import DocumentSection, split_sections, build_outline, section_hash
+from app.services.result_cache import result_cache, make_cache_key
+from app.services.job_queue import job_queue
+from app.models.database import supabase
 import json
 from fastapi import HTTPException
 
-# Load API Key
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("Missing OPENAI_API_KEY in .env file")
+# Configure logging
+logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-client = OpenAI(api_key=openai_api_key)
+# Bump whenever the compliance prompt changes so cached results are not reused
+COMPLIANCE_PROMPT_VERSION = "1"
 
-# Initialize GPT-4.5 Turbo
-llm = ChatOpenAI(model_name="gpt-4.5-turbo", temperature=0.7)
+# Bump whenever the section-level compliance prompt changes so stored section findings are not reused
+SECTION_COMPLIANCE_PROMPT_VERSION = "1"
 
-# Configure logging
-logger = logging.getLogger(__name__)
+# Stored on a document while its compliance check is queued or running
+PENDING_COMPLIANCE_RESULTS = {"status": "pending"}
+
+# Used to pick the worst status when merging section findings
+FORMATTING_SEVERITY = {"pass": 0, "needs review": 1, "fail": 2}
+JURISDICTION_FIT_SEVERITY = {"good": 0, "needs review": 1, "poor": 2}
+
+class SectionComplianceFinding(BaseModel):
+    section_id: str
+    heading: str
+    formatting: str
+    jurisdiction_fit: str
+    issues: List[str] = []
 
 class ComplianceCheckResults(BaseModel):
     formatting: str
     required_clauses: List[str]
     jurisdiction_fit: str
+    section_findings: List[SectionComplianceFinding] = []
 
 async def check_document_compliance(
     document_content: str,
     jurisdiction: Optional[str] = None,
-    document_type: Optional[str] = None
+    document_type: Optional[str] = None,
+    use_cache: bool = True
 ) -> ComplianceCheckResults:
     """
     Analyzes a document for compliance with legal formatting, required clauses,
     and jurisdiction-specific requirements using an AI agent.
+    Identical input is served from the result cache unless `use_cache` is False.
     """
+    cache_key = make_cache_key(
+        "compliance",
+        document_content,
+        model=llm_gateway.resolve_model("compliance"),
+        prompt_version=COMPLIANCE_PROMPT_VERSION,
+        jurisdiction=jurisdiction,
+        document_type=document_type
+    )
+    if use_cache and result_cache:
+        cached = await result_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Compliance check served from result cache.")
+            return ComplianceCheckResults(**cached)
+
     try:
         # Construct system message for the compliance agent
         system_message = f"""You are a highly specialized legal compliance agent. Your primary goal is to analyze legal documents for adherence to specified formatting rules, identification of required clauses, and overall fit for a given jurisdiction. You must provide your analysis in a structured JSON format.
@@ -88,9 +112,9 @@ async def check_document_compliance(
         user_message = "\n".join(user_message_parts)
 
         logger.info("Calling OpenAI for compliance check...")
-        response = client.chat.completions.create(
-            model="gpt-4.1",  # Using gpt-4.1 as per generate agent
-            messages=[
+        response = await llm_gateway.chat_completion(
+            "compliance",
+            [
                 {"role": "system", "content": system_message},
                 {"role": "user", "content": user_message}
             ],
@@ -104,12 +128,216 @@ async def check_document_compliance(
 
         # Parse the JSON response
         compliance_data = json.loads(raw_response_content)
-        
-        return ComplianceCheckResults(**compliance_data)
+        compliance_result = ComplianceCheckResults(**compliance_data)
+        if result_cache:
+            await result_cache.set(cache_key, "compliance", compliance_result.dict())
+        return compliance_result
 
     except json.JSONDecodeError as e:
         logger.error(f"JSON decoding error in compliance agent response: {e}")
         raise HTTPException(status_code=500, detail="Failed to parse compliance check response from AI.")
     except Exception as e:
         logger.error(f"Error during compliance check: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to perform compliance check: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to perform compliance check: {str(e)}")
+
+def _worst(values: List[str], severity: Dict[str, int]) -> str:
+    return max(values, key=lambda value: severity.get(value.strip().lower(), 1))
+
+async def _check_sections(
+    sections: List[DocumentSection],
+    outline: str,
+    previous_required_clauses: Optional[List[str]],
+    jurisdiction: Optional[str],
+    document_type: Optional[str]
+) -> Dict[str, Any]:
+    """
+    Check only the given sections. The outline stands in for the rest of the
+    document so missing clauses can still be judged for the whole document.
+    """
+    system_message = """You are a highly specialized legal compliance agent. You review individual sections of a legal document for formatting and jurisdiction fit, and the document as a whole for missing required clauses. You are given the outline of the whole document and the full text of only some of its sections; sections not included were already reviewed and have not changed.
+
+    Your output MUST be a JSON object with the following keys:
+    - 'sections': a list with one object per provided section, each with 'id' (the section id as given), 'formatting' ("Pass", "Fail" or "Needs Review"), 'jurisdiction_fit' ("Good", "Needs Review" or "Poor") and 'issues' (a list of short strings, empty if none).
+    - 'required_clauses': a list of strings naming required clauses missing from the whole document, judged from the outline and the provided sections. If none are missing, return ["All required clauses present"].
+
+    Strictly adhere to the JSON format. Do not include any additional text or explanations outside the JSON object."""
+
+    user_message_parts = [f"Document outline:\n{outline}"]
+    if previous_required_clauses:
+        user_message_parts.append("Previously reported missing clauses: " + "; ".join(previous_required_clauses))
+    if jurisdiction:
+        user_message_parts.append(f"Jurisdiction: {jurisdiction}")
+    if document_type:
+        user_message_parts.append(f"Document Type: {document_type}")
+    for section in sections:
+        user_message_parts.append(f"--- Section {section.id} ---\n{section.text}")
+
+    response = await llm_gateway.chat_completion(
+        "compliance",
+        [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": "\n\n".join(user_message_parts)}
+        ],
+        temperature=0.3,
+        max_tokens=300 + 150 * len(sections),
+        response_format={ "type": "json_object" }
+    )
+    return json.loads(response.choices[0].message.content)
+
+async def check_document_compliance_incremental(
+    document_content: str,
+    previous_state: Optional[Dict[str, Any]] = None,
+    jurisdiction: Optional[str] = None,
+    document_type: Optional[str] = None,
+    use_cache: bool = True
+) -> Tuple[ComplianceCheckResults, Optional[Dict[str, Any]]]:
+    """
+    Check compliance section by section, re-sending only sections whose text
+    changed since the findings in `previous_state` were produced.
+
+    Parameters:
+    - document_content (str): The document text.
+    - previous_state (dict, optional): The `compliance_sections` state stored on the document by a previous check.
+    - jurisdiction (str, optional): Jurisdiction to check against. Defaults to the one in `previous_state`.
+    - document_type (str, optional): Type of the document. Defaults to the one in `previous_state`.
+    - use_cache (bool): When False every section is re-checked.
+
+    Returns:
+    - (ComplianceCheckResults, state): The merged result and the new state to store on the
+      document. Documents with a single section are checked whole and get no state.
+    """
+    # The documents table has no jurisdiction or document type; re-checks that
+    # don't know them keep the ones the stored findings were produced with.
+    previous_state = previous_state or {}
+    if jurisdiction is None:
+        jurisdiction = previous_state.get("jurisdiction")
+    if document_type is None:
+        document_type = previous_state.get("document_type")
+
+    sections = split_sections(document_content)
+    if len(sections) < 2:
+        return await check_document_compliance(document_content, jurisdiction, document_type, use_cache), None
+
+    context = {
+        "version": SECTION_COMPLIANCE_PROMPT_VERSION,
+        "model": llm_gateway.resolve_model("compliance"),
+        "jurisdiction": jurisdiction,
+        "document_type": document_type
+    }
+    reusable = use_cache and all(previous_state.get(key) == value for key, value in context.items())
+    known_findings: Dict[str, Dict[str, Any]] = previous_state.get("sections", {}) if reusable else {}
+    previous_required_clauses = previous_state.get("required_clauses") if reusable else None
+
+    outline = build_outline(sections)
+    outline_hash = section_hash(outline)
+    changed = [section for section in sections if section.hash not in known_findings]
+
+    try:
+        if changed or outline_hash != previous_state.get("outline_hash"):
+            logger.info(f"Compliance re-check of {len(changed)} of {len(sections)} sections")
+            response = await _check_sections(changed, outline, previous_required_clauses, jurisdiction, document_type)
+            new_findings = {finding.get("id"): finding for finding in response.get("sections", [])}
+            for section in changed:
+                finding = new_findings.get(section.id, {})
+                known_findings[section.hash] = {
+                    "formatting": finding.get("formatting", "Needs Review"),
+                    "jurisdiction_fit": finding.get("jurisdiction_fit", "Needs Review"),
+                    "issues": finding.get("issues", [])
+                }
+            required_clauses = response.get("required_clauses") or previous_required_clauses or []
+        else:
+            logger.info("Compliance findings reused for all sections; document unchanged")
+            required_clauses = previous_required_clauses or []
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON decoding error in section compliance response: {e}")
+        raise HTTPException(status_code=500, detail="Failed to parse compliance check response from AI.")
+    except Exception as e:
+        logger.error(f"Error during section compliance check: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to perform compliance check: {str(e)}")
+
+    section_findings = [
+        SectionComplianceFinding(section_id=section.id, heading=section.heading, **known_findings[section.hash])
+        for section in sections
+    ]
+    result = ComplianceCheckResults(
+        formatting=_worst([finding.formatting for finding in section_findings], FORMATTING_SEVERITY),
+        required_clauses=required_clauses,
+        jurisdiction_fit=_worst([finding.jurisdiction_fit for finding in section_findings], JURISDICTION_FIT_SEVERITY),
+        section_findings=section_findings
+    )
+    state = {
+        **context,
+        "outline_hash": outline_hash,
+        "required_clauses": required_clauses,
+        # Only findings for the current sections are kept
+        "sections": {section.hash: known_findings[section.hash] for section in sections}
+    }
+    return result, state
+
+def compliance_results_key(document_content: str, jurisdiction: Optional[str] = None, document_type: Optional[str] = None) -> str:
+    """Identifies the compliance results of a document with the current model and (section) prompt versions."""
+    return make_cache_key(
+        "compliance_results",
+        document_content,
+        model=llm_gateway.resolve_model("compliance"),
+        prompt_version=f"{COMPLIANCE_PROMPT_VERSION}.{SECTION_COMPLIANCE_PROMPT_VERSION}",
+        jurisdiction=jurisdiction,
+        document_type=document_type
+    )
+
+async def run_compliance_check_job(
+    document_id: str,
+    document_content: str,
+    jurisdiction: Optional[str] = None,
+    document_type: Optional[str] = None,
+    use_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    Background job: run the compliance check for a document and store the
+    result on it with a "completed" or "failed" status, along with the
+    section findings used by the next incremental re-check. Returns the
+    fields written to the document.
+    """
+    update_data: Dict[str, Any] = {}
+    try:
+        previous = supabase.from_("documents").select("compliance_sections").eq("id", document_id).limit(1).execute()
+        previous_state = previous.data[0].get("compliance_sections") if previous.data else None
+        compliance_result, compliance_sections = await check_document_compliance_incremental(
+            document_content=document_content,
+            previous_state=previous_state,
+            jurisdiction=jurisdiction,
+            document_type=document_type,
+            use_cache=use_cache
+        )
+        update_data["compliance_check_results"] = {**compliance_result.dict(), "status": "completed"}
+        update_data["compliance_sections"] = compliance_sections
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        logger.error(f"Compliance check failed for document {document_id}: {detail}")
+        update_data["compliance_check_results"] = {"status": "failed", "error": detail}
+
+    supabase.from_("documents").update(update_data).eq("id", document_id).execute()
+    logger.info(f"Compliance check {update_data['compliance_check_results']['status']} for document: {document_id}")
+    return update_data
+
+async def schedule_compliance_check(
+    document_id: str,
+    document_content: str,
+    jurisdiction: Optional[str] = None,
+    document_type: Optional[str] = None,
+    use_cache: bool = True
+) -> None:
+    """
+    Queue a compliance check for a document on the background job queue.
+    Async so that Starlette background tasks run it on the event loop, where
+    the job queue creates its tasks, rather than in the threadpool.
+    """
+    job_queue.submit(
+        f"compliance:{document_id}",
+        run_compliance_check_job,
+        document_id,
+        document_content,
+        jurisdiction,
+        document_type,
+        use_cache
+    )
@@ -1,25 +1,19 @@
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
-from typing import Optional
+import json
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional
 
-# Load API Key
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("Missing OPENAI_API_KEY in .env file")
+from app.services import llm_gateway
+from app.utils.document_sections import DocumentSection, split_sections, build_outline
+from app.utils.token_utils import count_tokens
 
-# Initialize OpenAI client
-client = OpenAI(api_key=openai_api_key)
+logger = logging.getLogger(__name__)
 
-def enhance_document_with_ai(content: str, instructions: Optional[str] = None) -> str:
-    """
-    Enhance a document using OpenAI (or other LLM) based on optional instructions.
-    """
-    # Enhanced prompt with persona, context, and clear instructions
-    prompt = """
-    You are a meticulous and experienced paralegal AI assistant specializing in contract law. Your task is to enhance the following legal document.
+# Headroom over the input size for a whole-document rewrite, so long documents are not cut off
+REWRITE_OUTPUT_HEADROOM = 1.3
+# Tokens allowed for a patch response beyond the text of the sections it may touch
+PATCH_OUTPUT_OVERHEAD_TOKENS = 512
 
+ENHANCEMENT_GUIDELINES = """
     **Document Analysis and Enhancement Guidelines:**
 
     1.  **Clarity and Conciseness:** Review the document for ambiguous or convoluted language. Suggest rephrasing to improve clarity and conciseness without altering the legal meaning.
@@ -27,7 +21,25 @@ def enhance_document_with_ai(content: str, instructions: Optional[str] = None) -
     3.  **Completeness:** Identify any missing standard clauses that are typically found in a document of this nature (e.g., Confidentiality, Force Majeure, Governing Law).
     4.  **Risk Identification:** Flag any clauses that could pose a potential risk, such as one-sided indemnification or ambiguous liability limitations.
     5.  **Formatting and Structure:** Ensure proper formatting, including consistent numbering and clause cross-referencing.
+"""
+
+class SectionPatch(NamedTuple):
+    section_id: str
+    op: str  # "replace", "insert_after" or "delete"
+    text: str = ""
+
+class EnhancementResult(NamedTuple):
+    content: str
+    patches: List[SectionPatch]
 
+async def enhance_document_with_ai(content: str, instructions: Optional[str] = None) -> str:
+    """
+    Enhance a document using OpenAI (or other LLM) based on optional instructions.
+    """
+    # Enhanced prompt with persona, context, and clear instructions
+    prompt = """
+    You are a meticulous and experienced paralegal AI assistant specializing in contract law. Your task is to enhance the following legal document.
+""" + ENHANCEMENT_GUIDELINES + """
     **User Instructions:**
     """
     if instructions:
@@ -37,16 +49,130 @@ def enhance_document_with_ai(content: str, instructions: Optional[str] = None) -
 
     prompt += f"**Original Document:**\n```legal\n{content}\n```\n\n**Enhanced Document:**"
 
-    response = client.chat.completions.create(
-        model="gpt-4-turbo",  # Use the same model as generate agent
-        messages=[
+    response = await llm_gateway.chat_completion(
+        "enhance",
+        [
             {"role": "system", "content": "You are a helpful legal document assistant."},
             {"role": "user", "content": prompt}
         ],
         temperature=0.4,
-        max_tokens=2048,
+        # The whole document comes back, so the cap grows with it (the token budget clamps it to the model)
+        max_tokens=int(count_tokens(content, llm_gateway.resolve_model("enhance")) * REWRITE_OUTPUT_HEADROOM) + PATCH_OUTPUT_OVERHEAD_TOKENS,
         presence_penalty=0.4,
         frequency_penalty=0.2
     )
     enhanced_content = response.choices[0].message.content
-    return enhanced_content
\ No newline at end of file
+    return enhanced_content
+
+def select_sections(sections: List[DocumentSection], selectors: List[str]) -> List[DocumentSection]:
+    """Sections matching any selector, by id ("s3") or by case-insensitive heading substring."""
+    wanted = [selector.strip().lower() for selector in selectors if selector.strip()]
+    return [
+        section for section in sections
+        if any(selector == section.id or selector in section.heading.lower() for selector in wanted)
+    ]
+
+def apply_section_patches(sections: List[DocumentSection], patches: List[SectionPatch]) -> str:
+    """
+    Apply patch operations to a document's sections and return the new content.
+    Patches naming unknown sections are skipped.
+    """
+    if not patches:
+        return "".join(section.text for section in sections)
+    replacements: Dict[str, Optional[str]] = {}
+    insertions: Dict[str, List[str]] = {}
+    known_ids = {section.id for section in sections}
+    for patch in patches:
+        if patch.section_id not in known_ids:
+            logger.warning(f"Skipping patch for unknown section {patch.section_id}")
+            continue
+        if patch.op == "delete":
+            replacements[patch.section_id] = None
+        elif patch.op == "insert_after":
+            insertions.setdefault(patch.section_id, []).append(patch.text)
+        else:
+            replacements[patch.section_id] = patch.text
+
+    def with_break(text: str) -> str:
+        # Keep sections separated by a blank line, as in generated documents
+        return text.rstrip("\n") + "\n\n"
+
+    parts: List[str] = []
+    for section in sections:
+        if section.id in replacements:
+            if replacements[section.id] is not None:
+                parts.append(with_break(replacements[section.id]))
+        else:
+            parts.append(section.text)
+        for text in insertions.get(section.id, []):
+            if parts:
+                parts[-1] = with_break(parts[-1])
+            parts.append(with_break(text))
+    return "".join(parts).rstrip("\n") + "\n"
+
+async def enhance_document_sections(
+    content: str,
+    instructions: Optional[str] = None,
+    section_selectors: Optional[List[str]] = None
+) -> EnhancementResult:
+    """
+    Enhance a document by asking for patch operations on its sections instead of
+    the whole document back, so output tokens scale with the size of the change.
+
+    Parameters:
+    - content (str): The document content.
+    - instructions (str, optional): What to change.
+    - section_selectors (list, optional): Section ids or heading text to limit the enhancement to.
+      Only the selected sections are sent, with an outline of the rest.
+
+    Returns:
+    - EnhancementResult: The patched content and the patches that were applied.
+    """
+    model = llm_gateway.resolve_model("enhance")
+    sections = split_sections(content)
+    if section_selectors:
+        editable = select_sections(sections, section_selectors)
+        if not editable:
+            raise ValueError(f"No sections match: {', '.join(section_selectors)}")
+        document_view = "**Document Outline:**\n" + build_outline(sections) + "\n\n**Sections to Enhance:**\n"
+    else:
+        editable = sections
+        document_view = "**Document Sections:**\n"
+    document_view += "\n".join(f"<<<{section.id}>>>\n{section.text.strip()}\n<<<end {section.id}>>>" for section in editable)
+
+    prompt = """
+    You are a meticulous and experienced paralegal AI assistant specializing in contract law. Your task is to enhance the following legal document section by section.
+""" + ENHANCEMENT_GUIDELINES + """
+    **Output Format:**
+    Return a JSON object {"patches": [...]} listing only the sections you change. Each patch has:
+    - "section_id": the id of one of the sections shown in full (e.g. "s3")
+    - "op": "replace" (rewrite the section), "insert_after" (add a new section after it) or "delete"
+    - "text": the complete new markdown text for "replace" and "insert_after", including the heading
+    Leave unchanged sections out entirely. Return {"patches": []} if nothing needs to change.
+
+    **User Instructions:**
+    """
+    prompt += f"{instructions}\n\n" if instructions else "No specific user instructions provided. Follow the general guidelines above.\n\n"
+    prompt += document_view
+
+    editable_tokens = sum(count_tokens(section.text, model) for section in editable)
+    response = await llm_gateway.chat_completion(
+        "enhance",
+        [
+            {"role": "system", "content": "You are a helpful legal document assistant. You reply with JSON only."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.4,
+        max_tokens=int(editable_tokens * REWRITE_OUTPUT_HEADROOM) + PATCH_OUTPUT_OVERHEAD_TOKENS,
+        response_format={"type": "json_object"}
+    )
+    data: Dict[str, Any] = json.loads(response.choices[0].message.content)
+
+    editable_ids = {section.id for section in editable}
+    patches = [
+        SectionPatch(str(patch.get("section_id")), patch.get("op", "replace"), patch.get("text") or "")
+        for patch in data.get("patches", [])
+        if str(patch.get("section_id")) in editable_ids and patch.get("op", "replace") in ("replace", "insert_after", "delete")
+    ]
+    logger.info(f"Enhancement returned {len(patches)} patches for {len(editable)} of {len(sections)} sections")
+    return EnhancementResult(apply_section_patches(sections, patches), patches)
@@ -1,42 +1,31 @@
-import os
+import asyncio
 import json
-from langchain_openai import ChatOpenAI
-from dotenv import load_dotenv
 # from docx import Document # Commented out as we'll handle content directly
 # from PyPDF2 import PdfReader # Commented out as we'll handle content directly
 import logging
-from openai import OpenAI
+from typing import List, Optional
+from app.config import settings
+from app.services import llm_gateway
+from app.services.result_cache import result_cache, make_cache_key
 from app.models.schemas import DocumentEvaluationResponse # Import the new schema
+from app.utils.token_utils import count_tokens, chunk_document
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Load API Key
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("Missing OPENAI_API_KEY in .env file")
+# Bump whenever the evaluation prompt changes so cached results are not reused
+EVALUATION_PROMPT_VERSION = "1"
 
-# Initialize OpenAI client
-client = OpenAI(api_key=openai_api_key)
+# Used to pick the most severe risk when merging chunk evaluations
+RISK_SEVERITY = {"low": 0, "moderate": 1, "medium": 1, "high": 2}
 
-# Initialize GPT-4.5 Turbo (This can be removed if not used elsewhere, but keeping for now)
-llm = ChatOpenAI(model_name="gpt-4.1", temperature=0.5)
-
-async def evaluate_legal_document(document_content: str, evaluation_criteria: str = "General legal review") -> DocumentEvaluationResponse:
-    """
-    Evaluate a legal document using AI.
-
-    Parameters:
-    - document_content (str): The content of the document to be evaluated.
-    - evaluation_criteria (str): Criteria to evaluate the document against.
-
-    Returns:
-    - DocumentEvaluationResponse: AI evaluation and feedback in a structured format.
-    """
-    try:
-        system_message = """You are a legal document AI evaluator. Your task is to provide a comprehensive and highly detailed evaluation of the legal document based on the given criteria. Analyze the document from different perspectives, identifying its strengths and weaknesses, potential loopholes, and strategic recommendations. You MUST return a JSON object conforming to the DocumentEvaluationResponse schema. Ensure all values in the 'metadata' field are strings, and 'parties' is a single comma-separated string. In addition to the existing fields, you must provide lists for 'weaknesses', 'strengths', 'recommendations_for_update', and 'strategies_for_update'."""
-        user_message = f"""Evaluate the following legal document based on the criteria '{evaluation_criteria}':
+async def _evaluate_text(document_content: str, evaluation_criteria: str, part: Optional[str] = None) -> DocumentEvaluationResponse:
+    """Run one evaluation call. `part` (e.g. "part 2 of 5") marks a chunk of a longer document."""
+    system_message = """You are a legal document AI evaluator. Your task is to provide a comprehensive and highly detailed evaluation of the legal document based on the given criteria. Analyze the document from different perspectives, identifying its strengths and weaknesses, potential loopholes, and strategic recommendations. You MUST return a JSON object conforming to the DocumentEvaluationResponse schema. Ensure all values in the 'metadata' field are strings, and 'parties' is a single comma-separated string. In addition to the existing fields, you must provide lists for 'weaknesses', 'strengths', 'recommendations_for_update', and 'strategies_for_update'."""
+    part_note = ""
+    if part:
+        part_note = f"\n\nThis is {part} of a longer document. Evaluate only the text below; other parts are evaluated separately and the findings are merged."
+    user_message = f"""Evaluate the following legal document based on the criteria '{evaluation_criteria}':{part_note}
 
 Document Content:
 {document_content}
@@ -51,23 +40,134 @@ Provide your evaluation and feedback as a JSON object with the following keys:
 - 'strengths' (list of strings highlighting the strong points of the document)
 - 'recommendations_for_update' (list of strings with concrete, actionable recommendations for improving the document)
 - 'strategies_for_update' (list of strings with broader strategies or approaches for updating the document)"""
-        
-        # Generate AI evaluation using OpenAI client
-        response = client.chat.completions.create(
-            model="gpt-4.1",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.5,
-            max_tokens=6000,
-            presence_penalty=0.6,
-            frequency_penalty=0.3,
-            response_format={ "type": "json_object" } # Ensure JSON output
+
+    # Generate AI evaluation through the LLM gateway
+    response = await llm_gateway.chat_completion(
+        "evaluate",
+        [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_message}
+        ],
+        temperature=0.5,
+        max_tokens=6000,
+        presence_penalty=0.6,
+        frequency_penalty=0.3,
+        response_format={ "type": "json_object" } # Ensure JSON output
+    )
+
+    evaluation_data = json.loads(response.choices[0].message.content)
+    return DocumentEvaluationResponse(**evaluation_data)
+
+def _unique(items: List[str]) -> List[str]:
+    """Drop repeated findings (case-insensitive), keeping the first occurrence."""
+    seen = set()
+    result = []
+    for item in items:
+        key = item.strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            result.append(item)
+    return result
+
+def merge_chunk_evaluations(evaluations: List[DocumentEvaluationResponse]) -> DocumentEvaluationResponse:
+    """
+    Merge per-chunk evaluations into one, deterministically and in document order:
+    the highest risk wins, list findings are concatenated without duplicates,
+    the first value seen for each metadata key is kept, and summaries and
+    strategies are labelled by part.
+    """
+    if len(evaluations) == 1:
+        return evaluations[0]
+
+    total = len(evaluations)
+    risk_score = max(
+        (evaluation.risk_score for evaluation in evaluations),
+        key=lambda risk: RISK_SEVERITY.get(risk.strip().lower(), 0)
+    )
+    metadata = {}
+    for evaluation in evaluations:
+        for key, value in evaluation.metadata.items():
+            if value and key not in metadata:
+                metadata[key] = value
+
+    def merged_list(field: str) -> List[str]:
+        return _unique([item for evaluation in evaluations for item in getattr(evaluation, field)])
+
+    def labelled(field: str) -> str:
+        return "\n\n".join(
+            f"Part {index} of {total}: {getattr(evaluation, field)}"
+            for index, evaluation in enumerate(evaluations, start=1)
+            if getattr(evaluation, field)
         )
-        
-        evaluation_data = json.loads(response.choices[0].message.content)
-        return DocumentEvaluationResponse(**evaluation_data)
+
+    return DocumentEvaluationResponse(
+        risk_score=risk_score,
+        loopholes=merged_list("loopholes"),
+        strategy=labelled("strategy"),
+        metadata=metadata,
+        evaluation_summary=labelled("evaluation_summary"),
+        weaknesses=merged_list("weaknesses"),
+        strengths=merged_list("strengths"),
+        recommendations_for_update=merged_list("recommendations_for_update"),
+        strategies_for_update=merged_list("strategies_for_update")
+    )
+
+async def _evaluate_in_chunks(document_content: str, evaluation_criteria: str, model: str) -> DocumentEvaluationResponse:
+    """Evaluate a long document section by section in parallel and merge the findings."""
+    chunks = chunk_document(document_content, settings.EVALUATION_CHUNK_TOKENS, model)
+    logger.info(f"Evaluating long document in {len(chunks)} chunks")
+    semaphore = asyncio.Semaphore(settings.EVALUATION_CHUNK_CONCURRENCY)
+
+    async def evaluate_chunk(index: int, chunk: str) -> DocumentEvaluationResponse:
+        async with semaphore:
+            return await _evaluate_text(chunk, evaluation_criteria, part=f"part {index} of {len(chunks)}")
+
+    evaluations = await asyncio.gather(*[
+        evaluate_chunk(index, chunk) for index, chunk in enumerate(chunks, start=1)
+    ])
+    return merge_chunk_evaluations(list(evaluations))
+
+def evaluation_cache_key(document_content: str, evaluation_criteria: str = "General legal review") -> str:
+    """Result cache key of an evaluation with the current model and prompt version."""
+    return make_cache_key(
+        "evaluation",
+        document_content,
+        model=llm_gateway.resolve_model("evaluate"),
+        prompt_version=EVALUATION_PROMPT_VERSION,
+        criteria=evaluation_criteria
+    )
+
+async def evaluate_legal_document(document_content: str, evaluation_criteria: str = "General legal review", use_cache: bool = True) -> DocumentEvaluationResponse:
+    """
+    Evaluate a legal document using AI.
+
+    Documents longer than EVALUATION_CHUNKING_THRESHOLD_TOKENS are split on
+    section boundaries, evaluated in parallel and merged into one response.
+
+    Parameters:
+    - document_content (str): The content of the document to be evaluated.
+    - evaluation_criteria (str): Criteria to evaluate the document against.
+    - use_cache (bool): Serve a cached result for identical input when available. A fresh result is always written back.
+
+    Returns:
+    - DocumentEvaluationResponse: AI evaluation and feedback in a structured format.
+    """
+    model = llm_gateway.resolve_model("evaluate")
+    cache_key = evaluation_cache_key(document_content, evaluation_criteria)
+    if use_cache and result_cache:
+        cached = await result_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Evaluation served from result cache.")
+            return DocumentEvaluationResponse(**cached)
+
+    try:
+        if count_tokens(document_content, model) > settings.EVALUATION_CHUNKING_THRESHOLD_TOKENS:
+            evaluation_result = await _evaluate_in_chunks(document_content, evaluation_criteria, model)
+        else:
+            evaluation_result = await _evaluate_text(document_content, evaluation_criteria)
+        if result_cache:
+            await result_cache.set(cache_key, "evaluation", evaluation_result.dict())
+        return evaluation_result
     except Exception as e:
         logger.error(f"Error evaluating legal document: {str(e)}")
         raise RuntimeError(f"Failed to evaluate legal document: {str(e)}")
@@ -1,29 +1,12 @@
-import os
-from langchain_openai import ChatOpenAI
-from dotenv import load_dotenv
+import asyncio
 import logging
-from openai import OpenAI
+from app.services import llm_gateway
 from typing import Optional, List, Dict
 
-# Load API Key
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("Missing OPENAI_API_KEY in .env file")
+# Research calls run with a low temperature for more factual output
+RESEARCH_TEMPERATURE = 0.3
 
-# Initialize OpenAI client
-client = OpenAI(api_key=openai_api_key)
-
-# Using a powerful model for research tasks
-llm = ChatOpenAI(model_name="gpt-4-turbo", temperature=0.3)
-
-async def conduct_deep_research(query: str, clarifying_answers: Optional[Dict[str, str]] = None) -> str:
-    """
-    Conducts deep legal research on a given query.
-    First, it generates clarifying questions. If answers are not provided, it proceeds with the initial query.
-    If answers are provided, it uses them to conduct more focused research.
-    """
-    
+async def _generate_clarifying_questions(query: str) -> str:
     clarifying_prompt = f"""
     You are a legal research assistant. Your task is to generate a list of clarifying questions to better understand the user's research query.
     The goal is to gather more context to provide a comprehensive and accurate legal analysis.
@@ -33,29 +16,21 @@ async def conduct_deep_research(query: str, clarifying_answers: Optional[Dict[st
 
     Return the questions as a numbered list.
     """
+    return await llm_gateway.ainvoke("research", clarifying_prompt, temperature=RESEARCH_TEMPERATURE)
 
-    clarifying_questions_response = await llm.ainvoke(clarifying_prompt)
-    clarifying_questions = clarifying_questions_response.content
-
-    if not clarifying_answers:
-        # Initial research phase without answers to clarifying questions
-        research_prompt = f"""
-        You are a highly skilled legal research AI. Your task is to conduct a thorough legal analysis of the following query.
-        Since you don't have answers to clarifying questions yet, provide a broad overview of the legal landscape, identify key issues, and mention areas where more specific information would be needed.
+async def _generate_preliminary_report(query: str) -> str:
+    # The report does not depend on the clarifying questions, so both calls can run at the same time
+    research_prompt = f"""
+    You are a highly skilled legal research AI. Your task is to conduct a thorough legal analysis of the following query.
+    Since you don't have answers to clarifying questions yet, provide a broad overview of the legal landscape, identify key issues, and mention areas where more specific information would be needed.
 
-        Initial Query: "{query}"
-        
-        To help you get started, here are some clarifying questions you might have asked:
-        {clarifying_questions}
+    Initial Query: "{query}"
 
-        Provide a preliminary research report based on the initial query. Structure your response with clear headings and detailed explanations.
-        """
-        initial_research_report = await llm.ainvoke(research_prompt)
-        
-        # We return the questions and the preliminary report to the user.
-        return f"### Clarifying Questions:\n{clarifying_questions}\n\n### Preliminary Research Report:\n{initial_research_report.content}"
+    Provide a preliminary research report based on the initial query. Structure your response with clear headings and detailed explanations.
+    """
+    return await llm_gateway.ainvoke("research", research_prompt, temperature=RESEARCH_TEMPERATURE)
 
-    # Focused research phase with answers to clarifying questions
+async def _generate_focused_report(query: str, clarifying_answers: Dict[str, str]) -> str:
     qa_string = "\n".join([f"Q: {q}\nA: {a}" for q, a in clarifying_answers.items()])
 
     focused_research_prompt = f"""
@@ -70,7 +45,21 @@ async def conduct_deep_research(query: str, clarifying_answers: Optional[Dict[st
     Based on the initial query and the provided answers, conduct a comprehensive legal research and provide a detailed report.
     The report should be well-structured, citing relevant (though potentially placeholder) statutes, case law, and legal principles.
     """
-    
-    focused_research_report = await llm.ainvoke(focused_research_prompt)
+    return await llm_gateway.ainvoke("research", focused_research_prompt, temperature=RESEARCH_TEMPERATURE)
+
+async def conduct_deep_research(query: str, clarifying_answers: Optional[Dict[str, str]] = None) -> str:
+    """
+    Conducts deep legal research on a given query.
+    Without answers, the clarifying questions and a preliminary report are generated concurrently.
+    If answers are provided, only the focused research call is made; the questions are not regenerated.
+    """
+    if not clarifying_answers:
+        clarifying_questions, initial_research_report = await asyncio.gather(
+            _generate_clarifying_questions(query),
+            _generate_preliminary_report(query)
+        )
+
+        # We return the questions and the preliminary report to the user.
+        return f"### Clarifying Questions:\n{clarifying_questions}\n\n### Preliminary Research Report:\n{initial_research_report}"
 
-    return focused_research_report.content 
\ No newline at end of file
+    return await _generate_focused_report(query, clarifying_answers)
@@ -1,22 +1,12 @@
 import os
-from langchain_openai import ChatOpenAI
 from docx import Document
-from dotenv import load_dotenv
 from app.models.database import supabase
-from app.config import settings
+from app.services import llm_gateway
+from app.services.job_queue import job_queue
+from app.services.template_index import template_index
 from app.models.schemas import DocumentType, AreaOfLaw
 from typing import Optional
 
-# Load environment variables
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-
-if not openai_api_key:
-    raise ValueError("Missing OPENAI_API_KEY in .env file")
-
-# Initialize GPT-4.5 Turbo
-llm = ChatOpenAI(model_name="gpt-4.1", temperature=0.5)
-
 def fetch_template_from_supabase(template_path: str) -> str:
     """
     Fetch a template file from Supabase storage.
@@ -39,7 +29,7 @@ def fetch_template_from_supabase(template_path: str) -> str:
     except Exception as e:
         raise RuntimeError(f"Error fetching template: {str(e)}")
 
-def edit_template_with_ai(template_path: str, user_command: str, user_id: str, title: str) -> str:
+async def edit_template_with_ai(template_path: str, user_command: str, user_id: str, title: str) -> str:
     """
     Edit a template using AI based on user commands and save it to Supabase.
 
@@ -61,7 +51,7 @@ def edit_template_with_ai(template_path: str, user_command: str, user_id: str, t
         prompt = f"Here is a legal document template:\n{template_text}\n\nUser command: {user_command}\n\nModify the document accordingly and return the updated content."
 
         # Get AI response
-        updated_content = llm.predict(prompt)
+        updated_content = await llm_gateway.ainvoke("template", prompt, temperature=0.5)
 
         # Update the document with AI response
         updated_doc = Document()
@@ -82,10 +72,12 @@ def edit_template_with_ai(template_path: str, user_command: str, user_id: str, t
             )
 
         # Update template record in database
-        supabase.from_("templates").update({
+        update_response = supabase.from_("templates").update({
             "content": updated_content,
             "file_path": storage_path
         }).eq("file_path", template_path).execute()
+        for row in update_response.data or []:
+            job_queue.submit("template_index:upsert", template_index.upsert_template, row["id"])
 
         return storage_path
     except Exception as e:
@@ -0,0 +1,224 @@
+"""
+Durable jobs for long-running AI operations.
+
+A job is a row in the `ai_jobs` table (migration 019) holding the job type,
+its JSON payload, status, progress and result. Routes submit a job and return
+its id straight away; the job is then run either by a dedicated worker process
+(`python -m app.worker`) or, when JOBS_RUN_INLINE is set, on the API worker's
+background job queue. Both paths claim the row with a conditional update, so a
+job is only ever run once even if both are active.
+
+Route modules register the work for each job type with `@register_job_handler`.
+A handler receives the submitting user's id, the payload and a progress
+reporter, and returns a JSON-serializable result.
+
+A running job's `heartbeat_at` is refreshed every JOBS_HEARTBEAT_INTERVAL_SECONDS
+and on every progress report. Jobs whose heartbeat is older than
+JOBS_STALE_AFTER_SECONDS lost their runner and are requeued by
+`run_stale_job_recovery`, which the worker and, in inline mode, every API
+process run periodically.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.models.database import supabase
+from app.models.job_schemas import JobStatus
+from app.services.job_queue import job_queue
+from app.services.llm_metrics import current_user_id
+
+logger = logging.getLogger(__name__)
+
+ProgressReporter = Callable[[int, Optional[str]], Awaitable[None]]
+JobHandler = Callable[[str, Dict[str, Any], ProgressReporter], Awaitable[Dict[str, Any]]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def register_job_handler(job_type: str):
+    """Decorator registering the coroutine that runs jobs of `job_type`."""
+    def decorator(handler: JobHandler) -> JobHandler:
+        _handlers[job_type] = handler
+        return handler
+    return decorator
+
+
+def registered_job_types() -> List[str]:
+    return sorted(_handlers)
+
+
+async def submit_job(user_id: str, job_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Queue a job for a user.
+
+    Parameters:
+    - user_id (str): The submitting user. Handlers run on this user's behalf.
+    - job_type (str): A registered job type.
+    - payload (dict): JSON-serializable handler arguments.
+
+    Returns:
+    - dict: The queued `ai_jobs` row.
+    """
+    if job_type not in _handlers:
+        raise HTTPException(status_code=400, detail=f"Unknown job type: {job_type}")
+
+    response = supabase.from_("ai_jobs").insert({
+        "user_id": user_id,
+        "job_type": job_type,
+        "status": JobStatus.QUEUED.value,
+        "progress": 0,
+        "payload": payload
+    }).execute()
+    if not response.data:
+        raise HTTPException(status_code=500, detail="Failed to queue job.")
+    job = response.data[0]
+    logger.info(f"Queued {job_type} job {job['id']} for user {user_id}")
+
+    if settings.JOBS_RUN_INLINE:
+        job_queue.submit(f"{job_type}:{job['id']}", claim_and_run_job, job)
+    return job
+
+
+def accepted_job_response(job: Dict[str, Any], **extra: Any) -> JSONResponse:
+    """202 response returned by AI routes running in async mode. `extra` fields are added to the body."""
+    return JSONResponse(
+        status_code=202,
+        content={
+            "job_id": job["id"],
+            "job_type": job["job_type"],
+            "status": job["status"],
+            "status_url": f"/api/v1/jobs/{job['id']}",
+            "events_url": f"/api/v1/jobs/{job['id']}/events",
+            **extra
+        }
+    )
+
+
+def get_job(job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """Fetch a job owned by a user, or None."""
+    response = supabase.from_("ai_jobs").select("*").eq("id", job_id).eq("user_id", user_id).limit(1).execute()
+    return response.data[0] if response.data else None
+
+
+def _claim_job(job: Dict[str, Any]) -> bool:
+    """Move a queued job to running. Returns False when another runner claimed it first."""
+    now = datetime.utcnow().isoformat()
+    response = supabase.from_("ai_jobs").update({
+        "status": JobStatus.RUNNING.value,
+        "started_at": now,
+        "heartbeat_at": now,
+        "attempts": (job.get("attempts") or 0) + 1
+    }).eq("id", job["id"]).eq("status", JobStatus.QUEUED.value).execute()
+    return bool(response.data)
+
+
+def claim_next_jobs(limit: int) -> List[Dict[str, Any]]:
+    """Claim up to `limit` of the oldest queued jobs."""
+    response = supabase.from_("ai_jobs").select("*").eq("status", JobStatus.QUEUED.value).order("created_at").limit(limit).execute()
+    return [job for job in (response.data or []) if _claim_job(job)]
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Requeue running jobs whose runner has gone away (e.g. a worker was killed),
+    detected by a heartbeat older than JOBS_STALE_AFTER_SECONDS, failing those
+    that have used up JOBS_MAX_ATTEMPTS. Returns the number requeued.
+    """
+    cutoff = (datetime.utcnow() - timedelta(seconds=settings.JOBS_STALE_AFTER_SECONDS)).isoformat()
+    stale = supabase.from_("ai_jobs").select("id", "attempts").eq("status", JobStatus.RUNNING.value).lt("heartbeat_at", cutoff).execute()
+    requeued = 0
+    for job in stale.data or []:
+        if (job.get("attempts") or 0) >= settings.JOBS_MAX_ATTEMPTS:
+            _finish_job(job["id"], JobStatus.FAILED, error="Job was interrupted too many times.")
+            continue
+        supabase.from_("ai_jobs").update({"status": JobStatus.QUEUED.value, "progress": 0}).eq("id", job["id"]).eq("status", JobStatus.RUNNING.value).lt("heartbeat_at", cutoff).execute()
+        requeued += 1
+    if requeued:
+        logger.warning(f"Requeued {requeued} stale job(s)")
+    return requeued
+
+
+async def run_stale_job_recovery() -> None:
+    """
+    Requeue stale jobs every JOBS_REQUEUE_INTERVAL_SECONDS until cancelled. In
+    inline mode no worker picks requeued jobs up, so this process claims and
+    runs them on its background job queue.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(requeue_stale_jobs)
+            if settings.JOBS_RUN_INLINE:
+                for job in await asyncio.to_thread(claim_next_jobs, settings.BACKGROUND_JOB_CONCURRENCY):
+                    job_queue.submit(f"{job['job_type']}:{job['id']}", run_job, job)
+        except Exception as e:
+            logger.error(f"Stale job recovery failed: {str(e)}")
+        await asyncio.sleep(settings.JOBS_REQUEUE_INTERVAL_SECONDS)
+
+
+def _heartbeat(job_id: str) -> None:
+    supabase.from_("ai_jobs").update({"heartbeat_at": datetime.utcnow().isoformat()}).eq("id", job_id).execute()
+
+
+async def _keep_alive(job_id: str) -> None:
+    """Refresh a running job's heartbeat until cancelled, also while its handler reports no progress."""
+    while True:
+        await asyncio.sleep(settings.JOBS_HEARTBEAT_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(_heartbeat, job_id)
+        except Exception as e:
+            logger.warning(f"Heartbeat for job {job_id} failed: {str(e)}")
+
+
+def _finish_job(job_id: str, status: JobStatus, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+    update_data = {
+        "status": status.value,
+        "result": result,
+        "error": error,
+        "completed_at": datetime.utcnow().isoformat()
+    }
+    if status == JobStatus.COMPLETED:
+        update_data["progress"] = 100
+    supabase.from_("ai_jobs").update(update_data).eq("id", job_id).execute()
+
+
+async def run_job(job: Dict[str, Any]) -> None:
+    """Run a claimed job and record its result or error."""
+    job_id = job["id"]
+
+    async def report_progress(progress: int, message: Optional[str] = None) -> None:
+        supabase.from_("ai_jobs").update({
+            "progress": max(0, min(100, progress)),
+            "progress_message": message,
+            "heartbeat_at": datetime.utcnow().isoformat()
+        }).eq("id", job_id).execute()
+
+    handler = _handlers.get(job["job_type"])
+    if handler is None:
+        _finish_job(job_id, JobStatus.FAILED, error=f"No handler registered for job type: {job['job_type']}")
+        return
+
+    current_user_id.set(job["user_id"])
+    keep_alive = asyncio.create_task(_keep_alive(job_id))
+    try:
+        result = await handler(job["user_id"], job.get("payload") or {}, report_progress)
+        # Round-trip through JSON so datetimes, UUIDs and enums are stored as plain values
+        _finish_job(job_id, JobStatus.COMPLETED, result=json.loads(json.dumps(result, default=str)))
+        logger.info(f"Job {job_id} ({job['job_type']}) completed")
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        logger.error(f"Job {job_id} ({job['job_type']}) failed: {detail}")
+        _finish_job(job_id, JobStatus.FAILED, error=detail)
+    finally:
+        keep_alive.cancel()
+
+
+async def claim_and_run_job(job: Dict[str, Any]) -> None:
+    """Run a freshly submitted job in this process if no worker has claimed it yet."""
+    if _claim_job(job):
+        await run_job(job)
@@ -0,0 +1,183 @@
+"""
+Cache of rendered PDF/DOCX exports.
+
+Artifacts are keyed by (SHA-256 of the markdown, RENDERER_VERSION, format), so
+downloading an unchanged document serves the file rendered last time, and
+any change to the content or the renderer produces a new key.
+
+Tiers:
+- local disk under ARTIFACT_CACHE_DIR, shared by the workers on the host. A
+  hit is streamed from a file handle opened before the response is returned,
+  so an eviction during the download cannot cut it short (no sendfile). Each
+  hit touches the file's mtime and, once the directory grows past
+  ARTIFACT_CACHE_MAX_BYTES, the least recently used files are evicted;
+- optionally a Supabase storage bucket (ARTIFACT_CACHE_STORAGE_BUCKET), so a
+  fresh host or container does not have to re-render everything.
+
+Concurrent requests for the same missing artifact in one worker share a
+single render. Hits, misses and evictions are exported to Prometheus.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge
+
+from app.config import settings
+from app.models.database import supabase
+from app.services.document_renderer import RENDERER_VERSION, DOCX_MEDIA_TYPE, PDF_MEDIA_TYPE
+from app.services.job_queue import job_queue
+from app.services.render_pool import render_pool
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {"pdf": PDF_MEDIA_TYPE, "docx": DOCX_MEDIA_TYPE}
+# Evict down to this fraction of the cap, so eviction does not run on every write
+EVICTION_TARGET_RATIO = 0.9
+
+ARTIFACT_CACHE_REQUESTS = Counter(
+    "artifact_cache_requests_total",
+    "Export artifact lookups by tier that served them (local, storage or miss)",
+    ["format", "result"],
+)
+ARTIFACT_CACHE_EVICTIONS = Counter("artifact_cache_evictions_total", "Export artifacts evicted from the local cache")
+ARTIFACT_CACHE_BYTES = Gauge("artifact_cache_bytes", "Size of the local export artifact cache", multiprocess_mode="max")
+
+
+def artifact_key(content: str, fmt: str) -> str:
+    """Cache key of a rendered artifact, e.g. "<sha256>-r1.pdf"."""
+    return f"{hashlib.sha256(content.encode('utf-8')).hexdigest()}-r{RENDERER_VERSION}.{fmt}"
+
+
+class ArtifactCache:
+    """Local LRU directory of rendered exports with an optional object storage tier."""
+
+    def __init__(self, directory: str, max_bytes: int, storage_bucket: Optional[str]):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.storage_bucket = storage_bucket
+        self._approx_bytes: Optional[int] = None
+        self._renders: Dict[str, asyncio.Future] = {}
+
+    def path_for(self, key: str) -> str:
+        # Two-character shards keep directories small
+        return os.path.join(self.directory, key[:2], key)
+
+    def _lookup_local(self, path: str) -> bool:
+        try:
+            # Touch on hit: mtime is the LRU clock
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _write_local(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        if self._approx_bytes is None:
+            self._approx_bytes = self._scan()[1]
+        else:
+            self._approx_bytes += len(data)
+        if self._approx_bytes > self.max_bytes:
+            self.evict()
+
+    def _scan(self) -> Tuple[List[Tuple[float, int, str]], int]:
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries, sum(size for _, size, _ in entries)
+
+    def evict(self) -> int:
+        """Delete least recently used artifacts until the cache is under its target size. Returns files removed."""
+        entries, total = self._scan()
+        removed = 0
+        target = self.max_bytes * EVICTION_TARGET_RATIO
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            ARTIFACT_CACHE_EVICTIONS.inc(removed)
+            logger.info(f"Evicted {removed} export artifacts; cache is now {total} bytes")
+        self._approx_bytes = total
+        ARTIFACT_CACHE_BYTES.set(total)
+        return removed
+
+    def _download_from_storage(self, key: str) -> Optional[bytes]:
+        try:
+            return supabase.storage.from_(self.storage_bucket).download(key)
+        except Exception:
+            return None
+
+    def _upload_to_storage(self, key: str, data: bytes, fmt: str) -> None:
+        supabase.storage.from_(self.storage_bucket).upload(key, data, {"content-type": MEDIA_TYPES[fmt], "upsert": "true"})
+
+    async def _fill(self, key: str, path: str, content: str, fmt: str) -> None:
+        """Fetch a missing artifact from object storage or render it, and store it locally."""
+        data = None
+        if self.storage_bucket:
+            data = await asyncio.to_thread(self._download_from_storage, key)
+        if data:
+            ARTIFACT_CACHE_REQUESTS.labels(fmt, "storage").inc()
+        else:
+            ARTIFACT_CACHE_REQUESTS.labels(fmt, "miss").inc()
+            started = time.perf_counter()
+            data = await render_pool.render(content, fmt)
+            logger.info(f"Rendered {fmt} artifact {key} in {(time.perf_counter() - started) * 1000:.0f} ms")
+            if self.storage_bucket:
+                job_queue.submit(f"artifact_cache:upload:{key}", asyncio.to_thread, self._upload_to_storage, key, data, fmt)
+        await asyncio.to_thread(self._write_local, path, data)
+
+    async def get_or_render(self, content: str, fmt: str) -> str:
+        """
+        Path of the cached artifact for a document, rendering it on a miss.
+
+        Parameters:
+        - content (str): The markdown document.
+        - fmt (str): "pdf" or "docx".
+
+        Returns:
+        - str: Path of the artifact on local disk.
+
+        Raises:
+        - RenderPoolBusy: If the artifact has to be rendered and the render pool is saturated.
+        """
+        key = artifact_key(content, fmt)
+        path = self.path_for(key)
+        if await asyncio.to_thread(self._lookup_local, path):
+            ARTIFACT_CACHE_REQUESTS.labels(fmt, "local").inc()
+            return path
+
+        pending = self._renders.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._fill(key, path, content, fmt))
+            self._renders[key] = pending
+            pending.add_done_callback(lambda _: self._renders.pop(key, None))
+        await asyncio.shield(pending)
+        return path
+
+
+artifact_cache = ArtifactCache(
+    settings.ARTIFACT_CACHE_DIR,
+    settings.ARTIFACT_CACHE_MAX_BYTES,
+    settings.ARTIFACT_CACHE_STORAGE_BUCKET,
+)
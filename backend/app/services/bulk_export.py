@@ -0,0 +1,170 @@
+"""
+Bulk export of documents as a streamed ZIP archive.
+
+The documents a user may read are resolved in one query (the
+`accessible_documents` function, migration 024) instead of the per-document
+owner / team / collaborator checks of the single download routes. Each
+document is then rendered in the render pool, or read from the rendered
+artifact cache, with up to BULK_EXPORT_CONCURRENCY documents in flight, and
+written to the archive as soon as it is ready. The archive is produced
+through an unseekable sink, so zipfile writes sizes in data descriptors and
+nothing but the current entry is held in memory.
+
+Documents that fail to render are listed in an `export_errors.txt` entry at
+the end of the archive, since the response status is already sent by then.
+"""
+import asyncio
+import io
+import logging
+import re
+import time
+import zipfile
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from prometheus_client import Counter
+
+from app.config import settings
+from app.models.database import supabase
+from app.services.artifact_cache import artifact_cache
+from app.services.render_pool import render_pool
+
+logger = logging.getLogger(__name__)
+
+ERRORS_ENTRY_NAME = "export_errors.txt"
+# Characters not allowed in archive entry names on common platforms
+UNSAFE_NAME_CHARS = re.compile(r'[\x00-\x1f<>:"/\\|?*]+')
+
+BULK_EXPORT_DOCUMENTS = Counter("bulk_export_documents_total", "Documents written to bulk export archives", ["format", "result"])
+
+
+class ZipStreamSink(io.RawIOBase):
+    """Write-only, unseekable file that collects what zipfile writes until it is drained."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def resolve_export_documents(
+    user_id: str,
+    document_ids: Optional[List[str]],
+    client_profile_id: Optional[str],
+    limit: int
+) -> List[Dict[str, Any]]:
+    """
+    The documents a user may export, in one query.
+
+    Parameters:
+    - user_id (str): The requesting user.
+    - document_ids (list, optional): Restrict to these documents.
+    - client_profile_id (str, optional): Restrict to the documents of this client.
+    - limit (int): Maximum number of rows returned.
+
+    Returns:
+    - list: Rows with `id`, `title` and `content`, oldest first.
+    """
+    response = supabase.rpc("accessible_documents", {
+        "p_user_id": user_id,
+        "p_document_ids": document_ids,
+        "p_client_profile_id": client_profile_id,
+        "p_limit": limit,
+    }).execute()
+    return response.data or []
+
+
+def entry_name(title: str, fmt: str, used: Set[str]) -> str:
+    """A safe, unique archive entry name for a document title."""
+    base = UNSAFE_NAME_CHARS.sub("_", (title or "").strip()).strip(". ") or "document"
+    base = base[:120]
+    name = f"{base}.{fmt}"
+    counter = 2
+    while name.lower() in used:
+        name = f"{base} ({counter}).{fmt}"
+        counter += 1
+    used.add(name.lower())
+    return name
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def render_for_export(content: str, fmt: str) -> bytes:
+    """Rendered bytes of a document, through the artifact cache when it is enabled."""
+    if settings.ARTIFACT_CACHE_ENABLED:
+        path = await artifact_cache.get_or_render(content, fmt)
+        try:
+            return await asyncio.to_thread(_read_file, path)
+        except FileNotFoundError:
+            # Evicted between the lookup and the read
+            pass
+    return await render_pool.render(content, fmt)
+
+
+async def stream_export_zip(documents: List[Dict[str, Any]], fmt: str) -> AsyncIterator[bytes]:
+    """
+    Render documents and yield a ZIP archive of them piece by piece.
+
+    Parameters:
+    - documents (list): Rows with `id`, `title` and `content`.
+    - fmt (str): "pdf" or "docx".
+
+    Yields:
+    - bytes: Consecutive parts of the archive.
+    """
+    sink = ZipStreamSink()
+    # Rendered PDF and DOCX files are already compressed
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+    used_names: Set[str] = set()
+    failures: List[Tuple[Dict[str, Any], str]] = []
+    remaining = iter(documents)
+    in_flight: Dict[asyncio.Task, Dict[str, Any]] = {}
+    started = time.perf_counter()
+
+    def schedule_next() -> None:
+        document = next(remaining, None)
+        if document is not None:
+            in_flight[asyncio.ensure_future(render_for_export(document.get("content") or "", fmt))] = document
+
+    try:
+        for _ in range(max(1, settings.BULK_EXPORT_CONCURRENCY)):
+            schedule_next()
+        while in_flight:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                document = in_flight.pop(task)
+                schedule_next()
+                try:
+                    data = task.result()
+                except Exception as e:
+                    logger.error(f"Bulk export could not render document {document['id']}: {str(e)}")
+                    failures.append((document, str(e)))
+                    BULK_EXPORT_DOCUMENTS.labels(fmt, "failed").inc()
+                    continue
+                entry = zipfile.ZipInfo(entry_name(document.get("title"), fmt, used_names), date_time=time.localtime()[:6])
+                archive.writestr(entry, data)
+                BULK_EXPORT_DOCUMENTS.labels(fmt, "exported").inc()
+                yield sink.drain()
+
+        if failures:
+            report = "".join(f"{document['id']}\t{document.get('title') or ''}\t{error}\n" for document, error in failures)
+            archive.writestr(zipfile.ZipInfo(ERRORS_ENTRY_NAME, date_time=time.localtime()[:6]), report)
+        archive.close()
+        yield sink.drain()
+        logger.info(f"Bulk export of {len(documents)} documents ({len(failures)} failed) finished in {time.perf_counter() - started:.1f}s")
+    finally:
+        # The client may disconnect mid-archive; stop rendering for it
+        for task in in_flight:
+            task.cancel()
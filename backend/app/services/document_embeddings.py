@@ -0,0 +1,236 @@
+"""
+Per-user embedding store for saved documents, used to find similar documents
+without an LLM call.
+
+Each user (tenant) has a directory under DOCUMENT_EMBEDDINGS_DIR holding:
+- `vectors.npy`: an (capacity x dim) float16 matrix of L2-normalized document
+  vectors, opened as a NumPy memmap so searches only page in what they touch,
+- `meta.json`: the embedding model, and for each document its row and the
+  hash of the text that was embedded.
+
+Documents are embedded in the background when they are saved. A document is
+only re-embedded when its content hash changes, so status or evaluation
+updates cost nothing. Rows of deleted documents are zeroed and reused.
+Writers take an exclusive file lock per tenant, so several workers on the
+host can update the same store.
+"""
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+
+from app.config import settings
+from app.models.database import supabase
+from app.services import llm_gateway
+from app.services.job_queue import job_queue
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CAPACITY = 64
+DOCUMENT_PAGE_SIZE = 200
+
+
+def embedding_text(document: Dict[str, Any]) -> str:
+    """The text embedded for a document: its title followed by its content."""
+    return f"{document.get('title') or ''}\n{document.get('content') or ''}".strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TenantEmbeddingStore:
+    """The memory-mapped vectors and metadata of one user's documents."""
+
+    def __init__(self, root: str, tenant_id: str, model: str):
+        # Tenant ids are user UUIDs; normalizing them also keeps paths inside root
+        self.directory = os.path.join(root, str(UUID(str(tenant_id))))
+        self.vectors_path = os.path.join(self.directory, "vectors.npy")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.model = model
+
+    def read_meta(self) -> Dict[str, Any]:
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return {"model": self.model, "dim": 0, "capacity": 0, "rows": {}, "free": []}
+        if meta.get("model") != self.model:
+            # Vectors from another model are not comparable; start over
+            return {"model": self.model, "dim": 0, "capacity": 0, "rows": {}, "free": []}
+        return meta
+
+    def _write_meta(self, meta: Dict[str, Any]) -> None:
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _open_vectors(self, meta: Dict[str, Any], dim: int, needed: int) -> np.memmap:
+        """Open the vector file for writing, growing it (by doubling) to hold `needed` rows."""
+        capacity = meta["capacity"] if meta["dim"] == dim else 0
+        if capacity >= needed and os.path.exists(self.vectors_path):
+            return np.load(self.vectors_path, mmap_mode="r+")
+
+        new_capacity = max(INITIAL_CAPACITY, capacity)
+        while new_capacity < needed:
+            new_capacity *= 2
+        tmp_path = f"{self.vectors_path}.{os.getpid()}.tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float16, shape=(new_capacity, dim))
+        if capacity:
+            grown[:capacity] = np.load(self.vectors_path, mmap_mode="r")[:capacity]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self.vectors_path)
+        meta["capacity"], meta["dim"] = new_capacity, dim
+        return np.load(self.vectors_path, mmap_mode="r+")
+
+    def upsert(self, items: List[Tuple[str, str, np.ndarray]]) -> None:
+        """Store (document_id, text_hash, vector) items, reusing each document's row."""
+        if not items:
+            return
+        dim = len(items[0][2])
+        with self._write_lock():
+            meta = self.read_meta()
+            if meta["dim"] not in (0, dim):
+                meta = {"model": self.model, "dim": 0, "capacity": 0, "rows": {}, "free": []}
+            new_ids = {document_id for document_id, _, _ in items if document_id not in meta["rows"]}
+            # Rows handed out so far; new documents fill free rows before extending past them
+            next_row = len(meta["rows"]) + len(meta["free"])
+            vectors = self._open_vectors(meta, dim, next_row + max(0, len(new_ids) - len(meta["free"])))
+            for document_id, digest, vector in items:
+                entry = meta["rows"].get(document_id)
+                if entry is None:
+                    if meta["free"]:
+                        row = meta["free"].pop()
+                    else:
+                        row, next_row = next_row, next_row + 1
+                    entry = meta["rows"][document_id] = {"row": row}
+                entry["hash"] = digest
+                vectors[entry["row"]] = vector
+            vectors.flush()
+            del vectors
+            self._write_meta(meta)
+
+    def remove(self, document_ids: List[str]) -> None:
+        with self._write_lock():
+            meta = self.read_meta()
+            rows = [meta["rows"].pop(document_id)["row"] for document_id in document_ids if document_id in meta["rows"]]
+            if not rows:
+                return
+            vectors = np.load(self.vectors_path, mmap_mode="r+")
+            vectors[rows] = 0
+            vectors.flush()
+            del vectors
+            meta["free"].extend(rows)
+            self._write_meta(meta)
+
+    def nearest(self, document_id: str, k: int) -> Optional[List[Tuple[str, float]]]:
+        """
+        The `k` documents most similar to one of this tenant's documents, as
+        (document_id, cosine similarity). None if the document is not indexed.
+        """
+        meta = self.read_meta()
+        entry = meta["rows"].get(document_id)
+        if entry is None or not os.path.exists(self.vectors_path):
+            return None
+        others = [(other_id, other["row"]) for other_id, other in meta["rows"].items() if other_id != document_id]
+        if not others or k <= 0:
+            return []
+        vectors = np.load(self.vectors_path, mmap_mode="r")
+        query = vectors[entry["row"]].astype(np.float32)
+        rows = np.fromiter((row for _, row in others), dtype=np.int64, count=len(others))
+        scores = vectors[rows].astype(np.float32) @ query
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(others[i][0], float(scores[i])) for i in top]
+
+
+def get_store(tenant_id: str) -> TenantEmbeddingStore:
+    return TenantEmbeddingStore(settings.DOCUMENT_EMBEDDINGS_DIR, tenant_id, llm_gateway.resolve_model("embed"))
+
+
+async def index_documents(user_id: str, documents: List[Dict[str, Any]]) -> int:
+    """
+    Embed a user's documents whose text changed since they were last embedded.
+
+    Parameters:
+    - user_id (str): The owner of the documents.
+    - documents (list): Document rows with at least `id`, `title` and `content`.
+
+    Returns:
+    - int: The number of documents embedded.
+    """
+    store = get_store(user_id)
+    meta = await asyncio.to_thread(store.read_meta)
+    pending = []
+    for document in documents:
+        text = embedding_text(document)
+        if not (document.get("content") or "").strip():
+            continue
+        digest = text_hash(text)
+        if (meta["rows"].get(str(document["id"])) or {}).get("hash") != digest:
+            pending.append((str(document["id"]), digest, text))
+    if not pending:
+        return 0
+
+    vectors = np.asarray(await llm_gateway.embed("embed", [text for _, _, text in pending], model=store.model), dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    items = [(document_id, digest, vector.astype(np.float16)) for (document_id, digest, _), vector in zip(pending, vectors)]
+    await asyncio.to_thread(store.upsert, items)
+    logger.info(f"Embedded {len(items)} documents for user {user_id}")
+    return len(items)
+
+
+def schedule_document_embedding(document: Dict[str, Any]) -> None:
+    """Embed a saved document in the background (skipped when its text is unchanged)."""
+    if document and document.get("user_id") and (document.get("content") or "").strip():
+        job_queue.submit(f"document_embeddings:{document['id']}", index_documents, str(document["user_id"]), [document])
+
+
+async def remove_document(user_id: str, document_id: str) -> None:
+    await asyncio.to_thread(get_store(user_id).remove, [str(document_id)])
+
+
+async def sync_user_documents(user_id: str) -> int:
+    """Embed every document of a user that is missing or stale and drop deleted ones. Used to backfill."""
+    documents: List[Dict[str, Any]] = []
+    start = 0
+    while True:
+        response = supabase.from_("documents").select("id, title, content").eq("user_id", user_id).order("id").range(start, start + DOCUMENT_PAGE_SIZE - 1).execute()
+        rows = response.data or []
+        documents.extend(rows)
+        if len(rows) < DOCUMENT_PAGE_SIZE:
+            break
+        start += DOCUMENT_PAGE_SIZE
+
+    store = get_store(user_id)
+    meta = await asyncio.to_thread(store.read_meta)
+    current_ids = {str(document["id"]) for document in documents}
+    deleted = [document_id for document_id in meta["rows"] if document_id not in current_ids]
+    if deleted:
+        await asyncio.to_thread(store.remove, deleted)
+    return await index_documents(user_id, documents)
+
+
+async def find_similar_documents(user_id: str, document_id: str, limit: int) -> Optional[List[Tuple[str, float]]]:
+    """Nearest neighbours of a document among the same user's documents; None if it is not embedded yet."""
+    return await asyncio.to_thread(get_store(user_id).nearest, str(document_id), limit)
@@ -0,0 +1,208 @@
+"""
+Rendering of markdown documents to PDF and DOCX.
+
+A document is converted once into a flat list of blocks (headings,
+paragraphs, lists, rules), and each back end renders that list. The reportlab
+style sheet is built once at import instead of on every download.
+
+`render_document` is the entry point used by the render pool
+(app/services/render_pool.py); it only takes and returns picklable values so
+it can run in a worker process. This module must not import app settings or
+the database client, to keep worker processes light.
+
+Bump RENDERER_VERSION whenever the output of either back end changes.
+"""
+import io
+from typing import BinaryIO, List, NamedTuple, Tuple, Union
+from xml.sax.saxutils import escape
+
+import markdown
+from bs4 import BeautifulSoup
+from docx import Document as DocxDocument
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle, ListStyle
+from reportlab.platypus import Paragraph, SimpleDocTemplate, ListFlowable, HRFlowable
+
+RENDERER_VERSION = "1"
+
+PDF_MEDIA_TYPE = "application/pdf"
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# Elements of the markdown HTML that are rendered; anything else is dropped
+RENDERED_ELEMENTS = ['h1', 'h2', 'h3', 'p', 'ul', 'ol', 'hr']
+DOCX_RULE_TEXT = '----------------------------------------------------------------------------------------------------------------'
+
+Output = Union[str, BinaryIO]
+
+
+class Block(NamedTuple):
+    kind: str  # "heading", "paragraph", "bullet_list", "number_list" or "rule"
+    text: str = ""
+    level: int = 0  # Heading level
+    items: Tuple[str, ...] = ()  # List item texts
+
+
+def _build_pdf_styles():
+    styles = getSampleStyleSheet()
+    normal_style = ParagraphStyle(name='Normal', parent=styles['Normal'], fontName='Helvetica', fontSize=10, leading=12)
+    heading_styles = {
+        1: ParagraphStyle(name='h1', parent=styles['h1'], fontName='Helvetica-Bold', fontSize=20, leading=24, spaceAfter=12),
+        2: ParagraphStyle(name='h2', parent=styles['h2'], fontName='Helvetica-Bold', fontSize=16, leading=18, spaceAfter=9),
+        3: ParagraphStyle(name='h3', parent=styles['h3'], fontName='Helvetica-Bold', fontSize=14, leading=16, spaceAfter=7),
+    }
+    list_item_style = ParagraphStyle(name='ListItemText', parent=normal_style, leftIndent=36, bulletIndent=12)
+    list_styles = {
+        bullet_type: ListStyle(name=name,
+                               parent=None,
+                               bulletFontName='Helvetica',
+                               bulletFontSize=10,
+                               bulletIndent=12,
+                               leftIndent=36,
+                               rightIndent=0,
+                               spaceBefore=6,
+                               spaceAfter=6,
+                               textColor=colors.black,
+                               bulletType=bullet_type)
+        for name, bullet_type in (('BulletList', 'bullet'), ('NumberList', '1'))
+    }
+    return normal_style, heading_styles, list_item_style, list_styles
+
+
+# Built once per process; reportlab styles are read-only during a build
+PDF_NORMAL_STYLE, PDF_HEADING_STYLES, PDF_LIST_ITEM_STYLE, PDF_LIST_STYLES = _build_pdf_styles()
+
+
+def markdown_to_blocks(content: str) -> List[Block]:
+    """
+    Convert a markdown document into the blocks both back ends render.
+
+    Parameters:
+    - content (str): The markdown document.
+
+    Returns:
+    - List[Block]: Blocks in document order.
+    """
+    html_content = markdown.markdown(content or "")
+    soup = BeautifulSoup(html_content, 'html.parser')
+    content_elements = soup.find_all(RENDERED_ELEMENTS)
+
+    if not content_elements:
+        # No structured elements: the whole content is one paragraph
+        text = soup.get_text().strip()
+        return [Block("paragraph", text)] if text else []
+
+    blocks: List[Block] = []
+    for element in content_elements:
+        if element.name in ('h1', 'h2', 'h3'):
+            blocks.append(Block("heading", element.get_text(), level=int(element.name[1])))
+        elif element.name == 'p':
+            blocks.append(Block("paragraph", element.get_text()))
+        elif element.name in ('ul', 'ol'):
+            items = tuple(li.get_text() for li in element.find_all('li', recursive=False))
+            blocks.append(Block("bullet_list" if element.name == 'ul' else "number_list", items=items))
+        elif element.name == 'hr':
+            blocks.append(Block("rule"))
+    return blocks
+
+
+def _pdf_story(blocks: List[Block]) -> list:
+    story = []
+    for block in blocks:
+        if block.kind == "heading":
+            story.append(Paragraph(escape(block.text), PDF_HEADING_STYLES[block.level]))
+        elif block.kind == "paragraph":
+            story.append(Paragraph(escape(block.text), PDF_NORMAL_STYLE))
+        elif block.kind == "bullet_list":
+            story.append(ListFlowable([Paragraph(escape(item), PDF_LIST_ITEM_STYLE) for item in block.items],
+                                      bulletType='bullet',
+                                      start=None,
+                                      bulletDinkus='• ',
+                                      leftIndent=36,
+                                      bulletIndent=12,
+                                      spaceBefore=6,
+                                      spaceAfter=6,
+                                      style=PDF_LIST_STYLES['bullet']))
+        elif block.kind == "number_list":
+            story.append(ListFlowable([Paragraph(escape(item), PDF_LIST_ITEM_STYLE) for item in block.items],
+                                      bulletType='1',
+                                      start=None,
+                                      leftIndent=36,
+                                      bulletIndent=12,
+                                      spaceBefore=6,
+                                      spaceAfter=6,
+                                      style=PDF_LIST_STYLES['1']))
+        elif block.kind == "rule":
+            story.append(HRFlowable(width='100%', thickness=1, color=colors.black, spaceBefore=6, spaceAfter=6))
+    return story
+
+
+def render_pdf(blocks: List[Block], output: Output) -> int:
+    """
+    Render blocks as a US Letter PDF.
+
+    Parameters:
+    - blocks (list): Blocks from `markdown_to_blocks`.
+    - output (str or binary file): Path or writable file object for the PDF.
+
+    Returns:
+    - int: The number of pages.
+    """
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=letter,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=72
+    )
+    doc.build(_pdf_story(blocks))
+    return doc.page
+
+
+def render_docx(blocks: List[Block], output: Output) -> None:
+    """
+    Render blocks as a DOCX document.
+
+    Parameters:
+    - blocks (list): Blocks from `markdown_to_blocks`.
+    - output (str or binary file): Path or writable file object for the DOCX.
+    """
+    doc = DocxDocument()
+    for block in blocks:
+        if block.kind == "heading":
+            doc.add_heading(block.text, level=block.level)
+        elif block.kind == "paragraph":
+            doc.add_paragraph(block.text)
+        elif block.kind == "rule":
+            doc.add_paragraph(DOCX_RULE_TEXT)
+        elif block.kind == "bullet_list":
+            for item in block.items:
+                doc.add_paragraph('• ' + item, style='List Bullet')
+        elif block.kind == "number_list":
+            for item in block.items:
+                # python-docx numbers items through the 'List Number' style
+                doc.add_paragraph(item, style='List Number')
+    doc.save(output)
+
+
+def render_document(content: str, fmt: str) -> bytes:
+    """
+    Render a markdown document to PDF or DOCX bytes.
+
+    Parameters:
+    - content (str): The markdown document.
+    - fmt (str): "pdf" or "docx".
+
+    Returns:
+    - bytes: The rendered file.
+    """
+    blocks = markdown_to_blocks(content)
+    buffer = io.BytesIO()
+    if fmt == "pdf":
+        render_pdf(blocks, buffer)
+    elif fmt == "docx":
+        render_docx(blocks, buffer)
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+    return buffer.getvalue()
@@ -0,0 +1,68 @@
+"""
+Background job queue for work that should not hold up an API response,
+such as compliance checks after a document is generated or uploaded.
+
+Routes enqueue a job with `job_queue.submit(...)` and return immediately.
+The default executor runs jobs as tasks on the worker's event loop with a
+bounded number running at once. `drain()` waits for everything that has been
+submitted, which is what tests and application shutdown use.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Set
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessExecutor:
+    """Runs jobs as asyncio tasks in the current process."""
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run(self, name: str, job: Callable[..., Awaitable[Any]], args: tuple, kwargs: dict) -> None:
+        async with self._get_semaphore():
+            try:
+                await job(*args, **kwargs)
+                logger.info(f"Background job '{name}' completed")
+            except Exception as e:
+                logger.error(f"Background job '{name}' failed: {str(e)}")
+
+    def submit(self, name: str, job: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> asyncio.Task:
+        """
+        Schedule a coroutine function to run in the background.
+
+        Parameters:
+        - name (str): Label used in logs.
+        - job (callable): Async function to run. Exceptions are logged, never raised to the caller.
+        - args, kwargs: Arguments passed to the job.
+
+        Returns:
+        - asyncio.Task: The scheduled task.
+        """
+        task = asyncio.create_task(self._run(name, job, args, kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def drain(self) -> None:
+        """Wait until every submitted job has finished."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+job_queue = InProcessExecutor(max_concurrency=settings.BACKGROUND_JOB_CONCURRENCY)
@@ -1,11 +1,10 @@
 import os
 import uuid
-from typing import Type, Optional, Dict, Any
+from typing import Type, Optional, Dict, Any, List
 
 from pydantic import BaseModel, Field
 from docx import Document
 
-from langchain_openai import ChatOpenAI
 from langchain.agents import AgentExecutor, create_openai_functions_agent
 from langchain.tools import BaseTool
 from langchain.memory import ConversationBufferMemory
@@ -15,15 +14,17 @@ from langchain_core.messages import SystemMessage
 # Import your database client and service functions
 from app.models.database import supabase
 from app.services.ai_agent_evaluate import evaluate_legal_document
-from app.services.ai_agent_enhance import enhance_document_with_ai
+from app.services.ai_agent_enhance import enhance_document_sections
 from app.services.ai_agent_generate import generate_legal_document
-from app.services.ai_agent_compliance import check_document_compliance
+from app.services.ai_agent_compliance import check_document_compliance_incremental
 from app.services.ai_agent_research import conduct_deep_research
+from app.services.document_embeddings import schedule_document_embedding
 from app.services.supabase_chat_history import SupabaseChatMessageHistory
+from app.services import llm_gateway, token_budget
+from app.config import settings
 from app.utils.db_utils import get_profile, get_client_profile
 
 # --- Configuration ---
-AGENT_MODEL = "gpt-4-turbo"
 GENERATED_DOCS_DIR = "generated_docs"
 os.makedirs(GENERATED_DOCS_DIR, exist_ok=True)
 
@@ -36,11 +37,13 @@ class EvaluateToolInput(BaseModel):
     user_id: str = Field(description="The ID of the user who owns the document.")
     document_id: str = Field(description="The UUID of the document to evaluate from the database.")
     evaluation_criteria: str = Field(description="The specific criteria for evaluation.", default="General legal review")
+    force_refresh: bool = Field(False, description="Set to true only when the user explicitly asks for a fresh evaluation instead of a cached one.")
 
 class EnhanceToolInput(BaseModel):
     user_id: str = Field(description="The ID of the user who owns the document.")
     document_id: str = Field(description="The UUID of the document to enhance from the database.")
     instructions: Optional[str] = Field(description="Specific user instructions for the enhancement.")
+    sections: Optional[List[str]] = Field(None, description="Section ids or headings to limit the enhancement to, when the user names specific sections or clauses.")
 
 class GenerateToolInput(BaseModel):
     user_id: str = Field(description="The ID of the user creating the document.")
@@ -54,6 +57,7 @@ class GenerateToolInput(BaseModel):
 class ComplianceToolInput(BaseModel):
     user_id: str = Field(description="The ID of the user who owns the document.")
     document_id: str = Field(description="The UUID of the document to check for compliance from the database.")
+    force_refresh: bool = Field(False, description="Set to true only when the user explicitly asks for a fresh compliance check instead of a cached one.")
 
 class ResearchToolInput(BaseModel):
     user_id: str = Field(description="The ID of the user requesting the research.")
@@ -115,6 +119,7 @@ class GenerateTool(BaseTool):
                 return "Error: Failed to save the generated document to the database. No data returned."
             
             new_doc_id = insert_response.data[0]['id']
+            schedule_document_embedding(insert_response.data[0])
             return f"Successfully generated and saved the document. The new document ID is: {new_doc_id}"
         except Exception as e:
             return f"An error occurred during document generation: {str(e)}"
@@ -132,24 +137,27 @@ class EnhanceTool(BaseTool):
     def __init__(self, user_id=None, **kwargs):
         super().__init__(user_id=user_id, **kwargs)
 
-    async def _arun(self, user_id: str = None, document_id: str = None, instructions: Optional[str] = None):
+    async def _arun(self, user_id: str = None, document_id: str = None, instructions: Optional[str] = None, sections: Optional[List[str]] = None):
         try:
             user_id = user_id or self.user_id
             doc_res = supabase.from_("documents").select("content").eq("id", document_id).eq("user_id", user_id).maybe_single().execute()
             if not doc_res.data:
                 return f"Error: Document with ID {document_id} not found or you do not have permission to access it."
 
-            enhanced_content = await enhance_document_with_ai(doc_res.data['content'], instructions)
-            
+            result = await enhance_document_sections(doc_res.data['content'], instructions, sections)
+            if not result.patches:
+                return f"No changes were needed for document {document_id}."
+
             update_res = supabase.from_("documents").update({
-                "content": enhanced_content,
+                "content": result.content,
                 "status": "enhanced"
             }).eq("id", document_id).execute()
 
             if not update_res.data:
                 return "Error: Failed to save the enhanced document. No data returned."
 
-            return f"Successfully enhanced document {document_id}."
+            schedule_document_embedding(update_res.data[0])
+            return f"Successfully enhanced document {document_id} ({len(result.patches)} section changes)."
         except Exception as e:
             return f"An error occurred during enhancement: {str(e)}"
 
@@ -166,14 +174,14 @@ class EvaluateTool(BaseTool):
     def __init__(self, user_id=None, **kwargs):
         super().__init__(user_id=user_id, **kwargs)
 
-    async def _arun(self, user_id: str = None, document_id: str = None, evaluation_criteria: str = "General legal review"):
+    async def _arun(self, user_id: str = None, document_id: str = None, evaluation_criteria: str = "General legal review", force_refresh: bool = False):
         try:
             user_id = user_id or self.user_id
             doc_res = supabase.from_("documents").select("content").eq("id", document_id).eq("user_id", user_id).maybe_single().execute()
             if not doc_res.data:
                 return f"Error: Document with ID {document_id} not found or you do not have permission to access it."
             
-            evaluation_result = await evaluate_legal_document(doc_res.data['content'], evaluation_criteria)
+            evaluation_result = await evaluate_legal_document(doc_res.data['content'], evaluation_criteria, use_cache=not force_refresh)
 
             update_res = supabase.from_("documents").update({
                 "evaluation_response": evaluation_result.dict()
@@ -200,21 +208,24 @@ class ComplianceTool(BaseTool):
     def __init__(self, user_id=None, **kwargs):
         super().__init__(user_id=user_id, **kwargs)
 
-    async def _arun(self, user_id: str = None, document_id: str = None):
+    async def _arun(self, user_id: str = None, document_id: str = None, force_refresh: bool = False):
         try:
             user_id = user_id or self.user_id
-            doc_res = supabase.from_("documents").select("content, jurisdiction, document_type").eq("id", document_id).eq("user_id", user_id).maybe_single().execute()
+            doc_res = supabase.from_("documents").select("content, compliance_sections").eq("id", document_id).eq("user_id", user_id).maybe_single().execute()
             if not doc_res.data:
                 return f"Error: Document with ID {document_id} not found or you do not have permission to access it."
             
-            compliance_result = await check_document_compliance(
+            compliance_result, compliance_sections = await check_document_compliance_incremental(
                 document_content=doc_res.data['content'],
-                jurisdiction=doc_res.data.get('jurisdiction'),
-                document_type=doc_res.data.get('document_type')
+                previous_state=doc_res.data.get('compliance_sections'),
+                jurisdiction=None,
+                document_type=None,
+                use_cache=not force_refresh
             )
             
             update_res = supabase.from_("documents").update({
-                "compliance_check_results": compliance_result.dict()
+                "compliance_check_results": {**compliance_result.dict(), "status": "completed"},
+                "compliance_sections": compliance_sections
             }).eq("id", document_id).execute()
             
             if not update_res.data:
@@ -258,7 +269,7 @@ class ChatLawyerAgent:
     def __init__(self, openai_api_key: str, user_id: str, session_id: str, profile_data: dict = None):
         self.user_id = user_id
         self.profile_data = profile_data or {}
-        self.llm = ChatOpenAI(model=AGENT_MODEL, temperature=0.2, openai_api_key=openai_api_key)
+        self.llm = llm_gateway.get_chat_model("agent", temperature=0.2, openai_api_key=openai_api_key)
         
         # Initialize the persistent, user-specific chat history manager
         self.history = SupabaseChatMessageHistory(session_id=session_id, user_id=user_id)
@@ -350,6 +361,12 @@ class ChatLawyerAgent:
     async def arun(self, message: str, contract_text: Optional[str] = None) -> Dict[str, Any]:
         full_input = message
         if contract_text:
+            # An uploaded contract can be arbitrarily long; keep it within the chat budget
+            contract_text = token_budget.fit_text_to_budget(
+                contract_text,
+                settings.CHAT_CONTEXT_DOCUMENT_MAX_TOKENS,
+                llm_gateway.resolve_model("agent")
+            )
             full_input = f"A document was provided by the user. Use it as context for this request:\n\n---\n{contract_text}\n---\n\nUser Request: {message}"
 
         # Only pass 'input' to the agent executor
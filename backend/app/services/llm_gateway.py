@@ -0,0 +1,383 @@
+"""
+Central gateway for every LLM call made by the backend.
+
+The gateway owns:
+- the pooled HTTP/OpenAI clients shared by all AI services in a worker,
+- model routing (a task name such as "evaluate" maps to a model),
+- per-model concurrency limits,
+- retries with jittered exponential backoff on 429/5xx and per-call timeouts,
+- token budgeting: prompts are counted before sending and `max_tokens` is
+  sized to the remaining context (see token_budget.py),
+- instrumentation: latency, time to first token, token usage, cost and
+  errors of every call are recorded (see llm_metrics.py).
+
+Services call `chat_completion`, `stream_chat_completion`, `ainvoke` or
+`embed` with a task name instead of creating their own clients, so throughput can be tuned
+in one place (see the LLM_* settings in app/config.py).
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_openai import ChatOpenAI
+
+from app.config import settings
+from app.services import llm_metrics, token_budget
+from app.utils.token_utils import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# Task name -> model. Override any entry with the LLM_MODEL_ROUTES setting.
+DEFAULT_MODEL_ROUTES: Dict[str, str] = {
+    "generate": "gpt-4-turbo",
+    "enhance": "gpt-4-turbo",
+    "evaluate": "gpt-4.1",
+    "compliance": "gpt-4.1",
+    "research": "gpt-4-turbo",
+    "template": "gpt-4.1",
+    "agent": "gpt-4-turbo",
+    "general": "gpt-4.1",
+    "embed": "text-embedding-3-small",
+}
+
+# A single pooled HTTP client shared by every AI service in this worker.
+# Reusing connections avoids a TLS handshake per call and keeps the number
+# of open sockets to the OpenAI API bounded.
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    ),
+    timeout=httpx.Timeout(settings.OPENAI_TIMEOUT_SECONDS, connect=10.0),
+)
+
+# Retries are handled by the gateway so backoff and concurrency slots are accounted for together
+async_client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    base_url=settings.OPENAI_BASE_URL,
+    http_client=http_client,
+    max_retries=0,
+)
+
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+# (task, temperature) -> LangChain model used by `ainvoke`
+_invoke_models: Dict[Tuple[str, float], ChatOpenAI] = {}
+
+
+def get_async_client() -> AsyncOpenAI:
+    """Return the shared async OpenAI client."""
+    return async_client
+
+
+def resolve_model(task: str) -> str:
+    """Return the model configured for a task, falling back to the "general" route."""
+    routes = {**DEFAULT_MODEL_ROUTES, **settings.LLM_MODEL_ROUTES}
+    return routes.get(task, routes["general"])
+
+
+def _get_semaphore(model: str) -> asyncio.Semaphore:
+    semaphore = _semaphores.get(model)
+    if semaphore is None:
+        limit = settings.LLM_MODEL_CONCURRENCY.get(model, settings.LLM_DEFAULT_CONCURRENCY)
+        semaphore = asyncio.Semaphore(limit)
+        _semaphores[model] = semaphore
+    return semaphore
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def _backoff_delay(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when the API sends one."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), settings.LLM_RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+async def _with_retries(task: str, model: str, call):
+    """Run `call` under the model's concurrency limit, retrying transient failures."""
+    semaphore = _get_semaphore(model)
+    attempt = 0
+    while True:
+        try:
+            async with semaphore:
+                return await call()
+        except Exception as e:
+            if not _is_retryable(e) or attempt >= settings.LLM_MAX_RETRIES:
+                logger.error(f"LLM call for task '{task}' ({model}) failed after {attempt + 1} attempt(s): {str(e)}")
+                raise
+            delay = _backoff_delay(attempt, e)
+            attempt += 1
+            llm_metrics.record_retry(task, model, e)
+            logger.warning(f"LLM call for task '{task}' ({model}) failed with {type(e).__name__}; retry {attempt}/{settings.LLM_MAX_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+def _response_usage(model: str, response: Any, prompt_tokens: int) -> Tuple[int, int]:
+    """The usage the API reported, or our own estimate when it reported none."""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return usage.prompt_tokens, usage.completion_tokens
+    content = response.choices[0].message.content if getattr(response, "choices", None) else ""
+    return prompt_tokens, count_tokens(content or "", model)
+
+
+class _UsageCallback(BaseCallbackHandler):
+    """Records latency, token usage and errors of calls LangChain makes on a gateway model."""
+
+    def __init__(self, task: str, model: str):
+        self.task = task
+        self.model = model
+        # run_id -> start time of calls in flight
+        self._started: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def _latency(self, run_id: UUID) -> float:
+        started = self._started.pop(run_id, None)
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        llm_metrics.record_llm_call(
+            self.task,
+            self.model,
+            self._latency(run_id),
+            usage.get("prompt_tokens", 0),
+            usage.get("completion_tokens", 0),
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        llm_metrics.record_llm_call(self.task, self.model, self._latency(run_id), error=error)
+
+
+async def chat_completion(
+    task: str,
+    messages: List[Dict[str, str]],
+    *,
+    model: Optional[str] = None,
+    timeout: Optional[float] = None,
+    **params: Any,
+):
+    """
+    Run a chat completion for a task through the shared client.
+
+    Parameters:
+    - task (str): Routing key, e.g. "generate" or "evaluate".
+    - messages (list): Chat messages.
+    - model (str, optional): Explicit model, bypassing routing.
+    - timeout (float, optional): Per-call timeout in seconds.
+    - params: Any other `chat.completions.create` arguments. `max_tokens` is
+      treated as an upper bound and clamped to the remaining context.
+
+    Returns:
+    - The OpenAI ChatCompletion response.
+    """
+    model = model or resolve_model(task)
+    timeout = timeout or settings.LLM_REQUEST_TIMEOUT
+    messages, params["max_tokens"], prompt_tokens = token_budget.plan_chat_request(model, messages, params.get("max_tokens"))
+
+    async def call():
+        return await async_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            timeout=timeout,
+            **params
+        )
+
+    with llm_metrics.observe_llm_call(task, model) as observed:
+        response = await _with_retries(task, model, call)
+        observed.set_usage(*_response_usage(model, response, prompt_tokens))
+    return response
+
+
+async def stream_chat_completion(
+    task: str,
+    messages: List[Dict[str, str]],
+    *,
+    model: Optional[str] = None,
+    timeout: Optional[float] = None,
+    **params: Any,
+) -> AsyncIterator[str]:
+    """
+    Stream the content deltas of a chat completion.
+
+    The concurrency slot is held for the lifetime of the stream. Opening the
+    stream is retried like any other call; once content has been delivered a
+    failure is raised to the caller instead of being retried.
+    """
+    model = model or resolve_model(task)
+    timeout = timeout or settings.LLM_REQUEST_TIMEOUT
+    messages, params["max_tokens"], prompt_tokens = token_budget.plan_chat_request(model, messages, params.get("max_tokens"))
+    semaphore = _get_semaphore(model)
+    attempt = 0
+    with llm_metrics.observe_llm_call(task, model) as observed:
+        async with semaphore:
+            while True:
+                try:
+                    stream = await async_client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        timeout=timeout,
+                        stream=True,
+                        stream_options={"include_usage": True},
+                        **params
+                    )
+                    break
+                except Exception as e:
+                    if not _is_retryable(e) or attempt >= settings.LLM_MAX_RETRIES:
+                        logger.error(f"LLM stream for task '{task}' ({model}) failed after {attempt + 1} attempt(s): {str(e)}")
+                        raise
+                    delay = _backoff_delay(attempt, e)
+                    attempt += 1
+                    llm_metrics.record_retry(task, model, e)
+                    logger.warning(f"LLM stream for task '{task}' ({model}) failed with {type(e).__name__}; retry {attempt}/{settings.LLM_MAX_RETRIES} in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+            usage = None
+            completion_parts: List[str] = []
+            async for chunk in stream:
+                # With include_usage the final chunk carries the usage and no choices
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    observed.first_token()
+                    completion_parts.append(delta)
+                    yield delta
+
+            if usage is not None:
+                observed.set_usage(usage.prompt_tokens, usage.completion_tokens)
+            else:
+                observed.set_usage(prompt_tokens, count_tokens("".join(completion_parts), model))
+
+
+def get_chat_model(task: str, temperature: float = 0.5, **kwargs: Any) -> ChatOpenAI:
+    """
+    Build a LangChain chat model for a task on the shared HTTP pool.
+
+    Used where LangChain drives the calls itself (the chat agent); the OpenAI
+    SDK's own jittered retries are enabled for those models. Token usage of
+    every call is recorded with its latency and errors.
+    """
+    model = resolve_model(task)
+    kwargs.setdefault("openai_api_key", settings.OPENAI_API_KEY)
+    kwargs.setdefault("max_retries", settings.LLM_MAX_RETRIES)
+    kwargs.setdefault("timeout", settings.LLM_REQUEST_TIMEOUT)
+    kwargs.setdefault("callbacks", [_UsageCallback(task, model)])
+    if settings.OPENAI_BASE_URL:
+        kwargs.setdefault("base_url", settings.OPENAI_BASE_URL)
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        http_async_client=http_client,
+        **kwargs
+    )
+
+
+async def ainvoke(task: str, prompt: Any, temperature: float = 0.5, max_tokens: Optional[int] = None) -> str:
+    """
+    Invoke a LangChain chat model for a task with gateway retries and limits; returns the text content.
+    String prompts are sized against the context window like `chat_completion` requests.
+    """
+    model = resolve_model(task)
+    llm = _invoke_models.get((task, temperature))
+    if llm is None:
+        llm = get_chat_model(task, temperature, max_retries=0)
+        _invoke_models[(task, temperature)] = llm
+
+    invoke_kwargs: Dict[str, Any] = {}
+    if isinstance(prompt, str):
+        messages, invoke_kwargs["max_tokens"], _ = token_budget.plan_chat_request(model, [{"role": "user", "content": prompt}], max_tokens)
+        prompt = messages[0]["content"]
+    elif max_tokens:
+        invoke_kwargs["max_tokens"] = max_tokens
+
+    async def call():
+        return await llm.ainvoke(prompt, **invoke_kwargs)
+
+    response = await _with_retries(task, model, call)
+    return response.content
+
+
+def _embedding_batches(inputs: List[str], token_counts: List[int]) -> List[Tuple[List[str], int]]:
+    """
+    Split embedding inputs into requests of at most EMBEDDING_BATCH_SIZE texts
+    and EMBEDDING_MAX_BATCH_TOKENS tokens, keeping input order.
+
+    Returns:
+    - List[Tuple[List[str], int]]: Each batch with its token count.
+    """
+    batches: List[Tuple[List[str], int]] = []
+    batch: List[str] = []
+    batch_tokens = 0
+    for text, tokens in zip(inputs, token_counts):
+        if batch and (len(batch) >= settings.EMBEDDING_BATCH_SIZE or batch_tokens + tokens > settings.EMBEDDING_MAX_BATCH_TOKENS):
+            batches.append((batch, batch_tokens))
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        batches.append((batch, batch_tokens))
+    return batches
+
+
+async def embed(task: str, texts: List[str], *, model: Optional[str] = None) -> List[List[float]]:
+    """
+    Embed texts through the shared client, in batches of at most
+    EMBEDDING_BATCH_SIZE texts and EMBEDDING_MAX_BATCH_TOKENS tokens.
+
+    Parameters:
+    - task (str): Routing key, e.g. "embed".
+    - texts (list): Texts to embed. Each is truncated to EMBEDDING_MAX_INPUT_TOKENS.
+    - model (str, optional): Explicit model, bypassing routing.
+
+    Returns:
+    - List[List[float]]: One vector per text, in input order.
+    """
+    model = model or resolve_model(task)
+    inputs = [truncate_to_tokens(text, settings.EMBEDDING_MAX_INPUT_TOKENS, model) or " " for text in texts]
+    token_counts = [count_tokens(text, model) for text in inputs]
+    vectors: List[List[float]] = []
+    for batch, batch_tokens in _embedding_batches(inputs, token_counts):
+
+        async def call():
+            return await async_client.embeddings.create(model=model, input=batch, timeout=settings.LLM_REQUEST_TIMEOUT)
+
+        with llm_metrics.observe_llm_call(task, model) as observed:
+            response = await _with_retries(task, model, call)
+            usage = getattr(response, "usage", None)
+            observed.set_usage(usage.prompt_tokens if usage else batch_tokens, 0)
+        vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+    return vectors
+
+
+async def close_clients() -> None:
+    """Close the pooled connections. Called on application shutdown."""
+    await async_client.close()
+    logger.info("Closed pooled OpenAI client.")
@@ -0,0 +1,200 @@
+"""
+Instrumentation for LLM calls.
+
+Every call made through the gateway (and the blog content generator) is
+observed with `observe_llm_call`. The observation records the model,
+latency, time to first token for streams, prompt and completion tokens, an
+estimated cost and the error class on failure. Results go to:
+
+- Prometheus histograms and counters, served at /metrics. The labels are
+  task, model and outcome; user ids are not labels, to keep cardinality bounded.
+- A per-user daily rollup held in memory and periodically flushed to the
+  `llm_usage_daily` table by app/services/usage_rollup.py.
+
+The user for the rollup comes from the `current_user_id` context variable,
+which `get_current_user` sets for each request.
+
+This module deliberately does not import app settings or the database
+client, so standalone services such as the blog can use it.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Set per request by get_current_user; background tasks inherit it
+current_user_id: ContextVar[Optional[str]] = ContextVar("current_user_id", default=None)
+
+# USD per million (prompt, completion) tokens. Prefix matches cover dated snapshots.
+MODEL_PRICES_PER_MILLION: Dict[str, Tuple[float, float]] = {
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4": (30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+}
+
+LLM_REQUEST_LATENCY = Histogram(
+    "llm_request_latency_seconds",
+    "Wall time of an LLM call, including retries",
+    ["task", "model", "outcome"],
+    buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 30, 45, 60, 90, 120, 180),
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time until the first content token of a streamed LLM call",
+    ["task", "model"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 20),
+)
+LLM_REQUESTS = Counter("llm_requests_total", "LLM calls", ["task", "model", "outcome"])
+LLM_ERRORS = Counter("llm_errors_total", "Failed LLM calls by error class", ["task", "model", "error_class"])
+LLM_RETRIES = Counter("llm_retries_total", "Retried LLM call attempts by error class", ["task", "model", "error_class"])
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens used by LLM calls", ["task", "model", "kind"])
+LLM_COST = Counter("llm_cost_usd_total", "Estimated LLM spend in USD", ["task", "model"])
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of a call; 0 for models without a known price."""
+    for prefix, (prompt_price, completion_price) in MODEL_PRICES_PER_MILLION.items():
+        if model == prefix or model.startswith(prefix + "-"):
+            return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+    return 0.0
+
+
+class LLMCallObservation:
+    """Mutable record of one call, filled in by the caller inside `observe_llm_call`."""
+
+    def __init__(self, task: str, model: str):
+        self.task = task
+        self.model = model
+        self.started = time.perf_counter()
+        self.time_to_first_token: Optional[float] = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def first_token(self) -> None:
+        """Mark the arrival of the first streamed token. Later calls are ignored."""
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.perf_counter() - self.started
+
+    def set_usage(self, prompt_tokens: int, completion_tokens: int) -> None:
+        self.prompt_tokens = prompt_tokens or 0
+        self.completion_tokens = completion_tokens or 0
+
+    def set_usage_from_response(self, response: Any) -> None:
+        """Take token counts from an OpenAI response's `usage`, if present."""
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.set_usage(usage.prompt_tokens, usage.completion_tokens)
+
+
+_rollup_lock = threading.Lock()
+# (day, user_id, task, model) -> totals waiting to be flushed
+_pending_rollup: Dict[Tuple[str, Optional[str], str, str], Dict[str, float]] = {}
+
+
+def _add_to_rollup(user_id: Optional[str], task: str, model: str, error: bool, prompt_tokens: int, completion_tokens: int, cost: float, latency: float) -> None:
+    day = datetime.now(timezone.utc).date().isoformat()
+    with _rollup_lock:
+        totals = _pending_rollup.setdefault((day, user_id, task, model), {
+            "calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "latency_ms": 0
+        })
+        totals["calls"] += 1
+        totals["errors"] += int(error)
+        totals["prompt_tokens"] += prompt_tokens
+        totals["completion_tokens"] += completion_tokens
+        totals["cost_usd"] += cost
+        totals["latency_ms"] += int(latency * 1000)
+
+
+def take_pending_rollup() -> Dict[Tuple[str, Optional[str], str, str], Dict[str, float]]:
+    """Remove and return the rollup accumulated since the last flush."""
+    global _pending_rollup
+    with _rollup_lock:
+        pending, _pending_rollup = _pending_rollup, {}
+    return pending
+
+
+def restore_pending_rollup(pending: Dict[Tuple[str, Optional[str], str, str], Dict[str, float]]) -> None:
+    """Put back rollup rows that could not be flushed so they are retried."""
+    with _rollup_lock:
+        for key, values in pending.items():
+            totals = _pending_rollup.setdefault(key, {name: 0 for name in values})
+            for name, value in values.items():
+                totals[name] += value
+
+
+def record_retry(task: str, model: str, error: Exception) -> None:
+    LLM_RETRIES.labels(task, model, type(error).__name__).inc()
+
+
+def record_llm_call(
+    task: str,
+    model: str,
+    latency: float,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    error: Optional[BaseException] = None,
+    time_to_first_token: Optional[float] = None,
+) -> None:
+    """Record one finished LLM call in the Prometheus metrics and the daily rollup."""
+    outcome = "error" if error is not None else "success"
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    LLM_REQUEST_LATENCY.labels(task, model, outcome).observe(latency)
+    LLM_REQUESTS.labels(task, model, outcome).inc()
+    if error is not None:
+        LLM_ERRORS.labels(task, model, type(error).__name__).inc()
+    if time_to_first_token is not None:
+        LLM_TIME_TO_FIRST_TOKEN.labels(task, model).observe(time_to_first_token)
+    LLM_TOKENS.labels(task, model, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(task, model, "completion").inc(completion_tokens)
+    LLM_COST.labels(task, model).inc(cost)
+    _add_to_rollup(current_user_id.get(), task, model, error is not None, prompt_tokens, completion_tokens, cost, latency)
+    logger.info(
+        f"LLM call task='{task}' model={model} outcome={outcome} latency={latency:.2f}s"
+        + (f" ttft={time_to_first_token:.2f}s" if time_to_first_token is not None else "")
+        + f" tokens={prompt_tokens}+{completion_tokens} cost=${cost:.4f}"
+        + (f" error={type(error).__name__}" if error is not None else "")
+    )
+
+
+@contextmanager
+def observe_llm_call(task: str, model: str) -> Iterator[LLMCallObservation]:
+    """
+    Observe one LLM call. Fill in usage (and first token for streams) on the
+    yielded observation; latency and errors are captured automatically.
+
+    Usage:
+        with observe_llm_call("evaluate", model) as call:
+            response = await client.chat.completions.create(...)
+            call.set_usage_from_response(response)
+    """
+    call = LLMCallObservation(task, model)
+    error: Optional[BaseException] = None
+    try:
+        yield call
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        record_llm_call(
+            task,
+            model,
+            time.perf_counter() - call.started,
+            call.prompt_tokens,
+            call.completion_tokens,
+            error=error,
+            time_to_first_token=call.time_to_first_token,
+        )
@@ -0,0 +1,130 @@
+"""
+Process pool for PDF/DOCX rendering.
+
+Rendering is CPU-bound pure Python (reportlab, python-docx) and holds the GIL,
+so running it on the event loop blocks every other request on the worker,
+and a thread pool would not help. Renders are sent to a ProcessPoolExecutor
+of RENDER_POOL_WORKERS processes instead (0 renders in a thread, for small
+deployments).
+
+Backpressure: at most RENDER_POOL_MAX_PENDING renders may be submitted at
+once per API worker. Further requests wait up to
+RENDER_POOL_QUEUE_TIMEOUT_SECONDS for a slot and then fail with
+`RenderPoolBusy`, which routes turn into a 503 with Retry-After. Queue depth,
+in-flight renders, render time and rejections are exported to Prometheus.
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.config import settings
+from app.services.document_renderer import render_document
+
+logger = logging.getLogger(__name__)
+
+RENDER_QUEUE_DEPTH = Gauge("render_queue_depth", "Renders waiting for a render pool slot", multiprocess_mode="livesum")
+RENDER_IN_FLIGHT = Gauge("render_in_flight", "Renders submitted to the render pool and not finished", multiprocess_mode="livesum")
+RENDER_DURATION = Histogram(
+    "render_duration_seconds",
+    "Time to render a document, excluding time spent waiting for a slot",
+    ["format"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+RENDER_WAIT = Histogram(
+    "render_queue_wait_seconds",
+    "Time a render waited for a render pool slot",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+RENDER_REJECTED = Counter("render_rejected_total", "Renders rejected because the render pool was saturated")
+
+
+class RenderPoolBusy(Exception):
+    """Raised when no render slot frees up within RENDER_POOL_QUEUE_TIMEOUT_SECONDS."""
+
+
+class RenderPool:
+    """Bounded, lazily started process pool shared by the export routes of one API worker."""
+
+    def __init__(self, workers: int, max_pending: int, queue_timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore binds to the running event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._slots
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: children must not inherit the event loop, sockets or the Supabase client
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            logger.info(f"Started render pool with {self.workers} processes")
+        return self._executor
+
+    async def _acquire(self) -> None:
+        slots = self._get_slots()
+        started = time.perf_counter()
+        RENDER_QUEUE_DEPTH.inc()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            RENDER_REJECTED.inc()
+            raise RenderPoolBusy(f"Render queue is full ({self.max_pending} renders pending)")
+        finally:
+            RENDER_QUEUE_DEPTH.dec()
+            RENDER_WAIT.observe(time.perf_counter() - started)
+
+    async def render(self, content: str, fmt: str) -> bytes:
+        """
+        Render a markdown document to "pdf" or "docx" bytes off the event loop.
+
+        Raises:
+        - RenderPoolBusy: If the pool stays saturated for the queue timeout.
+        """
+        await self._acquire()
+        RENDER_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                return await asyncio.to_thread(render_document, content, fmt)
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            try:
+                return await loop.run_in_executor(executor, render_document, content, fmt)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); replace the pool, unless a concurrent render already did, and retry once
+                if self._executor is executor:
+                    logger.error("Render pool broke; restarting it")
+                    self.shutdown()
+                return await loop.run_in_executor(self._get_executor(), render_document, content, fmt)
+        finally:
+            RENDER_DURATION.labels(fmt).observe(time.perf_counter() - started)
+            RENDER_IN_FLIGHT.dec()
+            self._get_slots().release()
+
+    async def warm_up(self) -> None:
+        """Start the worker processes and import the renderer in them, so the first export is not slowed by it."""
+        if self.workers > 0:
+            await asyncio.gather(*(self.render("", "pdf") for _ in range(self.workers)))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+render_pool = RenderPool(
+    workers=settings.RENDER_POOL_WORKERS,
+    max_pending=settings.RENDER_POOL_MAX_PENDING,
+    queue_timeout=settings.RENDER_POOL_QUEUE_TIMEOUT_SECONDS,
+)
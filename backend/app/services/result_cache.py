@@ -0,0 +1,150 @@
+"""
+Content-addressed cache for deterministic AI results (evaluation, compliance).
+
+Entries are keyed by a SHA-256 over everything that can change the answer:
+the document content, the evaluation criteria, jurisdiction, document type,
+the model the task is routed to and the prompt version. Editing a prompt
+therefore only needs a prompt-version bump to invalidate old entries.
+
+Two tiers are used:
+- a small in-process LRU for repeat hits inside a worker,
+- a SQLite file shared by all workers on the host, with LRU eviction by
+  last access once it grows past AI_RESULT_CACHE_MAX_ENTRIES.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Any, Dict, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(
+    kind: str,
+    content: str,
+    *,
+    model: str,
+    prompt_version: str,
+    criteria: Optional[str] = None,
+    jurisdiction: Optional[str] = None,
+    document_type: Optional[str] = None,
+) -> str:
+    """Build the cache key for one AI result."""
+    payload = json.dumps({
+        "kind": kind,
+        "content_sha256": hashlib.sha256(content.encode("utf-8")).hexdigest(),
+        "criteria": criteria,
+        "jurisdiction": jurisdiction,
+        "document_type": document_type,
+        "model": model,
+        "prompt_version": prompt_version,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """In-memory LRU in front of a persistent SQLite store."""
+
+    def __init__(self, path: str, max_entries: int, memory_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._initialized = False
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ai_results ("
+                " key TEXT PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_results_last_accessed ON ai_results(last_accessed)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def _remember(self, key: str, value: Dict[str, Any]) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _get_persistent(self, key: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT value FROM ai_results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE ai_results SET last_accessed = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0])
+
+    def _set_persistent(self, key: str, kind: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_results (key, kind, value, created_at, last_accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, json.dumps(value), now, now)
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM ai_results").fetchone()
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM ai_results WHERE key IN (SELECT key FROM ai_results ORDER BY last_accessed ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached value for a key, or None."""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+        try:
+            value = await asyncio.to_thread(self._get_persistent, key)
+        except Exception as e:
+            logger.warning(f"Result cache read failed: {str(e)}")
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(key, value)
+        return value
+
+    async def set(self, key: str, kind: str, value: Dict[str, Any]) -> None:
+        """Store a value. Failures are logged and never break the caller."""
+        self._remember(key, value)
+        try:
+            await asyncio.to_thread(self._set_persistent, key, kind, value)
+        except Exception as e:
+            logger.warning(f"Result cache write failed: {str(e)}")
+
+
+def _build_cache() -> Optional[ResultCache]:
+    if not settings.AI_RESULT_CACHE_ENABLED:
+        return None
+    directory = os.path.dirname(settings.AI_RESULT_CACHE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return ResultCache(
+        path=settings.AI_RESULT_CACHE_PATH,
+        max_entries=settings.AI_RESULT_CACHE_MAX_ENTRIES,
+        memory_entries=settings.AI_RESULT_CACHE_MEMORY_ENTRIES,
+    )
+
+
+result_cache = _build_cache()
@@ -0,0 +1,300 @@
+"""
+Embedding index over the template corpus, used to give document generation
+relevant template text without an exact state/document-type match.
+
+Each template in the `templates` table is split into clause-sized chunks
+(TEMPLATE_INDEX_CHUNK_TOKENS) and every chunk is embedded once. The vectors
+are kept as one L2-normalized float32 matrix, so a search is a single
+matrix-vector product followed by a partial sort: a few milliseconds for
+thousands of chunks, with no external vector store.
+
+The index is persisted to TEMPLATE_INDEX_PATH (an .npz file) together with a
+hash of each template's content. `sync()` diffs the table against those
+hashes and only embeds new or changed templates; the template routes call
+`upsert_template` / `remove_template` as templates are created or deleted.
+Other workers on the host pick up a newer file on their next search.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.models.database import supabase
+from app.services import llm_gateway
+from app.utils.token_utils import chunk_document, count_tokens
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_SELECT = "id, template_name, content, states:state_id(state_name), document_types:document_type_id(document_type_name)"
+TEMPLATE_PAGE_SIZE = 500
+
+# Per-chunk string columns stored alongside the vectors
+_CHUNK_COLUMNS = ("template_ids", "template_names", "state_names", "document_types", "texts")
+
+
+class TemplateMatch(NamedTuple):
+    template_id: str
+    template_name: str
+    state_name: str
+    document_type: str
+    text: str
+    score: float
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _template_fields(row: Dict[str, Any]) -> Dict[str, str]:
+    """Flatten a `templates` row with its joined state and document type names."""
+    return {
+        "template_id": str(row["id"]),
+        "template_name": row.get("template_name") or "",
+        "content": row.get("content") or "",
+        "state_name": (row.get("states") or {}).get("state_name") or "",
+        "document_type": (row.get("document_types") or {}).get("document_type_name") or "",
+    }
+
+
+def _fetch_templates() -> List[Dict[str, str]]:
+    templates: List[Dict[str, str]] = []
+    start = 0
+    while True:
+        response = supabase.from_("templates").select(TEMPLATE_SELECT).order("id").range(start, start + TEMPLATE_PAGE_SIZE - 1).execute()
+        rows = response.data or []
+        templates.extend(_template_fields(row) for row in rows)
+        if len(rows) < TEMPLATE_PAGE_SIZE:
+            return templates
+        start += TEMPLATE_PAGE_SIZE
+
+
+class TemplateIndex:
+    """Chunk vectors of all templates in one matrix, with per-chunk metadata columns."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.model = llm_gateway.resolve_model("embed")
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.columns: Dict[str, np.ndarray] = {name: np.array([], dtype=str) for name in _CHUNK_COLUMNS}
+        self.template_hashes: Dict[str, str] = {}
+        self._loaded_mtime: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self.columns["template_ids"])
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> bool:
+        """Load the persisted index if it exists and was built with the current embedding model."""
+        mtime = self._file_mtime()
+        if mtime is None:
+            return False
+        with np.load(self.path, allow_pickle=False) as data:
+            if str(data["model"]) != self.model:
+                logger.info(f"Template index at {self.path} was built with {data['model']}; it will be rebuilt with {self.model}")
+                return False
+            self.vectors = data["vectors"]
+            self.columns = {name: data[name] for name in _CHUNK_COLUMNS}
+            self.template_hashes = dict(zip(data["hash_template_ids"].tolist(), data["hashes"].tolist()))
+        self._loaded_mtime = mtime
+        logger.info(f"Loaded template index: {len(self)} chunks from {len(self.template_hashes)} templates")
+        return True
+
+    def _maybe_reload(self) -> None:
+        # Another worker may have updated the index file since we loaded it
+        mtime = self._file_mtime()
+        if mtime is not None and mtime != self._loaded_mtime:
+            self.load()
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                model=np.array(self.model),
+                vectors=self.vectors,
+                hash_template_ids=np.array(list(self.template_hashes.keys()), dtype=str),
+                hashes=np.array(list(self.template_hashes.values()), dtype=str),
+                **self.columns
+            )
+        os.replace(tmp_path, self.path)
+        self._loaded_mtime = self._file_mtime()
+
+    def _drop(self, template_ids: List[str]) -> None:
+        keep = ~np.isin(self.columns["template_ids"], template_ids)
+        if self.vectors.size:
+            self.vectors = self.vectors[keep]
+        self.columns = {name: column[keep] for name, column in self.columns.items()}
+        for template_id in template_ids:
+            self.template_hashes.pop(template_id, None)
+
+    async def _embed_templates(self, templates: List[Dict[str, str]]) -> None:
+        """Chunk and embed templates, replacing any chunks they already had."""
+        rows: Dict[str, List[str]] = {name: [] for name in _CHUNK_COLUMNS}
+        for template in templates:
+            for chunk in chunk_document(template["content"], settings.TEMPLATE_INDEX_CHUNK_TOKENS, self.model):
+                if not chunk.strip():
+                    continue
+                rows["template_ids"].append(template["template_id"])
+                rows["template_names"].append(template["template_name"])
+                rows["state_names"].append(template["state_name"])
+                rows["document_types"].append(template["document_type"])
+                rows["texts"].append(chunk.strip())
+
+        vectors = np.zeros((0, self.vectors.shape[1] if self.vectors.size else 0), dtype=np.float32)
+        if rows["texts"]:
+            # Prefix each chunk with its template's labels so "Florida motion" style queries match
+            labelled = [
+                f"{name} ({state}, {document_type})\n{text}"
+                for name, state, document_type, text in zip(rows["template_names"], rows["state_names"], rows["document_types"], rows["texts"])
+            ]
+            vectors = np.asarray(await llm_gateway.embed("embed", labelled, model=self.model), dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        self._drop([template["template_id"] for template in templates])
+        self.vectors = np.vstack([self.vectors, vectors]) if self.vectors.size else vectors
+        self.columns = {name: np.concatenate([self.columns[name], np.array(rows[name], dtype=str)]) for name in _CHUNK_COLUMNS}
+        for template in templates:
+            self.template_hashes[template["template_id"]] = content_hash(template["content"])
+
+    async def sync(self) -> Dict[str, int]:
+        """
+        Bring the index up to date with the `templates` table, embedding only
+        templates that are new or whose content changed.
+
+        Returns:
+        - Dict[str, int]: Counts of templates embedded, removed and unchanged.
+        """
+        async with self._lock:
+            if self._loaded_mtime is None:
+                await asyncio.to_thread(self.load)
+            templates = await asyncio.to_thread(_fetch_templates)
+            current_ids = {template["template_id"] for template in templates}
+            removed = [template_id for template_id in self.template_hashes if template_id not in current_ids]
+            changed = [
+                template for template in templates
+                if self.template_hashes.get(template["template_id"]) != content_hash(template["content"])
+            ]
+            if removed:
+                self._drop(removed)
+            if changed:
+                await self._embed_templates(changed)
+            if removed or changed or self._loaded_mtime is None:
+                await asyncio.to_thread(self._save)
+            stats = {"embedded": len(changed), "removed": len(removed), "unchanged": len(templates) - len(changed)}
+            logger.info(f"Template index synced: {stats}, {len(self)} chunks")
+            return stats
+
+    async def upsert_template(self, template_id: str) -> None:
+        """Embed one template (after it was created or edited)."""
+        response = supabase.from_("templates").select(TEMPLATE_SELECT).eq("id", template_id).maybe_single().execute()
+        if not response or not response.data:
+            return await self.remove_template(template_id)
+        template = _template_fields(response.data)
+        async with self._lock:
+            self._maybe_reload()
+            if self.template_hashes.get(template_id) == content_hash(template["content"]):
+                return
+            await self._embed_templates([template])
+            await asyncio.to_thread(self._save)
+        logger.info(f"Indexed template {template_id}")
+
+    async def remove_template(self, template_id: str) -> None:
+        """Drop a deleted template's chunks."""
+        async with self._lock:
+            self._maybe_reload()
+            if template_id not in self.template_hashes:
+                return
+            self._drop([template_id])
+            await asyncio.to_thread(self._save)
+        logger.info(f"Removed template {template_id} from the index")
+
+    def search_vector(self, query_vector: np.ndarray, k: int, state_name: Optional[str] = None) -> List[TemplateMatch]:
+        """
+        Top-k chunks by cosine similarity to an (unnormalized) query vector.
+        With `state_name`, chunks from that state's templates are searched
+        first, falling back to the whole corpus when the state has none.
+        """
+        if not len(self) or k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        candidates = np.arange(len(self))
+        scores = self.vectors @ query
+        if state_name:
+            in_state = np.flatnonzero(np.char.lower(self.columns["state_names"]) == state_name.lower())
+            if in_state.size:
+                candidates, scores = in_state, scores[in_state]
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            TemplateMatch(
+                template_id=str(self.columns["template_ids"][i]),
+                template_name=str(self.columns["template_names"][i]),
+                state_name=str(self.columns["state_names"][i]),
+                document_type=str(self.columns["document_types"][i]),
+                text=str(self.columns["texts"][i]),
+                score=float(scores[j]),
+            )
+            for j, i in zip(top, candidates[top])
+        ]
+
+    async def search(self, query: str, k: int, state_name: Optional[str] = None) -> List[TemplateMatch]:
+        """Embed a query and return the top-k template chunks."""
+        self._maybe_reload()
+        if not len(self):
+            return []
+        query_vector = (await llm_gateway.embed("embed", [query], model=self.model))[0]
+        return self.search_vector(np.asarray(query_vector, dtype=np.float32), k, state_name)
+
+
+template_index = TemplateIndex(settings.TEMPLATE_INDEX_PATH)
+
+
+async def retrieve_template_context(query: str, jurisdiction: Optional[str] = None) -> str:
+    """
+    Template excerpts relevant to a generation request, formatted for the prompt.
+    Returns an empty string when retrieval is disabled, finds nothing relevant
+    or fails, so generation never depends on it.
+
+    Parameters:
+    - query (str): What is being drafted (type, area of law, title, notes).
+    - jurisdiction (str, optional): Preferred state for the templates.
+
+    Returns:
+    - str: Excerpts with their source template, within TEMPLATE_RETRIEVAL_MAX_TOKENS.
+    """
+    if not settings.TEMPLATE_RETRIEVAL_ENABLED:
+        return ""
+    try:
+        started = time.perf_counter()
+        matches = await template_index.search(query, settings.TEMPLATE_RETRIEVAL_TOP_K, jurisdiction)
+    except Exception as e:
+        logger.warning(f"Template retrieval failed, generating without template context: {str(e)}")
+        return ""
+
+    excerpts: List[str] = []
+    used_tokens = 0
+    for match in matches:
+        if match.score < settings.TEMPLATE_RETRIEVAL_MIN_SCORE:
+            continue
+        excerpt = f"[From template \"{match.template_name}\" ({match.state_name}, {match.document_type})]\n{match.text}"
+        excerpt_tokens = count_tokens(excerpt, template_index.model)
+        if used_tokens + excerpt_tokens > settings.TEMPLATE_RETRIEVAL_MAX_TOKENS:
+            break
+        excerpts.append(excerpt)
+        used_tokens += excerpt_tokens
+    logger.info(f"Retrieved {len(excerpts)} template excerpts ({used_tokens} tokens) in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return "\n\n".join(excerpts)
@@ -0,0 +1,98 @@
+"""
+Token budgeting for LLM calls.
+
+Before a call is sent the gateway asks `plan_chat_request` to size it:
+prompt tokens are counted with tiktoken, `max_tokens` is clamped to what is
+left of the model's context window (and to the model's output limit), and if
+the prompt itself does not leave room for a useful answer the largest
+message is truncated to fit. Token usage of finished calls is recorded by
+app/services/llm_metrics.py.
+"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.token_utils import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# Model -> (context window, max output tokens). Prefix matches cover dated snapshots.
+MODEL_LIMITS: Dict[str, Tuple[int, int]] = {
+    "gpt-4.1-nano": (1047576, 32768),
+    "gpt-4.1-mini": (1047576, 32768),
+    "gpt-4.1": (1047576, 32768),
+    "gpt-4o-mini": (128000, 16384),
+    "gpt-4o": (128000, 16384),
+    "gpt-4-turbo": (128000, 4096),
+    "gpt-4": (8192, 8192),
+    "gpt-3.5-turbo": (16385, 4096),
+}
+DEFAULT_MODEL_LIMITS = (128000, 4096)
+
+# Per-message overhead of the chat format, plus the tokens priming the reply
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+TRUNCATION_NOTICE = "\n\n[... content truncated to fit the model's context window ...]"
+
+
+def get_model_limits(model: str) -> Tuple[int, int]:
+    """Return (context window, max output tokens) for a model."""
+    for prefix, limits in MODEL_LIMITS.items():
+        if model == prefix or model.startswith(prefix + "-"):
+            return limits
+    return DEFAULT_MODEL_LIMITS
+
+
+def count_message_tokens(messages: List[Dict[str, Any]], model: str) -> int:
+    """Count the prompt tokens of a list of chat messages."""
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + count_tokens(str(message.get("content") or ""), model)
+    return total
+
+
+def plan_chat_request(
+    model: str,
+    messages: List[Dict[str, Any]],
+    requested_max_tokens: Optional[int] = None,
+) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    Size a chat request to the model's context window.
+
+    Parameters:
+    - model (str): Target model.
+    - messages (list): Chat messages; not modified in place.
+    - requested_max_tokens (int, optional): The caller's completion cap. Defaults to the model's output limit.
+
+    Returns:
+    - (messages, max_tokens, prompt_tokens): Messages to send (the largest one
+      truncated if needed), the completion budget and the prompt size.
+    """
+    context_window, max_output = get_model_limits(model)
+    wanted = min(requested_max_tokens or max_output, max_output)
+    usable_context = context_window - settings.LLM_CONTEXT_SAFETY_MARGIN
+    prompt_tokens = count_message_tokens(messages, model)
+
+    # Keep at least LLM_MIN_COMPLETION_TOKENS (or the full request if smaller) for the answer
+    reserved = min(wanted, settings.LLM_MIN_COMPLETION_TOKENS)
+    overflow = prompt_tokens + reserved - usable_context
+    if overflow > 0:
+        largest = max(range(len(messages)), key=lambda i: len(str(messages[i].get("content") or "")))
+        content = str(messages[largest].get("content") or "")
+        keep = count_tokens(content, model) - overflow - count_tokens(TRUNCATION_NOTICE, model)
+        logger.warning(f"Prompt of {prompt_tokens} tokens does not fit {model}; truncating message {largest} by {overflow} tokens")
+        messages = list(messages)
+        messages[largest] = {**messages[largest], "content": truncate_to_tokens(content, keep, model) + TRUNCATION_NOTICE}
+        prompt_tokens = count_message_tokens(messages, model)
+
+    max_tokens = max(1, min(wanted, usable_context - prompt_tokens))
+    return messages, max_tokens, prompt_tokens
+
+
+def fit_text_to_budget(text: str, max_tokens: int, model: str) -> str:
+    """Truncate free text (e.g. an uploaded contract passed to chat) to a token budget."""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    logger.warning(f"Truncating text to {max_tokens} tokens for {model}")
+    return truncate_to_tokens(text, max_tokens - count_tokens(TRUNCATION_NOTICE, model), model) + TRUNCATION_NOTICE
@@ -0,0 +1,168 @@
+"""
+De-duplication of uploaded files by content hash.
+
+Uploads are hashed while they stream in (app/utils/ingestion.py). The text
+extracted from a file, and the evaluation and compliance results of an
+upload, are stored in the `upload_dedup` table (migration 025) against that
+hash. When the same file is uploaded again they are reused: no extraction,
+no evaluation and no compliance check. The user still gets their own
+`documents` row.
+
+Rows are scoped to a tenant so nothing is shared beyond it. UPLOAD_DEDUP_SCOPE
+selects the scopes:
+- "user": only the uploader's own earlier uploads are reused,
+- "team": uploads by members of any team the uploader belongs to are reused
+  as well (results are written for the user and each of their teams),
+- "off": no de-duplication.
+
+Evaluation and compliance results are only reused if they were produced with
+the current model and prompt versions.
+"""
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from prometheus_client import Counter
+
+from app.config import settings
+from app.models.database import supabase
+from app.services.ai_agent_compliance import compliance_results_key, run_compliance_check_job
+from app.services.ai_agent_evaluate import evaluation_cache_key
+from app.utils.ingestion import IngestedUpload, extract_upload_text
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DEDUP_LOOKUPS = Counter(
+    "upload_dedup_lookups_total",
+    "Upload de-duplication lookups by what was reused (miss, content, evaluation or all)",
+    ["result"],
+)
+
+
+class UploadDedup(NamedTuple):
+    scopes: List[str]  # Tenant scopes results are read from and written to
+    file_sha256: str
+    record: Optional[Dict[str, Any]]  # Stored results for this file, if any
+
+
+def upload_scopes(user_id: str) -> List[str]:
+    """The tenant scopes a user's uploads are de-duplicated within (empty when de-duplication is off)."""
+    if settings.UPLOAD_DEDUP_SCOPE == "off":
+        return []
+    scopes = [f"user:{user_id}"]
+    if settings.UPLOAD_DEDUP_SCOPE == "team":
+        memberships = supabase.from_("team_members").select("team_id").eq("user_id", user_id).execute()
+        scopes.extend(f"team:{membership['team_id']}" for membership in memberships.data or [])
+    return scopes
+
+
+def get_upload_dedup(user_id: str, file_sha256: Optional[str], lookup: bool = True) -> Optional[UploadDedup]:
+    """
+    The de-duplication state of an uploaded file.
+
+    Parameters:
+    - user_id (str): The uploader.
+    - file_sha256 (str, optional): SHA-256 of the uploaded file.
+    - lookup (bool): Look up stored results. Without it (e.g. `refresh`) results are only written.
+
+    Returns:
+    - UploadDedup, or None when de-duplication is off or the hash is unknown.
+    """
+    scopes = upload_scopes(user_id) if file_sha256 else []
+    if not scopes:
+        return None
+    record = None
+    if lookup:
+        rows = supabase.from_("upload_dedup").select("*").in_("scope", scopes).eq("file_sha256", file_sha256).execute().data or []
+        # Prefer the row with the most reusable results
+        record = max(rows, key=lambda row: (bool(row.get("compliance_check_results")), bool(row.get("evaluation_response")), row.get("updated_at") or ""), default=None)
+    return UploadDedup(scopes, file_sha256, record)
+
+
+def record_upload(dedup: Optional[UploadDedup], filename: str, content: str) -> None:
+    """Store the extracted text of a file in every scope of the uploader."""
+    if not dedup:
+        return
+    rows = [{"scope": scope, "file_sha256": dedup.file_sha256, "filename": filename, "content": content} for scope in dedup.scopes]
+    try:
+        supabase.from_("upload_dedup").upsert(rows, on_conflict="scope,file_sha256").execute()
+    except Exception as e:
+        logger.warning(f"Could not record upload {dedup.file_sha256}: {str(e)}")
+
+
+def record_results(dedup: Optional[UploadDedup], **fields: Any) -> None:
+    """Store evaluation or compliance results of a file in every scope of the uploader."""
+    if not dedup:
+        return
+    try:
+        supabase.from_("upload_dedup").update(fields).in_("scope", dedup.scopes).eq("file_sha256", dedup.file_sha256).execute()
+    except Exception as e:
+        logger.warning(f"Could not record results for upload {dedup.file_sha256}: {str(e)}")
+
+
+def reusable_results(dedup: Optional[UploadDedup], content: str) -> Dict[str, Any]:
+    """
+    Stored results that are still valid for `content`, as `documents` columns:
+    `evaluation_response`, and `compliance_check_results` with `compliance_sections`.
+    """
+    record = dedup.record if dedup else None
+    if not record or record.get("content") != content:
+        return {}
+    results: Dict[str, Any] = {}
+    if record.get("evaluation_response") and record.get("evaluation_key") == evaluation_cache_key(content):
+        results["evaluation_response"] = record["evaluation_response"]
+    compliance = record.get("compliance_check_results") or {}
+    if compliance.get("status") == "completed" and record.get("compliance_key") == compliance_results_key(content):
+        results["compliance_check_results"] = compliance
+        results["compliance_sections"] = record.get("compliance_sections")
+    return results
+
+
+def mark_reused(dedup: UploadDedup, reused: List[str]) -> None:
+    """Count a reuse of a stored file (for the metrics and the row's reuse_count)."""
+    if "compliance_check_results" in reused:
+        UPLOAD_DEDUP_LOOKUPS.labels("all").inc()
+    elif "evaluation_response" in reused:
+        UPLOAD_DEDUP_LOOKUPS.labels("evaluation").inc()
+    else:
+        UPLOAD_DEDUP_LOOKUPS.labels("content").inc()
+    try:
+        supabase.from_("upload_dedup").update({"reuse_count": (dedup.record.get("reuse_count") or 0) + 1}).eq("id", dedup.record["id"]).execute()
+    except Exception as e:
+        logger.warning(f"Could not update reuse count of upload {dedup.file_sha256}: {str(e)}")
+
+
+async def extract_upload_content(upload: IngestedUpload, user_id: str, use_cache: bool = True) -> Tuple[str, Optional[UploadDedup]]:
+    """
+    The text of an upload: reused from an earlier upload of the same file in the
+    user's scopes, or extracted and recorded for the next one.
+
+    Parameters:
+    - upload (IngestedUpload): The upload, hashed while it was received.
+    - user_id (str): The uploader.
+    - use_cache (bool): Reuse stored text. Without it the file is extracted again and the stored text replaced.
+
+    Returns:
+    - tuple: The text and the de-duplication state, to pass on to `reusable_results` / `record_results`.
+    """
+    dedup = get_upload_dedup(user_id, upload.sha256, lookup=use_cache)
+    if dedup and dedup.record:
+        logger.info(f"Reusing extracted text of {upload.filename} from an earlier upload ({upload.sha256[:12]})")
+        return dedup.record["content"], dedup
+    if dedup:
+        UPLOAD_DEDUP_LOOKUPS.labels("miss").inc()
+    content = await extract_upload_text(upload)
+    if content.strip():
+        record_upload(dedup, upload.filename, content)
+    return content, dedup
+
+
+async def check_and_record_compliance(dedup: UploadDedup, document_id: str, document_content: str, use_cache: bool = True) -> None:
+    """Background job: the compliance check of an uploaded document, stored for later uploads of the same file."""
+    update_data = await run_compliance_check_job(document_id, document_content, None, None, use_cache)
+    if update_data["compliance_check_results"].get("status") == "completed":
+        record_results(
+            dedup,
+            compliance_key=compliance_results_key(document_content),
+            compliance_check_results=update_data["compliance_check_results"],
+            compliance_sections=update_data.get("compliance_sections"),
+        )
@@ -0,0 +1,53 @@
+"""
+Persistence of the per-user daily LLM usage rollup.
+
+llm_metrics aggregates every call in memory; this module periodically writes
+the accumulated totals to `llm_usage_daily` (migration 021) in one RPC call,
+so recording a call never waits on the database. Rows that fail to flush are
+kept and retried on the next flush.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List
+
+from app.config import settings
+from app.models.database import supabase
+from app.services import llm_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def flush_usage_rollup() -> int:
+    """Write pending usage to the database. Returns the number of rows flushed."""
+    pending = llm_metrics.take_pending_rollup()
+    if not pending:
+        return 0
+    rows: List[Dict[str, Any]] = [
+        {
+            "usage_date": day,
+            "user_id": user_id,
+            "task": task,
+            "model": model,
+            "calls": totals["calls"],
+            "errors": totals["errors"],
+            "prompt_tokens": totals["prompt_tokens"],
+            "completion_tokens": totals["completion_tokens"],
+            "cost_usd": round(totals["cost_usd"], 6),
+            "total_latency_ms": totals["latency_ms"],
+        }
+        for (day, user_id, task, model), totals in pending.items()
+    ]
+    try:
+        supabase.rpc("increment_llm_usage_daily", {"rows": rows}).execute()
+    except Exception as e:
+        logger.error(f"Failed to flush LLM usage rollup ({len(rows)} rows); will retry: {str(e)}")
+        llm_metrics.restore_pending_rollup(pending)
+        return 0
+    return len(rows)
+
+
+async def run_usage_flusher() -> None:
+    """Flush the rollup every LLM_USAGE_FLUSH_INTERVAL_SECONDS until cancelled."""
+    while True:
+        await asyncio.sleep(settings.LLM_USAGE_FLUSH_INTERVAL_SECONDS)
+        await asyncio.to_thread(flush_usage_rollup)
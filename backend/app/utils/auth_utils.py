@@ -5,6 +5,7 @@ from supabase import Client
 from app.models.database import supabase
 import logging
 from app.utils.db_utils import get_profile
+from app.services.llm_metrics import current_user_id
 
 # Remove debug logging configuration - use main.py configuration
 
@@ -45,6 +46,8 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             user_data["role"] = profile.get("role", "self") # Default to 'self' if role not explicitly set
             user_data["is_admin"] = profile.get("is_admin", False)
 
+        # Attributes LLM usage made while serving this request to the user
+        current_user_id.set(user_data["id"])
         return user_data
     except Exception as e:
         logging.error(f"Error validating token: {e}")  # Log the error
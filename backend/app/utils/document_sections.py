@@ -0,0 +1,78 @@
+"""
+Section-level view of a document.
+
+Generated documents are markdown, so sections start at markdown headings.
+Documents without any (e.g. text extracted from an uploaded DOCX) fall back
+to the heading heuristics in token_utils. Each section gets a positional id
+("s1", "s2", ...) and a hash of its normalized text, so callers can tell
+which sections changed between two versions of a document.
+"""
+import hashlib
+import re
+from typing import List, NamedTuple
+
+from app.utils.token_utils import split_into_sections
+
+MARKDOWN_HEADING_PATTERN = re.compile(r"^ {0,3}#{1,6}\s+\S")
+
+
+class DocumentSection(NamedTuple):
+    id: str
+    heading: str
+    text: str
+    hash: str
+
+
+def section_hash(text: str) -> str:
+    """Hash of a section's text, ignoring trailing whitespace on lines and blank lines at the ends."""
+    normalized = "\n".join(line.rstrip() for line in text.strip().splitlines())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _split_markdown(content: str) -> List[str]:
+    parts: List[str] = []
+    current: List[str] = []
+    for line in content.splitlines(keepends=True):
+        if MARKDOWN_HEADING_PATTERN.match(line) and current:
+            parts.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+def split_sections(content: str) -> List[DocumentSection]:
+    """
+    Split a document into sections. Joining the section texts in order gives
+    back the original content exactly.
+    """
+    markdown = any(MARKDOWN_HEADING_PATTERN.match(line) for line in content.splitlines())
+    if markdown:
+        parts = _split_markdown(content)
+    else:
+        parts = split_into_sections(content) or [content]
+        # split_into_sections drops a whitespace-only tail; keep the text lossless
+        consumed = sum(len(part) for part in parts)
+        if consumed < len(content):
+            parts[-1] += content[consumed:]
+
+    sections = []
+    for index, text in enumerate(parts, start=1):
+        first_line = next((line.strip() for line in text.splitlines() if line.strip()), "")
+        if markdown:
+            heading = first_line.lstrip("#").strip() if MARKDOWN_HEADING_PATTERN.match(first_line) else "(preamble)"
+        else:
+            heading = first_line
+        sections.append(DocumentSection(f"s{index}", heading[:120], text, section_hash(text)))
+    return sections
+
+
+def build_outline(sections: List[DocumentSection]) -> str:
+    """Compact outline of a document: one line per section with its id, heading and length."""
+    return "\n".join(f"{section.id}: {section.heading} ({len(section.text.split())} words)" for section in sections)
+
+
+def join_sections(sections: List[DocumentSection]) -> str:
+    """Reassemble a document from its sections."""
+    return "".join(section.text for section in sections)
@@ -0,0 +1,307 @@
+"""
+Upload ingestion shared by every route that accepts document files.
+
+`receive_upload` streams an UploadFile in chunks into a SpooledTemporaryFile
+(in memory up to UPLOAD_SPOOL_MAX_MEMORY_BYTES, then on disk), hashing it
+on the way and rejecting it with 413 once it passes UPLOAD_MAX_BYTES, instead
+of reading the whole body with `await file.read()`.
+
+`extract_upload_text` parses the file in a process pool of
+EXTRACTION_POOL_WORKERS spawned processes (0 parses in a thread), so PDF and
+DOCX parsing no longer blocks the event loop. Each PDF page is limited to
+EXTRACTION_PAGE_TIMEOUT_SECONDS (see app/utils/text_extraction.py).
+
+PDFs are split into page ranges of at least EXTRACTION_PDF_MIN_PAGES_PER_TASK
+pages that run on all workers at once and are joined in page order. Callers
+that only need the start of a document can pass a token budget: once the
+pages read so far exceed it, the remaining ranges are cancelled, and at most
+EXTRACTION_MAX_PDF_PAGES pages are read. Without a budget the whole text is
+needed (it is stored and evaluated), so a PDF with more pages than that is
+rejected with 413 rather than cut short. Per-page extraction times are
+exported to Prometheus and the slowest page is logged.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from fastapi import HTTPException, UploadFile
+from prometheus_client import Counter, Histogram
+
+from app.config import settings
+from app.utils.text_extraction import SUPPORTED_EXTENSIONS, ExtractionError, ExtractionTimeout, extract_pdf_pages, extract_text, pdf_page_count
+from app.utils.token_utils import CHARS_PER_TOKEN
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_BYTES = 256 * 1024
+
+UPLOAD_EXTRACTION_DURATION = Histogram(
+    "upload_extraction_duration_seconds",
+    "Time to extract the text of an uploaded file",
+    ["extension"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60),
+)
+UPLOAD_REJECTED = Counter("upload_rejected_total", "Uploads rejected during ingestion", ["reason"])
+PDF_PAGE_EXTRACTION = Histogram(
+    "pdf_page_extraction_seconds",
+    "Time to extract the text of one PDF page",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+
+class PageLimitExceeded(ExtractionError):
+    """Raised when a PDF has more pages than may be read and the caller needs its whole text."""
+
+    def __init__(self, pages: int, max_pages: int):
+        super().__init__(f"{pages} pages, more than the {max_pages} page limit")
+        self.pages = pages
+        self.max_pages = max_pages
+
+
+class ExtractionResult(NamedTuple):
+    text: str
+    pages: int = 0  # Pages in the file (PDF only)
+    pages_extracted: int = 0
+    truncated: bool = False  # Stopped at the page limit or token budget
+    page_seconds: List[float] = []  # Extraction time of each extracted page, in page order
+
+
+class IngestedUpload:
+    """An upload spooled by `receive_upload`, with its size and SHA-256. Close it (or use `with`) when done."""
+
+    def __init__(self, filename: str, extension: str, spool: tempfile.SpooledTemporaryFile, size: int, sha256: str):
+        self.filename = filename
+        self.extension = extension
+        self.spool = spool
+        self.size = size
+        self.sha256 = sha256
+
+    def read_bytes(self) -> bytes:
+        self.spool.seek(0)
+        return self.spool.read()
+
+    def close(self) -> None:
+        self.spool.close()
+
+    def __enter__(self) -> "IngestedUpload":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def upload_extension(filename: Optional[str]) -> str:
+    return os.path.splitext(filename or "")[1].lstrip(".").lower()
+
+
+def _too_large(filename: str) -> HTTPException:
+    UPLOAD_REJECTED.labels("too_large").inc()
+    limit_mb = settings.UPLOAD_MAX_BYTES / (1024 * 1024)
+    return HTTPException(status_code=413, detail=f"{filename} is larger than the {limit_mb:g} MB upload limit.")
+
+
+async def receive_upload(file: UploadFile, allowed_extensions: Iterable[str] = SUPPORTED_EXTENSIONS) -> IngestedUpload:
+    """
+    Stream an upload into a spooled file while hashing it.
+
+    Parameters:
+    - file (UploadFile): The uploaded file.
+    - allowed_extensions (iterable): Accepted file extensions, lower case without the dot.
+
+    Returns:
+    - IngestedUpload: The spooled file with its size and SHA-256 hex digest.
+
+    Raises:
+    - HTTPException: 400 for an unsupported file type, 413 when the file exceeds UPLOAD_MAX_BYTES.
+    """
+    allowed_extensions = tuple(allowed_extensions)
+    extension = upload_extension(file.filename)
+    if extension not in allowed_extensions:
+        UPLOAD_REJECTED.labels("unsupported_type").inc()
+        names = [ext.upper() for ext in allowed_extensions]
+        accepted = names[0] if len(names) == 1 else f"{', '.join(names[:-1])} or {names[-1]}"
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {file.filename}. Please upload a {accepted} file.")
+    # The multipart parser records the size when it is known; fail before copying anything
+    if file.size is not None and file.size > settings.UPLOAD_MAX_BYTES:
+        raise _too_large(file.filename)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_SPOOL_MAX_MEMORY_BYTES)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            size += len(chunk)
+            if size > settings.UPLOAD_MAX_BYTES:
+                raise _too_large(file.filename)
+            digest.update(chunk)
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    return IngestedUpload(file.filename, extension, spool, size, digest.hexdigest())
+
+
+class ExtractionPool:
+    """Lazily started process pool for text extraction, shared by the upload routes of one API worker."""
+
+    def __init__(self, workers: int, page_timeout: float, min_pages_per_task: int):
+        self.workers = workers
+        self.page_timeout = page_timeout
+        self.min_pages_per_task = min_pages_per_task
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: children must not inherit the event loop, sockets or the Supabase client
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            logger.info(f"Started extraction pool with {self.workers} processes")
+        return self._executor
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.workers <= 0:
+            return await asyncio.to_thread(fn, *args)
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        try:
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed on a hostile file); replace the pool but do not retry the same file
+            if self._executor is executor:
+                logger.error("Extraction pool broke; restarting it")
+                self.shutdown()
+            raise ExtractionError("The file could not be processed")
+
+    async def extract(self, data: bytes, extension: str, max_pages: Optional[int] = None, max_tokens: Optional[int] = None) -> ExtractionResult:
+        """
+        Extract the text of a file; PDFs page range by page range on all workers.
+
+        Parameters:
+        - data (bytes): The file contents.
+        - extension (str): "pdf", "docx" or "txt".
+        - max_pages (int, optional): Read at most this many PDF pages when `max_tokens` is given; without a
+          token budget a longer PDF raises PageLimitExceeded instead of returning partial text.
+        - max_tokens (int, optional): Stop reading PDF pages once the text passes this many (estimated) tokens.
+
+        Returns:
+        - ExtractionResult: The text, page counts and per-page timings.
+        """
+        if extension != "pdf":
+            return ExtractionResult(await self._run(extract_text, data, extension, self.page_timeout))
+
+        pages = await self._run(pdf_page_count, data, self.page_timeout)
+        if max_pages and pages > max_pages and not max_tokens:
+            raise PageLimitExceeded(pages, max_pages)
+        limit = min(pages, max_pages) if max_pages else pages
+        if max_tokens:
+            # Small ranges, so reading stops soon after the budget is reached
+            per_task = self.min_pages_per_task
+        else:
+            per_task = max(self.min_pages_per_task, math.ceil(limit / max(1, self.workers * 2)))
+        ranges = [(start, min(start + per_task, limit)) for start in range(0, limit, per_task)]
+
+        # At most one range per worker runs ahead of the next one to be joined, so a budget stop wastes little work
+        window = max(1, self.workers)
+        tasks: Dict[int, asyncio.Future] = {}
+        results: List[tuple] = []
+        budget_chars = max_tokens * CHARS_PER_TOKEN if max_tokens else None
+        chars = 0
+        truncated = limit < pages
+        try:
+            for index in range(len(ranges)):
+                for ahead in range(index, min(index + window, len(ranges))):
+                    if ahead not in tasks:
+                        tasks[ahead] = asyncio.ensure_future(self._run(extract_pdf_pages, data, *ranges[ahead], self.page_timeout))
+                range_results = await tasks.pop(index)
+                results.extend(range_results)
+                chars += sum(len(text) for text, _ in range_results)
+                if budget_chars is not None and chars >= budget_chars:
+                    truncated = truncated or index < len(ranges) - 1
+                    break
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        page_seconds = [seconds for _, seconds in results]
+        for seconds in page_seconds:
+            PDF_PAGE_EXTRACTION.observe(seconds)
+        return ExtractionResult(
+            text="\n".join(text for text, _ in results),
+            pages=pages,
+            pages_extracted=len(results),
+            truncated=truncated,
+            page_seconds=page_seconds,
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+extraction_pool = ExtractionPool(
+    workers=settings.EXTRACTION_POOL_WORKERS,
+    page_timeout=settings.EXTRACTION_PAGE_TIMEOUT_SECONDS,
+    min_pages_per_task=settings.EXTRACTION_PDF_MIN_PAGES_PER_TASK,
+)
+
+
+async def extract_upload(upload: IngestedUpload, max_tokens: Optional[int] = None) -> ExtractionResult:
+    """
+    Extract the text of an ingested upload off the event loop.
+
+    Parameters:
+    - upload (IngestedUpload): The upload.
+    - max_tokens (int, optional): Stop reading PDF pages once this many tokens were extracted.
+
+    Returns:
+    - ExtractionResult: The text, page counts and per-page timings.
+
+    Raises:
+    - HTTPException: 413 for a PDF over EXTRACTION_MAX_PDF_PAGES pages (without `max_tokens`),
+      422 if the file cannot be read or a page exceeds the extraction timeout.
+    """
+    started = time.perf_counter()
+    try:
+        data = await asyncio.to_thread(upload.read_bytes)
+        result = await extraction_pool.extract(data, upload.extension, settings.EXTRACTION_MAX_PDF_PAGES, max_tokens)
+    except PageLimitExceeded as e:
+        UPLOAD_REJECTED.labels("too_many_pages").inc()
+        raise HTTPException(status_code=413, detail=f"{upload.filename} has {e.pages} pages. At most {e.max_pages} pages can be processed.")
+    except ExtractionTimeout:
+        UPLOAD_REJECTED.labels("extraction_timeout").inc()
+        logger.warning(f"Text extraction of {upload.filename} timed out")
+        raise HTTPException(status_code=422, detail=f"Timed out reading {upload.filename}. The file may be damaged or too complex.")
+    except ExtractionError as e:
+        UPLOAD_REJECTED.labels("unreadable").inc()
+        logger.warning(f"Text extraction of {upload.filename} failed: {str(e)}")
+        raise HTTPException(status_code=422, detail=f"Could not read {upload.filename}: {str(e)}")
+    finally:
+        UPLOAD_EXTRACTION_DURATION.labels(upload.extension).observe(time.perf_counter() - started)
+
+    if result.page_seconds:
+        slowest = max(range(len(result.page_seconds)), key=result.page_seconds.__getitem__)
+        logger.info(
+            f"Extracted {result.pages_extracted}/{result.pages} pages of {upload.filename} in "
+            f"{time.perf_counter() - started:.2f}s (slowest: page {slowest + 1}, {result.page_seconds[slowest]:.2f}s)"
+            + (" - stopped at the page or token limit" if result.truncated else "")
+        )
+    return result
+
+
+async def extract_upload_text(upload: IngestedUpload, max_tokens: Optional[int] = None) -> str:
+    """Extract the text of an ingested upload off the event loop. See `extract_upload`."""
+    return (await extract_upload(upload, max_tokens)).text
+
+
+async def ingest_upload_text(file: UploadFile, allowed_extensions: Iterable[str] = SUPPORTED_EXTENSIONS, max_tokens: Optional[int] = None) -> str:
+    """Receive an upload and return its extracted text, for routes that do not need the file itself."""
+    with await receive_upload(file, allowed_extensions) as upload:
+        return await extract_upload_text(upload, max_tokens)
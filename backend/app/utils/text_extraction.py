@@ -0,0 +1,132 @@
+"""
+Text extraction from uploaded PDF, DOCX and TXT files.
+
+The functions here run in the extraction process pool
+(app/utils/ingestion.py), so they only take and return picklable values and
+this module must not import app settings or the database client. PDFs are
+extracted in page ranges (`pdf_page_count`, then `extract_pdf_pages` per
+range) so the pool can spread one file over several processes; DOCX and TXT
+files go through `extract_text`.
+
+Each PDF page gets `page_timeout` seconds (enforced with SIGALRM, so only when
+running on a process's main thread, as pool workers do); opening the file and
+reading a DOCX share one such budget. A file that exceeds it raises
+`ExtractionTimeout` instead of pinning a worker.
+"""
+import io
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+from docx import Document as DocxDocument
+from PyPDF2 import PdfReader
+
+SUPPORTED_EXTENSIONS = ("pdf", "docx", "txt")
+
+
+class ExtractionError(ValueError):
+    """Raised when an upload cannot be read as a document of its type."""
+
+
+class ExtractionTimeout(ExtractionError):
+    """Raised when a page (or a whole DOCX) takes longer than the page timeout."""
+
+
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout("Text extraction timed out")
+
+
+@contextmanager
+def time_limit(seconds: Optional[float]) -> Iterator[None]:
+    """Raise ExtractionTimeout if the block runs longer than `seconds` (no-op off the main thread)."""
+    if not seconds or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _open_pdf(data: bytes, page_timeout: Optional[float]) -> PdfReader:
+    with time_limit(page_timeout):
+        return PdfReader(io.BytesIO(data))
+
+
+def pdf_page_count(data: bytes, page_timeout: Optional[float] = None) -> int:
+    """Number of pages of a PDF. Raises ExtractionError if it cannot be opened."""
+    try:
+        with time_limit(page_timeout):
+            return len(PdfReader(io.BytesIO(data)).pages)
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError(f"not a valid PDF file ({str(e)})")
+
+
+def extract_pdf_pages(data: bytes, start: int, stop: int, page_timeout: Optional[float] = None) -> List[Tuple[str, float]]:
+    """
+    Extract pages [start, stop) of a PDF.
+
+    Returns:
+    - list: (text, seconds) for each page, in page order.
+
+    Raises:
+    - ExtractionError: If the file or a page cannot be read.
+    - ExtractionTimeout: If a page exceeds the timeout.
+    """
+    try:
+        pages = _open_pdf(data, page_timeout).pages
+        results = []
+        for index in range(start, min(stop, len(pages))):
+            started = time.perf_counter()
+            with time_limit(page_timeout):
+                text = pages[index].extract_text() or ""
+            results.append((text, time.perf_counter() - started))
+        return results
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError(f"not a valid PDF file ({str(e)})")
+
+
+def _extract_docx(data: bytes, page_timeout: Optional[float]) -> str:
+    with time_limit(page_timeout):
+        doc = DocxDocument(io.BytesIO(data))
+        return "".join(paragraph.text + "\n" for paragraph in doc.paragraphs)
+
+
+def extract_text(data: bytes, extension: str, page_timeout: Optional[float] = None) -> str:
+    """
+    Extract the text of an uploaded file.
+
+    Parameters:
+    - data (bytes): The file contents.
+    - extension (str): "pdf", "docx" or "txt".
+    - page_timeout (float, optional): Seconds allowed per PDF page, and for opening the file.
+
+    Returns:
+    - str: The extracted text.
+
+    Raises:
+    - ExtractionError: If the type is unsupported or the file cannot be read.
+    - ExtractionTimeout: If a page exceeds the timeout.
+    """
+    try:
+        if extension == "pdf":
+            return "\n".join(text for text, _ in extract_pdf_pages(data, 0, sys.maxsize, page_timeout))
+        if extension == "docx":
+            return _extract_docx(data, page_timeout)
+        if extension == "txt":
+            return data.decode("utf-8", errors="replace")
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError(f"not a valid {extension.upper()} file ({str(e)})")
+    raise ExtractionError(f"Unsupported file type: {extension}")
@@ -0,0 +1,171 @@
+"""
+Token counting and token-aware splitting of legal documents.
+
+Counts use tiktoken's encoding for the target model. tiktoken downloads the
+encoding files on first use; deployments without network access should
+pre-fetch them into TIKTOKEN_CACHE_DIR (scripts/fetch_tiktoken_encodings.py).
+If an encoding cannot be loaded, counts fall back to a conservative estimate
+so callers keep working, the failure is logged as an error, every estimate is
+counted in `token_count_estimates_total`, and loading is retried after
+ENCODING_RETRY_SECONDS instead of estimating for the life of the process.
+"""
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import tiktoken
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio for English legal text, used for budgets and sizing
+CHARS_PER_TOKEN = 4
+# Ratio used when no encoding is available; low so estimates err towards too many tokens, not too few
+ESTIMATE_CHARS_PER_TOKEN = 3
+ENCODING_RETRY_SECONDS = 60.0
+
+TOKEN_COUNT_ESTIMATES = Counter("token_count_estimates_total", "Token counts estimated because no tiktoken encoding could be loaded")
+
+_encodings: Dict[str, tiktoken.Encoding] = {}
+_encoding_failures: Dict[str, float] = {}  # Model -> time loading its encoding last failed
+_encodings_lock = threading.Lock()
+
+# Lines that start a new section in a contract, pleading or markdown document
+SECTION_HEADING_PATTERN = re.compile(
+    r"^\s*("
+    r"#{1,6}\s+\S"                                    # markdown headings
+    r"|(ARTICLE|Article|SECTION|Section)\s+[\dIVXLC]+"  # ARTICLE IV / Section 3
+    r"|\d+(\.\d+)*\.?\s+[A-Z]"                         # 1. Definitions / 2.3 Term
+    r"|[A-Z][A-Z0-9 ,'&()\-]{3,}:?\s*$"                # ALL CAPS HEADINGS
+    r")"
+)
+
+
+def _load_encoding(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def _get_encoding(model: str) -> Optional[tiktoken.Encoding]:
+    """The encoding for `model`, or None while it cannot be loaded (failures are retried, not cached)."""
+    encoding = _encodings.get(model)
+    if encoding is not None:
+        return encoding
+    with _encodings_lock:
+        if model in _encodings:
+            return _encodings[model]
+        failed_at = _encoding_failures.get(model)
+        if failed_at is not None and time.monotonic() - failed_at < ENCODING_RETRY_SECONDS:
+            return None
+        try:
+            encoding = _load_encoding(model)
+        except Exception as e:
+            _encoding_failures[model] = time.monotonic()
+            logger.error(
+                f"tiktoken encoding for {model} unavailable, token counts are ESTIMATED "
+                f"({ESTIMATE_CHARS_PER_TOKEN} characters per token) until it loads; retrying in {ENCODING_RETRY_SECONDS:g}s. "
+                f"Set TIKTOKEN_CACHE_DIR to pre-fetched encodings to avoid this: {str(e)}"
+            )
+            return None
+        _encoding_failures.pop(model, None)
+        _encodings[model] = encoding
+        return encoding
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Count the tokens `text` uses for `model`."""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        TOKEN_COUNT_ESTIMATES.inc()
+        return len(text) // ESTIMATE_CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    """Return the longest prefix of `text` that fits in `max_tokens`."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        TOKEN_COUNT_ESTIMATES.inc()
+        return text[:max_tokens * ESTIMATE_CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def split_into_sections(text: str) -> List[str]:
+    """Split a document into sections at heading lines. Text before the first heading is its own section."""
+    sections: List[str] = []
+    current: List[str] = []
+    for line in text.splitlines(keepends=True):
+        if SECTION_HEADING_PATTERN.match(line) and any(l.strip() for l in current):
+            sections.append("".join(current))
+            current = []
+        current.append(line)
+    if any(l.strip() for l in current):
+        sections.append("".join(current))
+    return sections
+
+
+def _split_oversized(text: str, max_tokens: int, model: str) -> List[str]:
+    """Split a single section that is larger than a chunk, on paragraphs first and hard token windows last."""
+    pieces: List[str] = []
+    buffer = ""
+    for paragraph in re.split(r"(?<=\n)\s*\n", text):
+        candidate = buffer + paragraph
+        if count_tokens(candidate, model) <= max_tokens:
+            buffer = candidate
+            continue
+        if buffer:
+            pieces.append(buffer)
+            buffer = ""
+        while count_tokens(paragraph, model) > max_tokens:
+            head = truncate_to_tokens(paragraph, max_tokens, model)
+            pieces.append(head)
+            paragraph = paragraph[len(head):]
+        buffer = paragraph
+    if buffer.strip():
+        pieces.append(buffer)
+    return pieces
+
+
+def chunk_document(text: str, max_tokens: int, model: str) -> List[str]:
+    """
+    Split a document into chunks of at most `max_tokens`, breaking on section
+    boundaries where possible. Consecutive small sections are packed together.
+
+    Parameters:
+    - text (str): The document text.
+    - max_tokens (int): Token budget per chunk.
+    - model (str): Model whose tokenizer is used for counting.
+
+    Returns:
+    - List[str]: Chunks in document order.
+    """
+    chunks: List[str] = []
+    current = ""
+    current_tokens = 0
+    for section in split_into_sections(text):
+        section_tokens = count_tokens(section, model)
+        if section_tokens > max_tokens:
+            if current:
+                chunks.append(current)
+                current, current_tokens = "", 0
+            chunks.extend(_split_oversized(section, max_tokens, model))
+            continue
+        if current_tokens + section_tokens > max_tokens and current:
+            chunks.append(current)
+            current, current_tokens = "", 0
+        current += section
+        current_tokens += section_tokens
+    if current.strip():
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,69 @@
+"""
+Worker process for durable AI jobs.
+
+Claims queued rows from `ai_jobs` and runs them with the handlers registered
+by the route modules. Run one or more of these next to the API and set
+JOBS_RUN_INLINE=false so the API workers only enqueue:
+
+    python -m app.worker
+"""
+import asyncio
+import logging
+import signal
+
+from app.config import settings
+from app.services import llm_gateway
+from app.services.ai_jobs import claim_next_jobs, run_stale_job_recovery, run_job, registered_job_types
+from app.services.job_queue import InProcessExecutor, job_queue
+from app.services.usage_rollup import flush_usage_rollup, run_usage_flusher
+# Importing the route modules registers their job handlers
+from app.routes import document, ai_agents, research  # noqa: F401
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logger = logging.getLogger("app.worker")
+
+
+async def run_worker() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    executor = InProcessExecutor(max_concurrency=settings.JOBS_WORKER_CONCURRENCY)
+    logger.info(f"Job worker started (concurrency {settings.JOBS_WORKER_CONCURRENCY}) for: {', '.join(registered_job_types())}")
+    stale_job_recovery = asyncio.create_task(run_stale_job_recovery())
+    usage_flusher = asyncio.create_task(run_usage_flusher())
+
+    while not stop.is_set():
+        claimed = []
+        free_slots = settings.JOBS_WORKER_CONCURRENCY - executor.pending
+        if free_slots > 0:
+            try:
+                claimed = claim_next_jobs(free_slots)
+            except Exception as e:
+                logger.error(f"Failed to claim jobs: {str(e)}")
+            for job in claimed:
+                executor.submit(f"{job['job_type']}:{job['id']}", run_job, job)
+        if not claimed:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.JOBS_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    logger.info("Shutting down; waiting for running jobs to finish")
+    stale_job_recovery.cancel()
+    await executor.drain()
+    # Follow-up work queued by the jobs themselves, e.g. compliance checks
+    await job_queue.drain()
+    await llm_gateway.close_clients()
+    usage_flusher.cancel()
+    await asyncio.to_thread(flush_usage_rollup)
+
+
+def main() -> None:
+    asyncio.run(run_worker())
+
+
+if __name__ == "__main__":
+    main()
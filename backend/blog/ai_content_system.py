@@ -4,6 +4,7 @@
 import asyncio
 import aiohttp
 import openai
+from app.services.llm_metrics import observe_llm_call
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 import json
@@ -325,15 +326,17 @@ class LawverraContentAI:
         """
         
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a senior legal technology content strategist for Lawverra. Write authoritative, valuable blog posts that establish thought leadership while naturally highlighting Lawverra's AI capabilities. Focus on providing genuine value to legal professionals while positioning AI as the future of legal work."},
-                    {"role": "user", "content": enhanced_prompt}
-                ],
-                temperature=0.6,
-                max_tokens=3000
-            )
+            with observe_llm_call("blog", "gpt-4") as llm_call:
+                response = await self.openai_client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": "You are a senior legal technology content strategist for Lawverra. Write authoritative, valuable blog posts that establish thought leadership while naturally highlighting Lawverra's AI capabilities. Focus on providing genuine value to legal professionals while positioning AI as the future of legal work."},
+                        {"role": "user", "content": enhanced_prompt}
+                    ],
+                    temperature=0.6,
+                    max_tokens=3000
+                )
+                llm_call.set_usage_from_response(response)
             
             blog_post_data = json.loads(response.choices[0].message.content)
             
@@ -370,13 +373,14 @@ class LawverraContentAI:
         prompt += f", inspired by the concept: {title[:100]}"  # Add title context
         
         try:
-            image_response = await self.openai_client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size="1024x1024",
-                quality="standard",
-                n=1
-            )
+            with observe_llm_call("blog_image", "dall-e-3") as llm_call:
+                image_response = await self.openai_client.images.generate(
+                    model="dall-e-3",
+                    prompt=prompt,
+                    size="1024x1024",
+                    quality="standard",
+                    n=1
+                )
             
             image_url = image_response.data[0].url
             
@@ -486,14 +490,16 @@ class LawverraContentAI:
         """
         
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a legal technology market analyst specializing in AI adoption in law firms. Identify high-impact content opportunities that position Lawverra favorably while providing genuine value to legal professionals."},
-                    {"role": "user", "content": enhanced_analysis_prompt}
-                ],
-                temperature=0.7
-            )
+            with observe_llm_call("blog", "gpt-4") as llm_call:
+                response = await self.openai_client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": "You are a legal technology market analyst specializing in AI adoption in law firms. Identify high-impact content opportunities that position Lawverra favorably while providing genuine value to legal professionals."},
+                        {"role": "user", "content": enhanced_analysis_prompt}
+                    ],
+                    temperature=0.7
+                )
+                llm_call.set_usage_from_response(response)
             
             content_opportunities = json.loads(response.choices[0].message.content)
             return content_opportunities
@@ -868,6 +874,7 @@ CONTENT_CATEGORIES = {
 import asyncio
 import aiohttp
 import openai
+from app.services.llm_metrics import observe_llm_call
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 import json
@@ -1123,14 +1130,16 @@ class LawverraContentAI:
         """
         
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a content strategist for Lawverra, a legal AI company. Analyze market research to identify blog opportunities that position Lawverra favorably against competitors."},
-                    {"role": "user", "content": analysis_prompt}
-                ],
-                temperature=0.7
-            )
+            with observe_llm_call("blog", "gpt-4") as llm_call:
+                response = await self.openai_client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": "You are a content strategist for Lawverra, a legal AI company. Analyze market research to identify blog opportunities that position Lawverra favorably against competitors."},
+                        {"role": "user", "content": analysis_prompt}
+                    ],
+                    temperature=0.7
+                )
+                llm_call.set_usage_from_response(response)
             
             content_opportunities = json.loads(response.choices[0].message.content)
             return content_opportunities
@@ -1169,14 +1178,16 @@ class LawverraContentAI:
         """
         
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a professional legal tech content writer for Lawverra. Write informative, valuable blog posts that subtly highlight Lawverra's advantages while providing genuine value to readers."},
-                    {"role": "user", "content": blog_prompt}
-                ],
-                temperature=0.6
-            )
+            with observe_llm_call("blog", "gpt-4") as llm_call:
+                response = await self.openai_client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": "You are a professional legal tech content writer for Lawverra. Write informative, valuable blog posts that subtly highlight Lawverra's advantages while providing genuine value to readers."},
+                        {"role": "user", "content": blog_prompt}
+                    ],
+                    temperature=0.6
+                )
+                llm_call.set_usage_from_response(response)
             
             blog_post_data = json.loads(response.choices[0].message.content)
             
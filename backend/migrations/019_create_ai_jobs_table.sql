@@ -0,0 +1,51 @@
+-- Migration: Add AI jobs table
+-- Description: Durable queue for long-running AI operations (generation, evaluation, enhancement, template editing, research).
+-- API workers insert queued jobs; `python -m app.worker` claims and runs them.
+
+CREATE TABLE IF NOT EXISTS ai_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    job_type VARCHAR(100) NOT NULL,
+    status VARCHAR(50) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+    progress INTEGER NOT NULL DEFAULT 0 CHECK (progress BETWEEN 0 AND 100),
+    progress_message TEXT,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    result JSONB,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    started_at TIMESTAMP WITH TIME ZONE,
+    heartbeat_at TIMESTAMP WITH TIME ZONE, -- Refreshed while running; a stale heartbeat means the runner is gone
+    completed_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc', NOW()),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc', NOW())
+);
+
+-- Add RLS policies
+ALTER TABLE ai_jobs ENABLE ROW LEVEL SECURITY;
+
+-- Policy: Users can only see their own jobs
+CREATE POLICY "Users can view own ai jobs" ON ai_jobs
+    FOR SELECT USING (auth.uid() = user_id);
+
+-- Policy: Users can submit their own jobs
+CREATE POLICY "Users can insert own ai jobs" ON ai_jobs
+    FOR INSERT WITH CHECK (auth.uid() = user_id);
+
+-- Create indexes for better performance
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_user_id ON ai_jobs(user_id);
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_status_created_at ON ai_jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_status_heartbeat_at ON ai_jobs(status, heartbeat_at);
+
+-- Create updated_at trigger
+CREATE OR REPLACE FUNCTION update_ai_jobs_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = TIMEZONE('utc', NOW());
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_ai_jobs_updated_at
+    BEFORE UPDATE ON ai_jobs
+    FOR EACH ROW
+    EXECUTE FUNCTION update_ai_jobs_updated_at();
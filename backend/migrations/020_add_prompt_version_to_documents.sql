@@ -0,0 +1,8 @@
+-- Migration: Record the prompt version used to generate each document.
+-- Values look like 'generation.filing@2' (see app/services/prompt_registry.py).
+-- Documents created before this migration, uploaded or enhanced documents have NULL.
+
+ALTER TABLE public.documents
+ADD COLUMN IF NOT EXISTS prompt_version TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_documents_prompt_version ON public.documents(prompt_version);
@@ -0,0 +1,78 @@
+-- Migration: Add LLM usage daily rollup
+-- Description: Per-user, per-day LLM calls, tokens, estimated cost and latency by task and model.
+-- API and worker processes aggregate calls in memory and flush them periodically through increment_llm_usage_daily().
+
+CREATE TABLE IF NOT EXISTS llm_usage_daily (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    usage_date DATE NOT NULL,
+    -- NULL for calls made outside a user request (e.g. the blog generator)
+    user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
+    task VARCHAR(100) NOT NULL,
+    model VARCHAR(100) NOT NULL,
+    calls INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    completion_tokens BIGINT NOT NULL DEFAULT 0,
+    cost_usd NUMERIC(12, 6) NOT NULL DEFAULT 0,
+    total_latency_ms BIGINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc', NOW()),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc', NOW()),
+    CONSTRAINT llm_usage_daily_unique UNIQUE NULLS NOT DISTINCT (usage_date, user_id, task, model)
+);
+
+-- Add RLS policies
+ALTER TABLE llm_usage_daily ENABLE ROW LEVEL SECURITY;
+
+-- Policy: Users can view their own usage
+CREATE POLICY "Users can view own llm usage" ON llm_usage_daily
+    FOR SELECT USING (auth.uid() = user_id);
+
+-- Create indexes for better performance
+CREATE INDEX IF NOT EXISTS idx_llm_usage_daily_user_date ON llm_usage_daily(user_id, usage_date);
+CREATE INDEX IF NOT EXISTS idx_llm_usage_daily_date ON llm_usage_daily(usage_date);
+
+-- Adds a batch of usage to the rollup; concurrent flushes from several workers are additive
+CREATE OR REPLACE FUNCTION increment_llm_usage_daily(rows JSONB)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO llm_usage_daily (usage_date, user_id, task, model, calls, errors, prompt_tokens, completion_tokens, cost_usd, total_latency_ms)
+    SELECT
+        (r->>'usage_date')::DATE,
+        NULLIF(r->>'user_id', '')::UUID,
+        r->>'task',
+        r->>'model',
+        (r->>'calls')::INTEGER,
+        (r->>'errors')::INTEGER,
+        (r->>'prompt_tokens')::BIGINT,
+        (r->>'completion_tokens')::BIGINT,
+        (r->>'cost_usd')::NUMERIC,
+        (r->>'total_latency_ms')::BIGINT
+    FROM jsonb_array_elements(rows) AS r
+    ON CONFLICT (usage_date, user_id, task, model) DO UPDATE SET
+        calls = llm_usage_daily.calls + EXCLUDED.calls,
+        errors = llm_usage_daily.errors + EXCLUDED.errors,
+        prompt_tokens = llm_usage_daily.prompt_tokens + EXCLUDED.prompt_tokens,
+        completion_tokens = llm_usage_daily.completion_tokens + EXCLUDED.completion_tokens,
+        cost_usd = llm_usage_daily.cost_usd + EXCLUDED.cost_usd,
+        total_latency_ms = llm_usage_daily.total_latency_ms + EXCLUDED.total_latency_ms,
+        updated_at = TIMEZONE('utc', NOW());
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Only the backend (service role) may write usage
+REVOKE EXECUTE ON FUNCTION increment_llm_usage_daily(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION increment_llm_usage_daily(JSONB) TO service_role;
+
+-- Create updated_at trigger
+CREATE OR REPLACE FUNCTION update_llm_usage_daily_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = TIMEZONE('utc', NOW());
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_llm_usage_daily_updated_at
+    BEFORE UPDATE ON llm_usage_daily
+    FOR EACH ROW
+    EXECUTE FUNCTION update_llm_usage_daily_updated_at();
@@ -0,0 +1,27 @@
+-- Migration: Add bulk evaluation write-back
+-- Description: Writes many document evaluations in one statement for batch evaluation jobs.
+-- Each element of `updates` is {"id": <uuid>, "evaluation_response": {...}, "status": <optional text>}.
+-- Only documents owned by p_user_id are updated; returns the number of rows updated.
+
+CREATE OR REPLACE FUNCTION bulk_update_document_evaluations(p_user_id UUID, updates JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    updated_count INTEGER;
+BEGIN
+    UPDATE documents AS d
+    SET
+        evaluation_response = u.evaluation_response,
+        status = COALESCE(u.status, d.status),
+        updated_at = NOW()
+    FROM jsonb_to_recordset(updates) AS u(id UUID, evaluation_response JSONB, status TEXT)
+    WHERE d.id = u.id
+      AND d.user_id = p_user_id;
+
+    GET DIAGNOSTICS updated_count = ROW_COUNT;
+    RETURN updated_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Only the backend (service role) may call it
+REVOKE EXECUTE ON FUNCTION bulk_update_document_evaluations(UUID, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION bulk_update_document_evaluations(UUID, JSONB) TO service_role;
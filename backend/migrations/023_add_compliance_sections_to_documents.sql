@@ -0,0 +1,8 @@
+-- Migration: Store per-section compliance findings for incremental re-checks.
+-- Shape: {"version", "model", "jurisdiction", "document_type", "outline_hash", "required_clauses",
+--         "sections": {<section text hash>: {"formatting", "jurisdiction_fit", "issues"}}}
+-- (see check_document_compliance_incremental in app/services/ai_agent_compliance.py).
+-- NULL until a document has been checked section by section.
+
+ALTER TABLE public.documents
+ADD COLUMN IF NOT EXISTS compliance_sections JSONB;
@@ -0,0 +1,35 @@
+-- Migration: Resolve document access for bulk export in one statement.
+-- Returns the documents p_user_id may read (owned, shared with one of their teams, or shared
+-- with them as a collaborator), optionally restricted to a list of ids and/or a client profile,
+-- oldest first, at most p_limit rows (see app/services/bulk_export.py).
+
+CREATE OR REPLACE FUNCTION accessible_documents(
+    p_user_id UUID,
+    p_document_ids UUID[] DEFAULT NULL,
+    p_client_profile_id UUID DEFAULT NULL,
+    p_limit INTEGER DEFAULT 200
+)
+RETURNS TABLE (id UUID, title TEXT, content TEXT) AS $$
+    SELECT d.id, d.title, d.content
+    FROM documents AS d
+    WHERE (p_document_ids IS NULL OR d.id = ANY(p_document_ids))
+      AND (p_client_profile_id IS NULL OR d.client_profile_id = p_client_profile_id)
+      AND (
+          d.user_id = p_user_id
+          OR EXISTS (
+              SELECT 1 FROM document_collaborators AS c
+              WHERE c.document_id = d.id AND c.user_id = p_user_id
+          )
+          OR EXISTS (
+              SELECT 1 FROM team_documents AS td
+              JOIN team_members AS tm ON tm.team_id = td.team_id
+              WHERE td.document_id = d.id AND tm.user_id = p_user_id
+          )
+      )
+    ORDER BY d.created_at, d.id
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- Only the backend (service role) may call it
+REVOKE EXECUTE ON FUNCTION accessible_documents(UUID, UUID[], UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION accessible_documents(UUID, UUID[], UUID, INTEGER) TO service_role;
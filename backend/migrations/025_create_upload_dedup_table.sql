@@ -0,0 +1,40 @@
+-- Migration: Add upload de-duplication table
+-- Description: Extracted text, evaluation and compliance results of uploaded files, stored against the
+-- SHA-256 of the file so a repeat upload reuses them (see app/services/upload_dedup.py).
+-- Rows are scoped to a tenant: scope is 'user:<user id>' or 'team:<team id>', and a user only ever
+-- reads the scopes they belong to. evaluation_key / compliance_key identify the model and prompt
+-- versions the stored results were produced with; results from other versions are not reused.
+
+CREATE TABLE IF NOT EXISTS upload_dedup (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    scope VARCHAR(100) NOT NULL,
+    file_sha256 CHAR(64) NOT NULL,
+    filename TEXT,
+    content TEXT NOT NULL,
+    evaluation_key CHAR(64),
+    evaluation_response JSONB,
+    compliance_key CHAR(64),
+    compliance_check_results JSONB,
+    compliance_sections JSONB,
+    reuse_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc', NOW()),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc', NOW()),
+    CONSTRAINT upload_dedup_unique UNIQUE (scope, file_sha256)
+);
+
+-- RLS without policies: only the backend (service role) reads or writes this table
+ALTER TABLE upload_dedup ENABLE ROW LEVEL SECURITY;
+
+-- Create updated_at trigger
+CREATE OR REPLACE FUNCTION update_upload_dedup_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = TIMEZONE('utc', NOW());
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_upload_dedup_updated_at
+    BEFORE UPDATE ON upload_dedup
+    FOR EACH ROW
+    EXECUTE FUNCTION update_upload_dedup_updated_at();
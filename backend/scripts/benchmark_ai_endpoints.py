@@ -0,0 +1,231 @@
+"""
+Benchmark: latency percentiles and throughput of the AI endpoints.
+
+Drives a running API at a fixed concurrency and reports p50/p95/p99 latency,
+throughput and errors per endpoint. Point the API at the fake OpenAI server
+so no tokens are spent and the model latency is controlled:
+
+    python scripts/fake_openai_server.py --port 8089 --latency 0.8 --tokens-per-second 60
+    OPENAI_BASE_URL=http://localhost:8089/v1 uvicorn app.main:app --port 8000
+    python scripts/benchmark_ai_endpoints.py --token "$ACCESS_TOKEN" --concurrency 10 --requests 50
+
+The token is a Supabase access token for a test user (see /api/v1/auth/login).
+Endpoints exercised:
+- create:   POST /api/v1/documents/create
+- upload:   POST /api/v1/documents/upload (a generated DOCX, or --upload-file)
+- research: POST /api/v1/research/conduct
+- chat:     POST /api/v1/agents/chat-lawyer/chat
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, List
+
+import httpx
+from docx import Document
+from PyPDF2 import PdfReader, PdfWriter
+from reportlab.pdfgen import canvas
+
+SAMPLE_CONTRACT_SECTIONS = 20
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `values`."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def sample_docx() -> bytes:
+    document = Document()
+    document.add_heading("CONSULTING AGREEMENT", level=1)
+    for section in range(1, SAMPLE_CONTRACT_SECTIONS + 1):
+        document.add_heading(f"{section}. Section {section}", level=2)
+        document.add_paragraph(
+            "The Consultant shall perform the services described in Schedule A with reasonable skill and care. "
+            "Either party may terminate this agreement on thirty days' written notice."
+        )
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def with_reference_page(pdf_bytes: bytes, reference: str) -> bytes:
+    """Append a page carrying `reference` as text, so the extracted text (not just the file hash) is unique."""
+    page = io.BytesIO()
+    pdf = canvas.Canvas(page)
+    pdf.drawString(72, 720, f"Reference: {reference}")
+    pdf.save()
+    writer = PdfWriter()
+    for source in (PdfReader(io.BytesIO(pdf_bytes)), PdfReader(page)):
+        for pdf_page in source.pages:
+            writer.add_page(pdf_page)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def build_requests(args: argparse.Namespace) -> Dict[str, Callable[[int], Dict[str, Any]]]:
+    """Endpoint name -> factory returning httpx request kwargs for the i-th request."""
+    if args.upload_file:
+        with open(args.upload_file, "rb") as f:
+            upload_bytes, upload_name = f.read(), os.path.basename(args.upload_file)
+    else:
+        upload_bytes, upload_name = sample_docx(), "benchmark_contract.docx"
+    # Unique content per request unless --repeat-content, so the result cache does not hide model latency
+    async_params = {"async_mode": "true"} if args.async_mode else {}
+
+    def create(i: int) -> Dict[str, Any]:
+        return {
+            "method": "POST",
+            "url": "/api/v1/documents/create",
+            "params": async_params,
+            "json": {
+                "title": f"Benchmark Consulting Agreement {i}",
+                "document_type": "Letter",
+                "area_of_law": "Civil Litigation",
+                "notes": "Benchmark request. Include a non-compete clause.",
+                "jurisdiction": "Florida",
+            },
+        }
+
+    def upload(i: int) -> Dict[str, Any]:
+        content = upload_bytes
+        if not args.repeat_content and upload_name.endswith(".docx"):
+            document = Document(io.BytesIO(upload_bytes))
+            document.add_paragraph(f"Reference: {uuid.uuid4()}")
+            buffer = io.BytesIO()
+            document.save(buffer)
+            content = buffer.getvalue()
+        elif not args.repeat_content:
+            # The evaluation cache is keyed on the extracted text, so the unique reference must be page text
+            content = with_reference_page(upload_bytes, str(uuid.uuid4()))
+        return {
+            "method": "POST",
+            "url": "/api/v1/documents/upload",
+            "params": async_params,
+            "files": {"file": (upload_name, content)},
+        }
+
+    def research(i: int) -> Dict[str, Any]:
+        return {
+            "method": "POST",
+            "url": "/api/v1/research/conduct",
+            "params": async_params,
+            "json": {"query": f"Can a landlord in Florida evict a tenant without notice? (run {i})", "save_to_history": False},
+        }
+
+    def chat(i: int) -> Dict[str, Any]:
+        return {
+            "method": "POST",
+            "url": "/api/v1/agents/chat-lawyer/chat",
+            "data": {"session_id": str(uuid.uuid4()), "message": "What should a consulting agreement include?"},
+        }
+
+    return {"create": create, "upload": upload, "research": research, "chat": chat}
+
+
+async def run_endpoint(
+    client: httpx.AsyncClient,
+    name: str,
+    factory: Callable[[int], Dict[str, Any]],
+    concurrency: int,
+    total: int,
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        request = factory(i)
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                elapsed = time.perf_counter() - started
+                if response.status_code >= 400:
+                    key = f"HTTP {response.status_code}"
+                    errors[key] = errors.get(key, 0) + 1
+                else:
+                    latencies.append(elapsed)
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    wall = time.perf_counter() - started
+    return {
+        "endpoint": name,
+        "requests": total,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "max": round(max(latencies), 3) if latencies else 0.0,
+    }
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    header = f"{'endpoint':<10} {'ok':>5} {'err':>5} {'rps':>8} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'max s':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['endpoint']:<10} {r['succeeded']:>5} {sum(r['errors'].values()):>5} {r['throughput_rps']:>8.2f} "
+            f"{r['p50']:>8.2f} {r['p95']:>8.2f} {r['p99']:>8.2f} {r['max']:>8.2f}"
+        )
+        for error, count in r["errors"].items():
+            print(f"{'':<10} {count} x {error}")
+
+
+async def main_async(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    factories = build_requests(args)
+    timeout = httpx.Timeout(args.timeout, connect=10.0)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    headers = {"Authorization": f"Bearer {args.token}"}
+    results = []
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, timeout=timeout, limits=limits) as client:
+        for name in args.endpoints:
+            if args.warmup:
+                await run_endpoint(client, name, factories[name], args.concurrency, args.warmup)
+            results.append(await run_endpoint(client, name, factories[name], args.concurrency, args.requests))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", default=os.getenv("BENCHMARK_ACCESS_TOKEN"), help="Bearer token (or BENCHMARK_ACCESS_TOKEN)")
+    parser.add_argument("--endpoints", nargs="+", choices=["create", "upload", "research", "chat"], default=["create", "upload", "research", "chat"])
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=50, help="Measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests per endpoint before measuring")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--upload-file", help="PDF or DOCX to upload instead of the generated contract")
+    parser.add_argument("--repeat-content", action="store_true", help="Upload identical content every time (measures cache hits)")
+    parser.add_argument("--async-mode", action="store_true", help="Call the endpoints with async_mode=true (measures enqueue latency)")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+    if not args.token:
+        parser.error("--token or BENCHMARK_ACCESS_TOKEN is required")
+
+    results = asyncio.run(main_async(args))
+    print_table(results)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
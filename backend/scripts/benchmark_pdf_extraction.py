@@ -0,0 +1,105 @@
+"""
+Benchmark: text extraction time of long PDFs, single process vs. the
+extraction pool (app/utils/ingestion.py).
+
+Builds synthetic deposition transcripts (numbered Q/A lines, ~25 lines per
+page) with reportlab, then for each size reports:
+
+- sequential: every page extracted one after another in this process, as
+  the upload routes did before the extraction pool,
+- pool N: `ExtractionPool.extract` with N worker processes (page ranges fanned
+  out and joined in order), including process start-up on the first run,
+- budget: the same with a token budget that stops after the first pages,
+- median and p95 time per page, from the per-page timings the pool reports.
+
+The speed-up is bounded by the number of CPU cores; it is printed first.
+
+Usage:
+    python scripts/benchmark_pdf_extraction.py --pages 100 300 600 --workers 1 2 4
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from reportlab.lib.pagesizes import letter  # noqa: E402
+from reportlab.pdfgen import canvas  # noqa: E402
+
+from app.utils.ingestion import ExtractionPool  # noqa: E402
+from app.utils.text_extraction import extract_text  # noqa: E402
+
+LINES_PER_PAGE = 25
+QUESTION = "Q. And at that time, did you review the agreement with counsel before signing it on behalf of the company?"
+ANSWER = "A. No. I was told that the terms were standard, and I relied on what Mr. Smith said during the meeting."
+
+
+def synthetic_transcript(pages: int) -> bytes:
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    for page in range(1, pages + 1):
+        pdf.setFont("Courier", 9)
+        pdf.drawString(72, 750, f"DEPOSITION OF JOHN DOE - PAGE {page}")
+        for line in range(1, LINES_PER_PAGE + 1):
+            text = QUESTION if line % 2 else ANSWER
+            pdf.drawString(54, 730 - line * 26, f"{line:>2}  {text}")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run_pool(data: bytes, workers: int, min_pages_per_task: int, max_tokens=None):
+    pool = ExtractionPool(workers=workers, page_timeout=30.0, min_pages_per_task=min_pages_per_task)
+    try:
+        started = time.perf_counter()
+        await pool.extract(data, "pdf", max_tokens=max_tokens)
+        cold_s = time.perf_counter() - started
+        started = time.perf_counter()
+        warm = await pool.extract(data, "pdf", max_tokens=max_tokens)
+        return cold_s, time.perf_counter() - started, warm
+    finally:
+        pool.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 300, 600], help="Synthetic PDF sizes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Extraction pool sizes to compare")
+    parser.add_argument("--min-pages-per-task", type=int, default=16, help="EXTRACTION_PDF_MIN_PAGES_PER_TASK")
+    parser.add_argument("--budget-tokens", type=int, default=16000, help="Token budget for the early cut-off run")
+    args = parser.parse_args()
+
+    print(f"CPU cores: {os.cpu_count()}\n")
+    for pages in args.pages:
+        data = synthetic_transcript(pages)
+        started = time.perf_counter()
+        text = extract_text(data, "pdf")
+        sequential_s = time.perf_counter() - started
+        print(f"{pages} pages, {len(data) / 1024:.0f} KB PDF, {len(text)} characters")
+        print(f"  {'sequential':<12} {sequential_s:>7.2f}s")
+
+        for workers in args.workers:
+            cold_s, warm_s, result = asyncio.run(run_pool(data, workers, args.min_pages_per_task))
+            assert result.text == text, "pool output differs from sequential extraction"
+            print(f"  {f'pool {workers}':<12} {warm_s:>7.2f}s  (first call {cold_s:.2f}s)  "
+                  f"speed-up x{sequential_s / warm_s:.2f}  page median {statistics.median(result.page_seconds) * 1000:.1f} ms, "
+                  f"p95 {percentile(result.page_seconds, 0.95) * 1000:.1f} ms")
+
+        workers = max(args.workers)
+        _, warm_s, result = asyncio.run(run_pool(data, workers, args.min_pages_per_task, args.budget_tokens))
+        print(f"  {f'budget {args.budget_tokens}':<12} {warm_s:>7.2f}s  pool {workers}, read {result.pages_extracted}/{result.pages} pages"
+              f"{' (truncated)' if result.truncated else ''}\n")
+
+
+if __name__ == "__main__":
+    main()
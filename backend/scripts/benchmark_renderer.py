@@ -0,0 +1,95 @@
+"""
+Benchmark: render time per page of the PDF and DOCX exports.
+
+Renders a synthetic markdown contract (headings, paragraphs, bullet and
+numbered lists, rules) with app/services/document_renderer.py and reports
+the median time of each stage:
+
+- parse: markdown -> blocks (shared by both back ends),
+- pdf / docx: blocks -> file, in memory,
+- style setup: what building the reportlab style sheet per request cost
+  before styles were built once at import.
+
+Usage:
+    python scripts/benchmark_renderer.py --sections 10 40 160 --runs 5
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services import document_renderer  # noqa: E402
+from app.services.document_renderer import markdown_to_blocks, render_docx, render_pdf  # noqa: E402
+
+CLAUSE = (
+    "The Consultant shall perform the services described in Schedule A with reasonable skill, care and "
+    "diligence, in accordance with applicable law & industry practice, and shall not subcontract any "
+    "part of the services without the Client's prior written consent. "
+)
+
+
+def sample_markdown(sections: int) -> str:
+    parts = ["# CONSULTING AGREEMENT\n\n", "This Agreement is made between **Acme Corp** and **Jane Smith**.\n\n"]
+    for section in range(1, sections + 1):
+        parts.append(f"## {section}. Section {section}\n\n{CLAUSE * 3}\n\n")
+        if section % 3 == 0:
+            parts.append("".join(f"- Obligation {i}: {CLAUSE}\n" for i in range(1, 4)) + "\n")
+        if section % 4 == 0:
+            parts.append("".join(f"{i}. Step {i} of the procedure.\n" for i in range(1, 5)) + "\n")
+        if section % 10 == 0:
+            parts.append("---\n\n")
+    return "".join(parts)
+
+
+def median_ms(fn: Callable[[], object], runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def benchmark(sections: int, runs: int) -> Dict[str, float]:
+    content = sample_markdown(sections)
+    blocks = markdown_to_blocks(content)
+    pages = render_pdf(blocks, io.BytesIO())
+    pdf_buffer, docx_buffer = io.BytesIO(), io.BytesIO()
+    render_docx(blocks, docx_buffer)
+    render_pdf(blocks, pdf_buffer)
+    result = {
+        "sections": sections,
+        "pages": pages,
+        "parse_ms": median_ms(lambda: markdown_to_blocks(content), runs),
+        "pdf_ms": median_ms(lambda: render_pdf(blocks, io.BytesIO()), runs),
+        "docx_ms": median_ms(lambda: render_docx(blocks, io.BytesIO()), runs),
+        "pdf_kb": len(pdf_buffer.getvalue()) / 1024,
+        "docx_kb": len(docx_buffer.getvalue()) / 1024,
+    }
+    result["pdf_ms_per_page"] = (result["parse_ms"] + result["pdf_ms"]) / pages
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, nargs="+", default=[10, 40, 160], help="Document sizes to render")
+    parser.add_argument("--runs", type=int, default=5, help="Measured runs per stage (the median is reported)")
+    args = parser.parse_args()
+
+    style_ms = median_ms(document_renderer._build_pdf_styles, max(args.runs, 20))
+    print(f"Per-request style setup avoided: {style_ms:.2f} ms\n")
+
+    results: List[Dict[str, float]] = [benchmark(sections, args.runs) for sections in args.sections]
+    print(f"{'sections':>8} {'pages':>6} {'parse ms':>9} {'pdf ms':>8} {'docx ms':>8} {'pdf ms/page':>12} {'pdf KB':>7} {'docx KB':>8}")
+    for r in results:
+        print(f"{r['sections']:>8} {r['pages']:>6} {r['parse_ms']:>9.1f} {r['pdf_ms']:>8.1f} {r['docx_ms']:>8.1f} "
+              f"{r['pdf_ms_per_page']:>12.2f} {r['pdf_kb']:>7.1f} {r['docx_kb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
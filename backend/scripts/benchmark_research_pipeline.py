@@ -0,0 +1,83 @@
+"""
+Benchmark: wall time and LLM call count of the deep research pipeline.
+
+`llm_gateway.ainvoke` is replaced with a fake that sleeps for a fixed latency,
+so no tokens are spent. The previous pipeline made two sequential calls in
+both phases (clarifying questions, then the report), i.e. about 2 * latency.
+The restructured pipeline should take about one latency in each phase: the
+first phase runs both calls concurrently and the answered phase makes a
+single call.
+
+Usage:
+    python scripts/benchmark_research_pipeline.py --latency 1.5 --runs 3
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Placeholder settings so the app modules can be imported without a real .env
+for _name in [
+    "SUPABASE_URL", "SUPABASE_KEY", "SUPABASE_SERVICE_KEY", "OPENAI_API_KEY",
+    "STRIPE_SECRET_KEY", "STRIPE_PUBLISHABLE_KEY", "STRIPE_WEBHOOK_SECRET",
+    "PRICE_STARTER", "PRICE_PRO", "PRICE_PREMIUM", "PRICE_DOC_PAYG", "PRICE_AI_REPORT",
+]:
+    os.environ.setdefault(_name, "http://localhost" if _name == "SUPABASE_URL" else f"benchmark-{_name.lower()}")
+
+from app.services import llm_gateway  # noqa: E402
+from app.services.ai_agent_research import conduct_deep_research  # noqa: E402
+
+
+def install_fake_invoke(latency: float, calls: list) -> None:
+    async def fake_ainvoke(task, prompt, temperature=0.5):
+        calls.append(task)
+        await asyncio.sleep(latency)
+        return "1. Fake output from the research benchmark."
+
+    llm_gateway.ainvoke = fake_ainvoke
+
+
+async def time_phase(runs: int, calls: list, **kwargs) -> tuple:
+    calls.clear()
+    start = time.perf_counter()
+    for _ in range(runs):
+        await conduct_deep_research("Can a landlord keep a security deposit for normal wear and tear?", **kwargs)
+    return (time.perf_counter() - start) / runs, len(calls) / runs
+
+
+async def run(latency: float, runs: int) -> int:
+    calls: list = []
+    install_fake_invoke(latency, calls)
+
+    initial_time, initial_calls = await time_phase(runs, calls)
+    answered_time, answered_calls = await time_phase(
+        runs, calls, clarifying_answers={"Which state?": "Florida"}
+    )
+
+    previous = 2 * latency
+    print(f"per-call latency:            {latency:.2f}s")
+    print(f"previous pipeline (either):  {previous:.2f}s, 2 calls")
+    print(f"initial phase:               {initial_time:.2f}s, {initial_calls:.0f} calls")
+    print(f"answered phase:              {answered_time:.2f}s, {answered_calls:.0f} calls")
+
+    # Allow half a latency of scheduling slack on top of the single expected round trip
+    if initial_time > 1.5 * latency or answered_time > 1.5 * latency or answered_calls != 1:
+        print("FAIL: research calls are still running sequentially or the answered phase makes extra calls.")
+        return 1
+    print("PASS: research calls overlap and the answered phase makes a single call.")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=1.5, help="Simulated seconds per LLM call")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.latency, args.runs)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Deterministic OpenAI-compatible server for load tests.
+
+Serves `/v1/chat/completions` (plain, JSON mode, streaming and function/tool
+calls) with canned, schema-valid outputs, and `/v1/embeddings`, so the AI endpoints can be
+benchmarked without spending tokens or hitting rate limits:
+
+- evaluation prompts get a valid `DocumentEvaluationResponse`,
+- compliance prompts get a valid `ComplianceCheckResults` (or per-section
+  findings for section-level re-checks),
+- section enhancement prompts get a "replace" patch for the first section shown,
+- requests offering functions/tools get a call to the first one with
+  arguments built from its JSON schema (the agent's next turn, after the
+  function result, gets plain text),
+- everything else gets a markdown legal document of --completion-tokens,
+- embeddings are hashed bags of words, so texts sharing words are similar.
+
+Latency is modelled as a time to first token (--latency) plus generation at
+--tokens-per-second. Outputs are seeded from the request body, so the same
+request gets the same reply on every run. Injected failures (--error-rate,
+returned as 429s) are drawn independently for every attempt, so a retried
+request can succeed, as it would against the real API.
+
+Usage:
+    python scripts/fake_openai_server.py --port 8089 --latency 0.8 --tokens-per-second 60
+    OPENAI_BASE_URL=http://localhost:8089/v1 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Rough characters-per-token ratio, matching app/utils/token_utils.py
+CHARS_PER_TOKEN = 4
+
+EVALUATION_RESULT = {
+    "risk_score": "Moderate",
+    "loopholes": ["Termination clause does not define cure period", "Indemnification is not mutual"],
+    "strategy": "Negotiate a mutual indemnity and add a 30-day cure period before termination.",
+    "metadata": {"parties": "Acme Corp, Jane Smith", "document_date": "2024-01-01", "subject": "Consulting Agreement"},
+    "evaluation_summary": "The agreement is generally sound but leaves the client exposed on termination and indemnity.",
+    "weaknesses": ["One-sided indemnification", "Undefined cure period"],
+    "strengths": ["Clear payment terms", "Governing law and venue are specified"],
+    "recommendations_for_update": ["Add a mutual indemnification clause", "Define a 30-day cure period"],
+    "strategies_for_update": ["Prioritise risk allocation clauses in the next negotiation round"],
+}
+
+COMPLIANCE_RESULT = {
+    "formatting": "Pass",
+    "required_clauses": ["Missing force majeure clause"],
+    "jurisdiction_fit": "Good",
+}
+
+DOCUMENT_PARAGRAPH = (
+    "The parties agree that the obligations set out in this section shall be performed in good faith "
+    "and in accordance with the applicable law of the governing jurisdiction. "
+)
+
+EMBEDDING_DIMENSIONS = 1536
+
+AGENT_REPLY = "I have completed that for you. Let me know if you would like any changes."
+
+
+def _prompt_text(messages: List[Dict[str, Any]]) -> str:
+    return "\n".join(str(message.get("content") or "") for message in messages)
+
+
+def _markdown_document(completion_tokens: int) -> str:
+    parts = ["# AGREEMENT\n\n"]
+    section = 1
+    while sum(len(part) for part in parts) < completion_tokens * CHARS_PER_TOKEN:
+        parts.append(f"## {section}. Section {section}\n\n{DOCUMENT_PARAGRAPH * 3}\n\n")
+        section += 1
+    return "".join(parts)
+
+
+def _embedding(text: str) -> List[float]:
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        bucket = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=4).digest(), "big")
+        vector[bucket % EMBEDDING_DIMENSIONS] += 1.0
+    norm = sum(value * value for value in vector) ** 0.5 or 1.0
+    return [value / norm for value in vector]
+
+
+def _value_for_schema(schema: Dict[str, Any], name: str) -> Any:
+    kind = schema.get("type")
+    if "enum" in schema:
+        return schema["enum"][0]
+    if kind == "object":
+        return {key: _value_for_schema(value, key) for key, value in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_value_for_schema(schema.get("items", {}), name)]
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 1.0
+    if kind == "boolean":
+        return False
+    return f"Sample {name.replace('_', ' ')}"
+
+
+def _function_arguments(function: Dict[str, Any]) -> str:
+    return json.dumps(_value_for_schema(function.get("parameters") or {"type": "object"}, function.get("name", "value")))
+
+
+def build_reply(body: Dict[str, Any], completion_tokens: int) -> Dict[str, Any]:
+    """Pick the canned reply for a request: content text, a function call or tool calls."""
+    messages = body.get("messages") or []
+    prompt = _prompt_text(messages)
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+    last_role = messages[-1].get("role") if messages else "user"
+
+    if json_mode and "DocumentEvaluationResponse" in prompt:
+        return {"content": json.dumps(EVALUATION_RESULT)}
+    if json_mode and "jurisdiction_fit" in prompt and "--- Section " in prompt:
+        section_ids = re.findall(r"^--- Section (\S+) ---$", prompt, re.MULTILINE)
+        return {"content": json.dumps({
+            "sections": [{"id": section_id, "formatting": "Pass", "jurisdiction_fit": "Good", "issues": []} for section_id in section_ids],
+            "required_clauses": COMPLIANCE_RESULT["required_clauses"],
+        })}
+    if json_mode and "jurisdiction_fit" in prompt:
+        return {"content": json.dumps(COMPLIANCE_RESULT)}
+    if json_mode and '{"patches"' in prompt:
+        match = re.search(r"^<<<(s\d+)>>>\n(.*?)\n<<<end \1>>>$", prompt, re.MULTILINE | re.DOTALL)
+        patches = [{"section_id": match.group(1), "op": "replace", "text": match.group(2) + "\n\n" + DOCUMENT_PARAGRAPH}] if match else []
+        return {"content": json.dumps({"patches": patches})}
+    if json_mode:
+        return {"content": json.dumps({"result": "ok"})}
+
+    # Call the first offered function once; answer in text after its result comes back
+    if last_role == "user" and body.get("functions"):
+        function = body["functions"][0]
+        return {"function_call": {"name": function["name"], "arguments": _function_arguments(function)}}
+    if last_role == "user" and body.get("tools"):
+        function = body["tools"][0]["function"]
+        return {"tool_calls": [{
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "type": "function",
+            "function": {"name": function["name"], "arguments": _function_arguments(function)},
+        }]}
+    if body.get("functions") or body.get("tools"):
+        return {"content": AGENT_REPLY}
+
+    if "clarifying questions" in prompt.lower() and "answers" not in prompt.lower():
+        return {"content": "\n".join(f"{i}. Sample clarifying question {i}?" for i in range(1, 6))}
+    return {"content": _markdown_document(min(completion_tokens, body.get("max_tokens") or completion_tokens))}
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+
+    def _usage(prompt: str, reply: Dict[str, Any]) -> Dict[str, int]:
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN + 1
+        completion_tokens = len(json.dumps(reply)) // CHARS_PER_TOKEN + 1
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": model, "object": "model", "owned_by": "fake"} for model in args.models]}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body.get("input") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        await asyncio.sleep(args.latency / 4)
+        prompt_tokens = sum(len(text) // CHARS_PER_TOKEN + 1 for text in inputs)
+        return {
+            "object": "list",
+            "data": [{"object": "embedding", "index": i, "embedding": _embedding(text)} for i, text in enumerate(inputs)],
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        raw = await request.body()
+        body = json.loads(raw)
+        rng = random.Random(hashlib.sha256(raw).hexdigest())
+        model = body.get("model", "gpt-4.1")
+
+        await asyncio.sleep(args.latency * (1 + rng.uniform(-args.jitter, args.jitter)))
+        # Not from `rng`: a retry sends the same body and must not be bound to the same outcome
+        if random.random() < args.error_rate:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached (fake server)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": "1"},
+            )
+
+        reply = build_reply(body, args.completion_tokens)
+        usage = _usage(_prompt_text(body.get("messages") or []), reply)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        finish_reason = "function_call" if "function_call" in reply else "tool_calls" if "tool_calls" in reply else "stop"
+
+        if not body.get("stream"):
+            await asyncio.sleep(usage["completion_tokens"] / args.tokens_per_second)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": None, **reply}, "finish_reason": finish_reason}],
+                "usage": usage,
+            }
+
+        async def stream():
+            def chunk(delta: Dict[str, Any], finish: Any = None, **extra: Any) -> str:
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}] if delta is not None else [],
+                    **extra,
+                }
+                return f"data: {json.dumps(payload)}\n\n"
+
+            yield chunk({"role": "assistant", "content": ""})
+            if "content" in reply:
+                # Stream a few words at a time at the configured token rate
+                words = reply["content"].split(" ")
+                for start in range(0, len(words), args.words_per_chunk):
+                    text = " ".join(words[start:start + args.words_per_chunk])
+                    if start + args.words_per_chunk < len(words):
+                        text += " "
+                    await asyncio.sleep(max(1, len(text) // CHARS_PER_TOKEN) / args.tokens_per_second)
+                    yield chunk({"content": text})
+            else:
+                await asyncio.sleep(usage["completion_tokens"] / args.tokens_per_second)
+                yield chunk({key: value for key, value in reply.items() if key != "content"})
+            yield chunk({}, finish_reason)
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield chunk(None, usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds until the first token")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative +/- jitter applied to --latency")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="Generation speed after the first token")
+    parser.add_argument("--completion-tokens", type=int, default=600, help="Size of generated markdown documents")
+    parser.add_argument("--words-per-chunk", type=int, default=4, help="Words per streamed chunk")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--models", nargs="+", default=["gpt-4.1", "gpt-4-turbo", "gpt-4o", "text-embedding-3-small"])
+    args = parser.parse_args()
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
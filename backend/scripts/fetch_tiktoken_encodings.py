@@ -0,0 +1,37 @@
+"""
+Download the tiktoken encodings used by the configured models into
+TIKTOKEN_CACHE_DIR, so API workers can count tokens without network access.
+
+Run at build time with the same TIKTOKEN_CACHE_DIR the API will use:
+
+    TIKTOKEN_CACHE_DIR=/opt/tiktoken python scripts/fetch_tiktoken_encodings.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import tiktoken  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.services.llm_gateway import DEFAULT_MODEL_ROUTES  # noqa: E402
+
+
+def main() -> None:
+    if not os.getenv("TIKTOKEN_CACHE_DIR"):
+        sys.exit("Set TIKTOKEN_CACHE_DIR to the directory the API workers will read encodings from.")
+    models = sorted(set({**DEFAULT_MODEL_ROUTES, **settings.LLM_MODEL_ROUTES}.values()))
+    names = set()
+    for model in models:
+        try:
+            names.add(tiktoken.encoding_name_for_model(model))
+        except KeyError:
+            names.add("cl100k_base")  # token_utils falls back to it for unknown models
+    for name in sorted(names):
+        tiktoken.get_encoding(name)
+        print(f"Fetched {name}")
+    print(f"Encodings for {', '.join(models)} are in {os.environ['TIKTOKEN_CACHE_DIR']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Load test: N concurrent document generations must overlap on one event loop.
+
+The OpenAI call is replaced with a fake that sleeps for a fixed latency, so no
+tokens are spent. If the AI services blocked the event loop, N generations would
+take roughly N * latency; with the shared AsyncOpenAI client they should finish
+in roughly one latency per wave of the gateway's per-model concurrency limit.
+A heartbeat task also measures the longest stall of the event loop while the
+generations are in flight.
+
+Usage:
+    python scripts/load_test_concurrent_generation.py --concurrency 20 --latency 2.0
+"""
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Placeholder settings so the app modules can be imported without a real .env
+for _name in [
+    "SUPABASE_URL", "SUPABASE_KEY", "SUPABASE_SERVICE_KEY", "OPENAI_API_KEY",
+    "STRIPE_SECRET_KEY", "STRIPE_PUBLISHABLE_KEY", "STRIPE_WEBHOOK_SECRET",
+    "PRICE_STARTER", "PRICE_PRO", "PRICE_PREMIUM", "PRICE_DOC_PAYG", "PRICE_AI_REPORT",
+]:
+    os.environ.setdefault(_name, "http://localhost" if _name == "SUPABASE_URL" else f"load-test-{_name.lower()}")
+
+from app.config import settings  # noqa: E402
+from app.services import llm_gateway  # noqa: E402
+from app.services.ai_agent_generate import generate_legal_document  # noqa: E402
+from app.models.schemas import DocumentType, AreaOfLaw  # noqa: E402
+
+
+def install_fake_completion(latency: float) -> None:
+    async def fake_create(**kwargs):
+        await asyncio.sleep(latency)
+        message = SimpleNamespace(content="# FAKE DOCUMENT\n\nGenerated by the load test.")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    llm_gateway.async_client.chat.completions.create = fake_create
+
+
+async def heartbeat(stop: asyncio.Event, interval: float, gaps: list) -> None:
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        gaps.append(now - last - interval)
+        last = now
+
+
+async def run(concurrency: int, latency: float) -> int:
+    install_fake_completion(latency)
+
+    profile = {"full_name": "Load Test", "email": "load@test.local", "role": "attorney"}
+    stop = asyncio.Event()
+    gaps: list = []
+    beat = asyncio.create_task(heartbeat(stop, 0.05, gaps))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        generate_legal_document(
+            notes=f"Load test request {i}",
+            user_id="load-test-user",
+            title=f"Load Test {i}",
+            document_type=DocumentType.MOTION,
+            area_of_law=AreaOfLaw.CIVIL_LITIGATION,
+            user_profile_data=profile,
+        )
+        for i in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await beat
+
+    serial_estimate = concurrency * latency
+    # The gateway caps in-flight calls per model, so calls above the cap run in waves
+    model = llm_gateway.resolve_model("generate")
+    limit = settings.LLM_MODEL_CONCURRENCY.get(model, settings.LLM_DEFAULT_CONCURRENCY)
+    waves = math.ceil(concurrency / limit)
+    max_stall = max(gaps) if gaps else 0.0
+    print(f"concurrency:        {concurrency}")
+    print(f"gateway limit:      {limit} in flight for {model} ({waves} wave(s))")
+    print(f"per-call latency:   {latency:.2f}s")
+    print(f"serial estimate:    {serial_estimate:.2f}s")
+    print(f"wall time:          {elapsed:.2f}s")
+    print(f"speedup:            {serial_estimate / elapsed:.1f}x")
+    print(f"max loop stall:     {max_stall * 1000:.1f}ms")
+
+    # Generations overlap if the batch finishes within one extra latency of the expected waves
+    if elapsed > (waves + 1) * latency:
+        print("FAIL: generations ran serially; the event loop is being blocked.")
+        return 1
+    print("PASS: generations overlapped.")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=2.0, help="Simulated seconds per LLM call")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.concurrency, args.latency)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Settings requires these; tests never reach the real services
+TEST_SETTINGS = {
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_KEY": "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.test",
+    "SUPABASE_SERVICE_KEY": "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.test",
+    "OPENAI_API_KEY": "sk-test",
+    "STRIPE_SECRET_KEY": "sk_test",
+    "STRIPE_PUBLISHABLE_KEY": "pk_test",
+    "STRIPE_WEBHOOK_SECRET": "whsec_test",
+    "PRICE_STARTER": "price_starter",
+    "PRICE_PRO": "price_pro",
+    "PRICE_PREMIUM": "price_premium",
+    "PRICE_DOC_PAYG": "price_doc_payg",
+    "PRICE_AI_REPORT": "price_ai_report",
+}
+for name, value in TEST_SETTINGS.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.config import settings
+from app.services import ai_jobs
+
+
+class RecordingTable:
+    """Records updates and filters; selects return `rows`."""
+
+    def __init__(self, log, rows=()):
+        self.log = log
+        self.rows = list(rows)
+        self.filters = []
+
+    def update(self, data):
+        self.log.append(("update", data))
+        return self
+
+    def select(self, *columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(("eq", column, value))
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(("lt", column))
+        return self
+
+    def execute(self):
+        self.log.append(("filters", self.filters))
+        return SimpleNamespace(data=self.rows)
+
+
+def test_running_job_refreshes_heartbeat(monkeypatch):
+    log = []
+    monkeypatch.setattr(ai_jobs, "supabase", SimpleNamespace(from_=lambda table: RecordingTable(log)))
+    monkeypatch.setattr(settings, "JOBS_HEARTBEAT_INTERVAL_SECONDS", 0.01)
+
+    @ai_jobs.register_job_handler("test_slow_job")
+    async def slow_job(user_id, payload, report_progress):
+        await asyncio.sleep(0.1)
+        return {}
+
+    asyncio.run(ai_jobs.run_job({"id": "job-1", "job_type": "test_slow_job", "user_id": "user-1"}))
+
+    heartbeats = [data for kind, data in log if kind == "update" and set(data) == {"heartbeat_at"}]
+    assert len(heartbeats) >= 2
+
+
+def test_stale_jobs_are_found_by_heartbeat(monkeypatch):
+    log = []
+    monkeypatch.setattr(ai_jobs, "supabase", SimpleNamespace(from_=lambda table: RecordingTable(log, [{"id": "job-1", "attempts": 1}])))
+
+    assert ai_jobs.requeue_stale_jobs() == 1
+    stale_query, requeue = [filters for kind, filters in log if kind == "filters"]
+    assert ("lt", "heartbeat_at") in stale_query
+    # A heartbeat arriving between the query and the update keeps the job running
+    assert ("lt", "heartbeat_at") in requeue
@@ -0,0 +1,103 @@
+"""
+Compliance checks queued from Starlette background tasks must run on the
+event loop: the job queue creates asyncio tasks, which fails in the threadpool
+that runs plain-function background tasks.
+"""
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routes import document
+from app.services import ai_agent_compliance
+from app.services.job_queue import job_queue
+from app.utils.auth_utils import get_current_user
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+DOCUMENT_ID = "00000000-0000-0000-0000-0000000000d1"
+CREATE_REQUEST = {"title": "Demand letter", "document_type": "Letter", "area_of_law": "Civil Litigation", "notes": "Unpaid invoice"}
+
+
+def _document(content: str, status: str = "draft"):
+    return {
+        "id": DOCUMENT_ID,
+        "user_id": USER_ID,
+        "title": CREATE_REQUEST["title"],
+        "content": content,
+        "status": status,
+        "created_at": "2026-01-01T00:00:00",
+        "updated_at": "2026-01-01T00:00:00",
+        "compliance_check_results": {"status": "pending"},
+    }
+
+
+class FakeTable:
+    def __init__(self, data):
+        self.data = data
+
+    def insert(self, row):
+        return self
+
+    def update(self, row):
+        return self
+
+    def eq(self, *args):
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=self.data)
+
+
+@pytest.fixture
+def compliance_jobs(monkeypatch):
+    jobs = []
+
+    async def run_compliance_check_job(document_id, document_content, jurisdiction=None, document_type=None, use_cache=True):
+        jobs.append((document_id, document_content, document_type))
+
+    monkeypatch.setattr(ai_agent_compliance, "run_compliance_check_job", run_compliance_check_job)
+    monkeypatch.setattr(document, "schedule_document_embedding", lambda row: None)
+    return jobs
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(document.router, prefix="/documents")
+    app.dependency_overrides[get_current_user] = lambda: {"id": USER_ID}
+    with TestClient(app, headers={"Authorization": "Bearer test"}) as test_client:
+        yield test_client
+
+
+def test_create_document_runs_compliance_check(client, compliance_jobs, monkeypatch):
+    async def generate_and_save(document_request, user_id):
+        return _document("Dear Sir or Madam")
+
+    monkeypatch.setattr(document, "_generate_and_save_document", generate_and_save)
+
+    response = client.post("/documents/create", json=CREATE_REQUEST)
+    client.portal.call(job_queue.drain)
+
+    assert response.status_code == 200
+    assert compliance_jobs == [(DOCUMENT_ID, "Dear Sir or Madam", "Letter")]
+
+
+def test_streamed_document_runs_compliance_check(client, compliance_jobs, monkeypatch):
+    async def load_profiles(document_request, user):
+        return {}, None
+
+    async def stream_legal_document(**kwargs):
+        for chunk in ("Dear ", "Sir or Madam"):
+            yield chunk
+
+    monkeypatch.setattr(document, "_load_generation_profiles", load_profiles)
+    monkeypatch.setattr(document, "stream_legal_document", stream_legal_document)
+    monkeypatch.setattr(document, "supabase", SimpleNamespace(from_=lambda table: FakeTable([_document("", "generating")])))
+
+    response = client.post("/documents/create/stream", json=CREATE_REQUEST)
+    client.portal.call(job_queue.drain)
+
+    assert response.status_code == 200
+    assert "event: done" in response.text
+    assert compliance_jobs == [(DOCUMENT_ID, "Dear Sir or Madam", "Letter")]
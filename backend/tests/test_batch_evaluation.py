@@ -0,0 +1,47 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.config import settings
+from app.routes import document
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+
+class FakeQuery:
+    def __init__(self, result):
+        self.result = result
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return SimpleNamespace(data=self.result)
+
+
+def test_failed_write_marks_documents_failed_and_keeps_going(monkeypatch):
+    documents = [{"id": f"doc-{i}", "content": f"Agreement {i}", "evaluation_response": None} for i in range(4)]
+    writes = []
+
+    def rpc(name, params):
+        writes.append([update["id"] for update in params["updates"]])
+        return FakeQuery(RuntimeError("statement timeout") if len(writes) == 1 else [])
+
+    async def evaluate(content, criteria, use_cache=True):
+        return SimpleNamespace(dict=lambda: {"evaluation_summary": content})
+
+    async def report_progress(percent, message):
+        pass
+
+    monkeypatch.setattr(document, "supabase", SimpleNamespace(from_=lambda table: FakeQuery(documents), rpc=rpc))
+    monkeypatch.setattr(document, "evaluate_legal_document", evaluate)
+    monkeypatch.setattr(settings, "BATCH_EVALUATION_WRITE_SIZE", 2)
+
+    result = asyncio.run(document._evaluate_documents_batch(
+        USER_ID, [d["id"] for d in documents], "General legal review", False, report_progress
+    ))
+
+    assert len(writes) == 2
+    assert sorted(failure["document_id"] for failure in result["failed"]) == sorted(writes[0])
+    assert result["evaluated"] == 2
@@ -0,0 +1,36 @@
+"""
+Re-checks that don't know the jurisdiction or document type (the documents
+table stores neither) must reuse findings from the check after generation,
+which did know them.
+"""
+import asyncio
+
+from app.services import ai_agent_compliance
+
+CONTENT = "# Parties\nAcme Corp and Jane Doe.\n\n# Payment\nInvoice 42 is due within 10 days.\n"
+
+
+def test_recheck_without_context_reuses_stored_findings(monkeypatch):
+    calls = []
+
+    async def fake_check_sections(sections, outline, previous_required_clauses, jurisdiction, document_type):
+        calls.append((len(sections), jurisdiction, document_type))
+        return {
+            "sections": [{"id": section.id, "formatting": "Good", "jurisdiction_fit": "Good", "issues": []} for section in sections],
+            "required_clauses": ["Payment terms"],
+        }
+
+    monkeypatch.setattr(ai_agent_compliance, "_check_sections", fake_check_sections)
+
+    _, state = asyncio.run(ai_agent_compliance.check_document_compliance_incremental(CONTENT, None, "Florida", "Letter"))
+    result, recheck_state = asyncio.run(ai_agent_compliance.check_document_compliance_incremental(CONTENT, state, None, None))
+
+    assert calls == [(2, "Florida", "Letter")]
+    assert recheck_state["jurisdiction"] == "Florida"
+    assert recheck_state["document_type"] == "Letter"
+    assert result.required_clauses == ["Payment terms"]
+
+    # An edited section is re-checked against the stored context
+    edited = CONTENT.replace("10 days", "30 days")
+    asyncio.run(ai_agent_compliance.check_document_compliance_incremental(edited, recheck_state, None, None))
+    assert calls[-1] == (1, "Florida", "Letter")
@@ -0,0 +1,34 @@
+"""
+Embedding requests are split by token count as well as by number of texts:
+OpenAI rejects an embeddings request above 300k tokens, which a full batch of
+long texts would exceed.
+"""
+import asyncio
+from types import SimpleNamespace
+
+from app.config import settings
+from app.services import llm_gateway
+
+
+def test_embed_splits_batches_by_tokens(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_SIZE", 256)
+    monkeypatch.setattr(settings, "EMBEDDING_MAX_BATCH_TOKENS", 250000)
+    monkeypatch.setattr(llm_gateway, "count_tokens", lambda text, model=None: len(text))
+    monkeypatch.setattr(llm_gateway, "truncate_to_tokens", lambda text, max_tokens, model=None: text[:max_tokens])
+    requests = []
+
+    async def create(model, input, timeout):
+        requests.append(list(input))
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=index, embedding=[float(len(text))]) for index, text in enumerate(input)],
+            usage=SimpleNamespace(prompt_tokens=sum(len(text) for text in input)),
+        )
+
+    monkeypatch.setattr(llm_gateway.async_client, "embeddings", SimpleNamespace(create=create))
+
+    texts = ["x" * 8000] * 100 + ["short"] * 3
+    vectors = asyncio.run(llm_gateway.embed("embed", texts))
+
+    assert [len(batch) for batch in requests] == [31, 31, 31, 10]
+    assert all(sum(len(text) for text in batch) <= 250000 for batch in requests)
+    assert vectors == [[float(len(text))] for text in texts]
@@ -0,0 +1,46 @@
+import asyncio
+
+from app.config import settings
+from app.routes import document
+
+
+async def _body(response):
+    if hasattr(response, "body_iterator"):
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return response.body
+
+
+def test_cached_export_survives_eviction_before_send(tmp_path, monkeypatch):
+    cached = tmp_path / "artifact.pdf"
+    cached.write_bytes(b"%PDF-cached")
+
+    async def get_or_render(content, fmt):
+        return str(cached)
+
+    monkeypatch.setattr(settings, "ARTIFACT_CACHE_ENABLED", True)
+    monkeypatch.setattr(document.artifact_cache, "get_or_render", get_or_render)
+
+    async def export_then_evict():
+        response = await document._export_response("Demand Letter", "# Demand", "pdf")
+        cached.unlink()
+        return response, await _body(response)
+
+    response, body = asyncio.run(export_then_evict())
+    assert body == b"%PDF-cached"
+    assert response.headers["content-length"] == str(len(body))
+    assert response.headers["content-disposition"] == 'attachment; filename="Demand_Letter.pdf"'
+
+
+def test_export_renders_when_evicted_before_open(tmp_path, monkeypatch):
+    async def get_or_render(content, fmt):
+        return str(tmp_path / "evicted.pdf")
+
+    async def render(content, fmt):
+        return b"%PDF-rendered"
+
+    monkeypatch.setattr(settings, "ARTIFACT_CACHE_ENABLED", True)
+    monkeypatch.setattr(document.artifact_cache, "get_or_render", get_or_render)
+    monkeypatch.setattr(document.render_pool, "render", render)
+
+    response = asyncio.run(document._export_response("Demand Letter", "# Demand", "pdf"))
+    assert asyncio.run(_body(response)) == b"%PDF-rendered"
@@ -0,0 +1,18 @@
+from app.models.schemas import AreaOfLaw, DocumentType
+from app.services.ai_agent_generate import _build_generation_messages
+from app.services.prompt_registry import GENERATION_REQUEST_PREAMBLE
+
+
+def test_requests_of_one_document_type_share_their_prefix():
+    first = _build_generation_messages(
+        "Unpaid invoice", "Demand letter", DocumentType.LETTER, AreaOfLaw.CIVIL_LITIGATION,
+        {"full_name": "Jane Roe"}, jurisdiction="Florida"
+    )
+    second = _build_generation_messages(
+        "Breach of lease", "Notice to tenant", DocumentType.LETTER, AreaOfLaw.CIVIL_LITIGATION,
+        {"full_name": "John Doe"}, client_profile_data={"full_name": "Acme LLC"}, case_number="2024-CA-1"
+    )
+
+    assert first[0] == second[0]
+    assert first[1]["content"].startswith(GENERATION_REQUEST_PREAMBLE)
+    assert second[1]["content"].startswith(GENERATION_REQUEST_PREAMBLE)
@@ -0,0 +1,39 @@
+import asyncio
+import io
+
+import pytest
+from reportlab.pdfgen import canvas
+
+from app.utils.ingestion import ExtractionPool, PageLimitExceeded
+
+
+def _pdf(pages: int) -> bytes:
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for page in range(1, pages + 1):
+        pdf.drawString(72, 720, f"Page {page} of the deposition transcript")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pool():
+    # Thread mode: the page logic is the same as with worker processes
+    return ExtractionPool(workers=0, page_timeout=None, min_pages_per_task=2)
+
+
+def test_pdf_over_page_limit_is_rejected_without_budget(pool):
+    with pytest.raises(PageLimitExceeded):
+        asyncio.run(pool.extract(_pdf(6), "pdf", max_pages=5))
+
+
+def test_pdf_within_page_limit_is_read_whole(pool):
+    result = asyncio.run(pool.extract(_pdf(5), "pdf", max_pages=5))
+    assert (result.pages_extracted, result.truncated) == (5, False)
+    assert "Page 5 of" in result.text
+
+
+def test_budgeted_extraction_stops_at_page_limit(pool):
+    result = asyncio.run(pool.extract(_pdf(6), "pdf", max_pages=4, max_tokens=100000))
+    assert (result.pages, result.pages_extracted, result.truncated) == (6, 4, True)
@@ -0,0 +1,30 @@
+from app.utils import token_utils
+
+
+class FakeEncoding:
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+
+def test_failed_encoding_load_is_retried(monkeypatch):
+    attempts = []
+
+    def load_encoding(model):
+        attempts.append(model)
+        if len(attempts) == 1:
+            raise ConnectionError("encoding download failed")
+        return FakeEncoding()
+
+    monkeypatch.setattr(token_utils, "_load_encoding", load_encoding)
+    monkeypatch.setattr(token_utils, "_encodings", {})
+    monkeypatch.setattr(token_utils, "_encoding_failures", {})
+
+    text = "one two three four five six"
+    # Estimated, and not retried within the retry window
+    assert token_utils.count_tokens(text, "test-model") == len(text) // token_utils.ESTIMATE_CHARS_PER_TOKEN + 1
+    token_utils.count_tokens(text, "test-model")
+    assert len(attempts) == 1
+
+    monkeypatch.setattr(token_utils, "ENCODING_RETRY_SECONDS", 0)
+    assert token_utils.count_tokens(text, "test-model") == 6
+    assert len(attempts) == 2